@@ -0,0 +1,35 @@
+"""
+Micro benchmark of Font.render_max_width, rendering text that was never rendered before and text from the render cache.
+"""
+
+import importlib
+import timeit
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+Font = importlib.import_module("pygame-video.Font").Font
+
+import pygame
+
+TEXT = "decode 29.9 fps  present 29.9 fps\ndropped 0  duplicated 1  stalls 0\nthe quick brown fox jumps over the lazy dog " * 4
+
+CASES = {
+    "render_max_width uncached": "font.render_cache.clear(); font.render_max_width(TEXT, 400)",
+    "render_max_width cached": "font.render_max_width(TEXT, 400)",
+    "render_max_width timestamp": "font.render_cache.clear(); font.render_max_width('01:23', 60)",
+    "create_rows_from_text": "font.create_rows_from_text(TEXT, 400)",
+}
+
+def run(number: int = 2000) -> dict[str, float]:
+    # the seconds per call of every case
+    pygame.font.init()
+    font = Font("Ariel", 24)
+    font.render_max_width(TEXT, 400) # generates every glyph so the cases only measure rendering
+
+    results = {}
+    for name, statement in CASES.items():
+        results[name] = min(timeit.repeat(statement, globals = {"font": font, "TEXT": TEXT}, number = number, repeat = 5)) / number
+        print(f"{name:<28} {results[name] * 1e6:>10.1f} us")
+
+    return results
@@ -0,0 +1,80 @@
+"""
+Micro benchmark of Vector2 against the previous implementation that checked isinstance(other, Iterable)
+in Python and created a new vector for every operator, including the in place ones.
+
+    python benchmarks/benchmark_vector2.py
+"""
+
+from collections.abc import Iterable
+import importlib
+import timeit
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+Vector2 = importlib.import_module("pygame-video.Vector2").Vector2
+
+import pygame
+
+class IterableVector2(pygame.math.Vector2):
+    # how every operator of Vector2 used to work
+    def __add__(self, other):
+        if not isinstance(other, Iterable):
+            other = (other, other)
+        return IterableVector2(self[0] + other[0], self[1] + other[1])
+
+    def __mul__(self, other):
+        if not isinstance(other, Iterable):
+            other = (other, other)
+        return IterableVector2(self[0] * other[0], self[1] * other[1])
+
+    def __iadd__(self, other):
+        if not isinstance(other, Iterable):
+            other = (other, other)
+        self[0] += other[0]
+        self[1] += other[1]
+        return IterableVector2(self[0], self[1])
+
+    def __eq__(self, other):
+        if not isinstance(other, Iterable):
+            other = (other, other)
+        return self[0] == other[0] and self[1] == other[1]
+
+    def sum(values):
+        total = IterableVector2(0, 0)
+        for val in values:
+            total += val
+        return total
+
+CASES = {
+    "a + b": "a + b",
+    "a + (1, 2)": "a + (1, 2)",
+    "a * 2": "a * 2",
+    "a += b": "a += b",
+    "a == b": "a == b",
+    "sum(1000 vectors)": "cls.sum(values)",
+}
+
+def run(number: int = 200000) -> dict[str, float]:
+    # the seconds per operation of the current Vector2, keyed by the case
+    results = {}
+
+    for name, statement in CASES.items():
+        times = []
+        for cls in (IterableVector2, Vector2):
+            count = number // 1000 if "sum" in name else number
+            # a and b are made in the setup so the in place operators rebind a local instead of a global
+            times.append(min(timeit.repeat(
+                statement, "a = cls(1, 2); b = cls(3, 4)",
+                globals = {"cls": cls, "values": [cls(i, i) for i in range(1000)]}, number = count, repeat = 5
+            )) / count)
+
+        old, new = times
+        print(f"{name:<20} {old * 1e9:>10.0f} ns {new * 1e9:>10.0f} ns {old / new:>6.1f}x")
+        results[name] = new
+
+    return results
+
+if __name__ == "__main__":
+    print(f"{'operation':<20} {'before':>13} {'after':>13}")
+    run()
@@ -0,0 +1,213 @@
+"""
+Benchmarks of the Video pipeline on synthetic clips, run headless through run.py.
+
+Every clip is measured for the time to its first frame, with and without cached metadata, how fast it decodes
+flat out, how many frames a playing video presents, how long a seek takes until the new frame is on screen and
+how much memory playing it allocates. measure_streams plays several clips at once to get the cpu time per stream
+and measure_seek_modes compares fast and exact seeks on clips with longer and longer GOPs.
+"""
+
+from synthetic import Clip, generate
+import tracemalloc
+import importlib
+import statistics
+import random
+import pygame
+import time
+import os
+
+package = importlib.import_module("pygame-video")
+decoders = importlib.import_module("pygame-video.Decoder")
+
+def wait_for(condition, timeout: float = 10.0, interval: float = 0.001) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+def open_video(path: str, font, **kwargs):
+    # the quality is fixed so the results show what the pipeline costs at full quality
+    return package.Video(path, font = font, adaptive_quality = False, **kwargs)
+
+def time_to_first_frame(path: str, font) -> float:
+    started = time.perf_counter()
+    video = open_video(path, font)
+
+    try:
+        if not wait_for(lambda: video.frame is not None or video.setup_error is not None):
+            raise TimeoutError(f"no frame from {path}")
+        if video.setup_error is not None:
+            raise video.setup_error
+        return time.perf_counter() - started
+
+    finally:
+        video.close()
+
+def decode_throughput(path: str, clip: Clip, duration: float) -> float:
+    # frames per second the decoder produces on its own, without audio or presenting
+    decoder = decoders.open_decoder(path, (clip.width, clip.height), clip.framerate, None, 2)
+    view = memoryview(bytearray(clip.width * clip.height * 3))
+
+    try:
+        decoder.seek(0)
+        frames = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < duration:
+            if decoder.read_into(view) is None:
+                decoder.seek(0)
+                continue
+            frames += 1
+        return frames / (time.perf_counter() - started)
+
+    finally:
+        decoder.close()
+
+def play_for(videos: list, display: pygame.Surface, duration: float, framerate: int = 60):
+    # draws the videos in a row like an application would, at framerate
+    width = display.get_width() // len(videos)
+    areas = [pygame.Rect(i * width, 0, width, display.get_height()) for i in range(len(videos))]
+
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for video, area in zip(videos, areas):
+            video.draw(display, area)
+        time.sleep(1 / framerate)
+
+def seek_latency(video, display: pygame.Surface, count: int) -> list[float]:
+    # from asking for the seek until the first frame after it was presented
+    latencies = []
+    offsets = random.Random(0).sample(range(1, int(video.duration) - 1), min(count, int(video.duration) - 2))
+
+    for offset in offsets:
+        started = time.perf_counter()
+        video.start_ffmpeg_at_offset(float(offset))
+        if wait_for(lambda: video.stats.seek_started is None, timeout = 5.0):
+            latencies.append(time.perf_counter() - started)
+        play_for([video], display, 0.2)
+
+    return latencies
+
+def settle(videos: list):
+    # waits for the first frames and for the seek previews, which decode in the background after opening
+    for video in videos:
+        wait_for(lambda: video.frame is not None, timeout = 10.0)
+        wait_for(lambda: video.thumbnails is not None and video.thumbnails.ready, timeout = 30.0, interval = 0.01)
+
+def measure_clip(clip: Clip, font, display: pygame.Surface, quick: bool = False) -> dict[str, float]:
+    path = generate(clip)
+    window = 1.5 if quick else 3.0
+    results = {}
+
+    # the metadata cache entry is removed so the first open probes the source like the first time it is played
+    cache_path = package.Metadata.cache_path(path)
+    if cache_path and os.path.exists(cache_path):
+        os.remove(cache_path)
+
+    results["first_frame_cold"] = time_to_first_frame(path, font)
+    results["first_frame_warm"] = time_to_first_frame(path, font)
+    results["decode_fps"] = decode_throughput(path, clip, window)
+
+    video = open_video(path, font)
+    try:
+        settle([video])
+
+        presented, dropped = video.frames_presented, video.frames_dropped
+        started = time.perf_counter()
+        play_for([video], display, window)
+        elapsed = time.perf_counter() - started
+        results["present_fps"] = (video.frames_presented - presented) / elapsed
+        results["dropped_per_second"] = (video.frames_dropped - dropped) / elapsed
+
+        # tracemalloc sees what python and numpy allocate, the frame buffer is allocated up front so
+        # steady playback should not grow at all and the peak shows the garbage made per frame
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            presented = video.frames_presented
+            play_for([video], display, window)
+            after, peak = tracemalloc.get_traced_memory()
+
+        finally:
+            tracemalloc.stop()
+
+        frames = max(1, video.frames_presented - presented)
+        results["memory_growth_per_frame"] = (after - before) / frames
+        results["memory_peak"] = peak - before
+
+        latencies = seek_latency(video, display, 3 if quick else 6)
+        if latencies:
+            results["seek_latency_median"] = statistics.median(latencies)
+            results["seek_latency_max"] = max(latencies)
+
+    finally:
+        video.close()
+
+    return results
+
+def measure_streams(clip: Clip, counts: list[int], font, display: pygame.Surface, quick: bool = False) -> dict[str, float]:
+    """
+    Plays count copies of clip at once and returns the cpu time per stream as a fraction of one core.
+
+    The process time includes every decoder thread of this process, the ffmpeg processes
+    of the subprocess decoder are not counted.
+    """
+
+    path = generate(clip)
+    window = 2.0 if quick else 4.0
+    results = {}
+
+    for count in counts:
+        videos = [open_video(path, font) for _ in range(count)]
+        try:
+            settle(videos)
+
+            cpu, wall = time.process_time(), time.perf_counter()
+            play_for(videos, display, window)
+            cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+            results[f"cpu_per_stream_{count}"] = cpu / wall / count
+
+        finally:
+            for video in videos:
+                video.close()
+
+    return results
+
+def measure_seek_modes(clips: list[Clip], font, display: pygame.Surface, quick: bool = False) -> dict[str, float]:
+    """
+    Seeks a paused video to the same random offsets in "fast" and in "exact" mode on every clip and
+    returns how long it took until the frame it landed on was decoded, and how far from the offset that was.
+
+    Fast seeks should stay flat as the GOPs get longer while exact seeks grow with the frames they discard.
+    """
+
+    results = {}
+    for clip in clips:
+        path = generate(clip)
+        video = open_video(path, font, playing = False)
+
+        try:
+            settle([video])
+            rng = random.Random(0)
+            offsets = [rng.uniform(1, clip.duration - 1) for _ in range(3 if quick else 8)]
+
+            for mode in ("fast", "exact"):
+                latencies, errors = [], []
+                for offset in offsets:
+                    started = time.perf_counter()
+                    landed = video.seek(offset, mode, block = True, timeout = 5.0)
+                    if landed is not None:
+                        latencies.append(time.perf_counter() - started)
+                        errors.append(abs(landed - offset))
+
+                name = f"gop_{clip.keyframe_interval:g}s_{mode}"
+                if latencies:
+                    results[f"{name}_seek_latency_median"] = statistics.median(latencies)
+                    results[f"{name}_seek_error_max"] = max(errors)
+
+        finally:
+            video.close()
+
+    return results
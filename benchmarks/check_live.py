@@ -0,0 +1,174 @@
+"""
+Checks that LiveDecoder reconnects to a stream that drops and keeps its timestamps going up, against a local stand-in server.
+
+A synthetic clip is remuxed to MPEG-TS and served over HTTP at the pace it plays at, like a local encoder would.
+The first connection is dropped part of the way in, the decoder has to open the stream again with its backoff
+and carry on from where it was. Exits with 1 when a check fails.
+
+    python benchmarks/check_live.py
+"""
+
+import http.server
+import threading
+import subprocess
+import importlib
+import shutil
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import null_audio
+null_audio.install()
+
+from synthetic import Clip, generate
+
+try:
+    import av
+except ImportError:
+    av = None
+
+decoders = importlib.import_module("pygame-video.Decoder")
+
+def remux_to_transport_stream(path: str) -> str:
+    # the packets are copied as they are, only the container changes
+    output = os.path.splitext(path)[0] + ".ts"
+    if os.path.exists(output):
+        return output
+
+    temporary = output + f".{os.getpid()}.tmp"
+    try:
+        if shutil.which("ffmpeg"):
+            subprocess.run(["ffmpeg", "-v", "error", "-y", "-i", path, "-c", "copy", "-f", "mpegts", temporary], check = True)
+
+        else:
+            with av.open(path) as source, av.open(temporary, "w", format = "mpegts") as target:
+                # add_stream_from_template replaced the template argument of add_stream in PyAV 14
+                template = source.streams.video[0]
+                stream = target.add_stream_from_template(template) if hasattr(target, "add_stream_from_template") else target.add_stream(template = template)
+                for packet in source.demux(source.streams.video[0]):
+                    if packet.dts is not None:
+                        packet.stream = stream
+                        target.mux(packet)
+
+        os.replace(temporary, output)
+
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    return output
+
+class StreamServer(http.server.ThreadingHTTPServer):
+    def __init__(self, path: str, duration: float, drop_after: float):
+        """
+        Serves the file at path to every connection at duration seconds per file, the first connection is closed after drop_after seconds.
+        """
+
+        with open(path, "rb") as file:
+            self.data = file.read()
+        self.bytes_per_second = len(self.data) / duration
+        self.drop_after = drop_after
+
+        self.connections = 0
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), StreamHandler)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/stream.ts"
+
+class StreamHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server: StreamServer = self.server
+        with server.lock:
+            server.connections += 1
+            dropped = server.connections == 1
+
+        # no content length so the client reads until the connection closes, like a live stream
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp2t")
+        self.end_headers()
+
+        chunk = 188 * 64
+        started = time.perf_counter()
+        try:
+            for start in range(0, len(server.data), chunk):
+                due = started + start / server.bytes_per_second
+                if dropped and due - started > server.drop_after:
+                    return # the connection is closed without finishing the stream
+
+                time.sleep(max(0, due - time.perf_counter()))
+                self.wfile.write(server.data[start:start + chunk])
+                self.wfile.flush()
+
+        except (BrokenPipeError, ConnectionResetError):
+            pass # the decoder was closed
+
+    def log_message(self, format, *args):
+        pass
+
+def check_reconnect(duration: float = 8.0, drop_after: float = 2.0, read_for: float = 6.0) -> list[str]:
+    # returns a line for every check that failed
+    clip = Clip(320, 240, "h264", duration = duration, audio = False)
+    server = StreamServer(remux_to_transport_stream(generate(clip)), duration, drop_after)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+
+    decoder = decoders.LiveDecoder(server.url, max_buffer = 2.0, reconnect = True, timeout = 2.0)
+    decoder.backoff = 0.1
+    stop: threading.Timer = None
+    timestamps = []
+
+    try:
+        metadata = decoder.connect()
+        decoder.size = (metadata.width, metadata.height)
+        decoder.framerate = metadata.framerate if metadata.framerate > 0 else clip.framerate
+        decoder.seek(0)
+
+        # read_into waits for the next frame, the interrupt also ends a read that is waiting on a stream that stopped
+        stop = threading.Timer(read_for, decoder.interrupt)
+        stop.start()
+
+        view = memoryview(bytearray(metadata.width * metadata.height * 3))
+        while True:
+            pts = decoder.read_into(view)
+            if pts is None:
+                break
+            timestamps.append(pts)
+
+    finally:
+        if stop:
+            stop.cancel()
+        decoder.close()
+        server.shutdown()
+        server.server_close()
+
+    failures = []
+    if decoder.reconnects < 1 or server.connections < 2:
+        failures.append(f"expected a reconnect, got {decoder.reconnects} reconnects and {server.connections} connections")
+
+    backwards = [(a, b) for a, b in zip(timestamps, timestamps[1:]) if b <= a]
+    if backwards:
+        failures.append(f"{len(backwards)} timestamps did not increase, the first went from {backwards[0][0]:.3f} to {backwards[0][1]:.3f}")
+
+    # the frames of the second connection carry on after the ones of the first
+    if not timestamps or timestamps[-1] < drop_after:
+        failures.append(f"no frames after the reconnect, the last timestamp was {timestamps[-1] if timestamps else None}")
+
+    print(f"{len(timestamps)} frames, {decoder.reconnects} reconnects, {server.connections} connections, {decoder.frames_discarded} frames discarded")
+    return failures
+
+def main():
+    if av is None:
+        print("the live decoder needs PyAV")
+        sys.exit(1)
+
+    failures = check_reconnect()
+    for failure in failures:
+        print(f"failed {failure}")
+
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
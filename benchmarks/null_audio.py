@@ -0,0 +1,83 @@
+"""
+A pyaudio module that plays into nothing, so the benchmarks run without a sound card or PortAudio.
+
+The stream calls its callback in real time from a thread of its own like PortAudio does, so the audio
+of a video is consumed at the speed it would be played and the presentation clock follows it as usual.
+Call install before the package is imported.
+"""
+
+import threading
+import types
+import time
+import sys
+
+paInt16 = 8
+paContinue = 0
+paComplete = 1
+
+class Stream:
+    def __init__(self, rate: int, channels: int, format: int = paInt16, output: bool = True, output_device_index: int = None, frames_per_buffer: int = 1024, stream_callback = None, **kwargs):
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.stream_callback = stream_callback
+
+        # the callback thread exits once the stream is stopped, lock keeps a start from missing that
+        self.active = False
+        self.callback_thread: threading.Thread = None
+        self.lock = threading.Lock()
+        self.start_stream()
+
+    def _internal_callback_thread(self):
+        # the callback is called on a fixed schedule so a slow callback does not slow playback down
+        period = self.frames_per_buffer / self.rate
+        deadline = time.perf_counter()
+
+        while True:
+            with self.lock:
+                if not self.active:
+                    self.callback_thread = None
+                    return
+
+            _, flag = self.stream_callback(None, self.frames_per_buffer, {}, 0)
+            if flag != paContinue:
+                self.active = False
+
+            deadline += period
+            time.sleep(max(0, deadline - time.perf_counter()))
+
+    def write(self, data: bytes):
+        time.sleep(len(data) / (self.rate * self.channels * 2))
+
+    def get_output_latency(self) -> float:
+        return self.frames_per_buffer / self.rate
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def start_stream(self):
+        # the mixer stops the stream while every channel is paused and starts it again when one plays
+        with self.lock:
+            self.active = True
+            if self.stream_callback and self.callback_thread is None:
+                self.callback_thread = threading.Thread(target = self._internal_callback_thread, daemon = True)
+                self.callback_thread.start()
+
+    def stop_stream(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+class PyAudio:
+    def open(self, *args, **kwargs) -> Stream:
+        return Stream(*args, **kwargs)
+
+    def terminate(self):
+        pass
+
+def install():
+    # used in place of pyaudio even when it is installed so the results do not depend on the sound card
+    module = types.ModuleType("pyaudio")
+    module.__dict__.update(paInt16 = paInt16, paContinue = paContinue, paComplete = paComplete, Stream = Stream, PyAudio = PyAudio)
+    sys.modules["pyaudio"] = module
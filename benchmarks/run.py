@@ -0,0 +1,135 @@
+"""
+Runs every benchmark headless, without a display or a sound card, on clips generated by synthetic.py.
+
+    python benchmarks/run.py                                  all clips, results printed as they come in
+    python benchmarks/run.py --quick --json results.json      fewer and shorter clips, for CI
+    python benchmarks/run.py --quick --compare baseline.json  exits with 1 when a result regressed
+
+Results are compared to the baseline per metric, a metric regressed when it is more than tolerance worse.
+Metrics ending in _fps are better when higher, every other one is a time, a size or a cpu share and better when lower.
+"""
+
+import argparse
+import json
+import sys
+import os
+
+# both have to be set up before pygame and the package are imported
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import null_audio
+null_audio.install()
+
+from synthetic import Clip
+import benchmark_vector2
+import benchmark_video
+import benchmark_font
+import pygame
+
+CLIPS = [
+    Clip(320, 240, "h264"),
+    Clip(640, 360, "mpeg4"),
+    Clip(1280, 720, "h264"),
+    Clip(1280, 720, "vp9"),
+    Clip(1920, 1080, "h264"),
+    Clip(1280, 720, "h264", audio = False),
+]
+
+QUICK_CLIPS = [
+    Clip(320, 240, "h264", duration = 6.0),
+    Clip(640, 360, "vp9", duration = 6.0),
+]
+
+def run(quick: bool = False, only: list[str] = None) -> dict:
+    results = {}
+
+    if not only or "vector2" in only:
+        print("vector2")
+        results["vector2"] = benchmark_vector2.run(20000 if quick else 200000)
+
+    if not only or "font" in only:
+        print("font")
+        results["font"] = benchmark_font.run(200 if quick else 2000)
+
+    if not only or "video" in only:
+        pygame.init()
+        display = pygame.display.set_mode((1280, 720))
+        font = benchmark_font.Font("Ariel", 24)
+
+        for clip in QUICK_CLIPS if quick else CLIPS:
+            print(clip.name)
+            results[clip.name] = benchmark_video.measure_clip(clip, font, display, quick)
+            print_metrics(results[clip.name])
+
+        clip = QUICK_CLIPS[0] if quick else Clip(640, 360, "h264")
+        print(f"streams of {clip.name}")
+        results["streams"] = benchmark_video.measure_streams(clip, [1, 4] if quick else [1, 4, 9], font, display, quick)
+        print_metrics(results["streams"])
+
+        # exact seeks get slower with the GOP length of the source, fast ones should not
+        clips = [Clip(640, 360, "h264", duration = 12.0, keyframe_interval = interval) for interval in ((1.0, 4.0) if quick else (0.5, 1.0, 2.0, 5.0))]
+        print("seek modes")
+        results["seek_modes"] = benchmark_video.measure_seek_modes(clips, font, display, quick)
+        print_metrics(results["seek_modes"])
+
+    return results
+
+def print_metrics(metrics: dict[str, float]):
+    for name, value in metrics.items():
+        print(f"    {name:<28} {value:>12.4f}")
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{name}/"))
+        else:
+            flat[prefix + name] = value
+    return flat
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    # returns a line for every metric that is more than tolerance worse than in the baseline
+    regressions = []
+    current = flatten(results)
+
+    for name, old in flatten(baseline).items():
+        new = current.get(name)
+        if new is None or not old:
+            continue
+
+        higher_is_better = name.endswith("_fps")
+        change = (new - old) / abs(old)
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{name}: {old:.6g} -> {new:.6g} ({change:+.0%})")
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = "Headless benchmarks of pygame-video")
+    parser.add_argument("--quick", action = "store_true", help = "fewer and shorter clips")
+    parser.add_argument("--only", action = "append", choices = ["vector2", "font", "video"], help = "only run these benchmarks")
+    parser.add_argument("--json", help = "write the results to this file")
+    parser.add_argument("--compare", help = "a results file to compare against")
+    parser.add_argument("--tolerance", type = float, default = 0.25, help = "how much worse than the baseline a metric can get")
+    arguments = parser.parse_args()
+
+    results = run(arguments.quick, arguments.only)
+
+    if arguments.json:
+        with open(arguments.json, "w") as file:
+            json.dump(results, file, indent = 4)
+
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            regressions = compare(results, json.load(file), arguments.tolerance)
+
+        for regression in regressions:
+            print(f"regression {regression}")
+
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Generates the clips the benchmarks play, a testsrc picture with a sine tone, so no media has to be checked in.
+
+The clips are made with the ffmpeg command line when it is installed and with the same lavfi sources
+through PyAV otherwise. They are kept in the benchmarks directory of the pygame-video cache and only
+generated again when they are missing.
+"""
+
+import subprocess
+import importlib
+import shutil
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# the encoder of every codec name, as ffmpeg and PyAV call it
+ENCODERS = {"h264": "libx264", "mpeg4": "mpeg4", "vp9": "libvpx-vp9"}
+
+# the fastest settings of the slow encoders, the benchmarks measure decoding so the quality does not matter
+ENCODER_OPTIONS = {"h264": {"preset": "veryfast"}, "vp9": {"deadline": "realtime", "cpu-used": "8"}}
+
+class Clip:
+    def __init__(self, width: int, height: int, codec: str = "h264", duration: float = 10.0, framerate: int = 30, audio: bool = True, keyframe_interval: float = 1.0):
+        self.width = width
+        self.height = height
+        self.codec = codec
+        self.duration = duration
+        self.framerate = framerate
+        self.audio = audio
+
+        # seconds between keyframes, a keyframe every second like most real footage by default
+        self.keyframe_interval = keyframe_interval
+
+    @property
+    def gop_size(self) -> int:
+        return max(1, round(self.framerate * self.keyframe_interval))
+
+    @property
+    def name(self) -> str:
+        return f"{self.width}x{self.height} {self.codec}{'' if self.audio else ' silent'}{'' if self.keyframe_interval == 1.0 else f' gop {self.keyframe_interval:g}s'}"
+
+    def file_name(self) -> str:
+        # matroska takes every codec and aac so one container is enough for all of them
+        gop = "" if self.keyframe_interval == 1.0 else f"_gop{self.keyframe_interval:g}s"
+        return f"{self.width}x{self.height}_{self.codec}_{self.framerate}fps_{self.duration:g}s{'' if self.audio else '_silent'}{gop}.mkv"
+
+def clip_directory() -> str:
+    # importing the package needs pyaudio, the benchmarks install null_audio in its place first
+    return importlib.import_module("pygame-video.Cache").cache_directory("benchmarks")
+
+def generate_with_ffmpeg(clip: Clip, path: str):
+    command = [
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size={clip.width}x{clip.height}:rate={clip.framerate}:duration={clip.duration}",
+    ]
+    if clip.audio:
+        command += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={clip.duration}", "-c:a", "aac"]
+
+    # the keyframes are what seeking depends on, scene cut detection is off so they are exactly gop_size apart
+    command += ["-c:v", ENCODERS[clip.codec], "-pix_fmt", "yuv420p", "-g", str(clip.gop_size), "-keyint_min", str(clip.gop_size), "-sc_threshold", "0"]
+    for option, value in ENCODER_OPTIONS.get(clip.codec, {}).items():
+        command += [f"-{option}", value]
+
+    subprocess.run(command + [path], check = True)
+
+def generate_with_av(clip: Clip, path: str):
+    with av.open(path, "w") as output:
+        video = output.add_stream(ENCODERS[clip.codec], rate = clip.framerate)
+        video.width = clip.width
+        video.height = clip.height
+        video.pix_fmt = "yuv420p"
+        video.codec_context.gop_size = clip.gop_size
+        video.options = dict(ENCODER_OPTIONS.get(clip.codec, {}), keyint_min = str(clip.gop_size), sc_threshold = "0")
+
+        sources = [(av.open(f"testsrc=size={clip.width}x{clip.height}:rate={clip.framerate}:duration={clip.duration}", format = "lavfi"), video)]
+
+        if clip.audio:
+            audio = output.add_stream("aac", rate = 48000)
+            audio.layout = "stereo"
+            sources.append((av.open(f"sine=frequency=440:sample_rate=48000:duration={clip.duration}", format = "lavfi"), audio))
+
+        for source, stream in sources:
+            with source:
+                resampler = av.AudioResampler(format = "fltp", layout = "stereo", rate = 48000) if stream.type == "audio" else None
+
+                for frame in source.decode(source.streams[0]):
+                    frames = resampler.resample(frame) if resampler else [frame.reformat(format = "yuv420p")]
+                    for converted in frames:
+                        if resampler is None:
+                            converted.pts = frame.pts
+                            converted.time_base = frame.time_base
+
+                            # lavfi marks every frame as a keyframe, which the encoder would otherwise follow
+                            converted.pict_type = 0
+                        output.mux(stream.encode(converted))
+
+                output.mux(stream.encode(None))
+
+def generate(clip: Clip, directory: str = None) -> str:
+    """
+    Returns the path of clip, generating it first if it does not exist yet.
+    """
+
+    directory = directory or clip_directory()
+    path = os.path.join(directory, clip.file_name())
+    if os.path.exists(path):
+        return path
+
+    # written next to the clip first so an interrupted run does not leave half a clip behind
+    temporary = os.path.join(directory, f"{os.getpid()}.tmp.{clip.file_name()}")
+
+    try:
+        if shutil.which("ffmpeg"):
+            generate_with_ffmpeg(clip, temporary)
+
+        elif av is not None:
+            generate_with_av(clip, temporary)
+
+        else:
+            raise RuntimeError("generating clips needs either ffmpeg or PyAV")
+
+        os.replace(temporary, path)
+
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    return path
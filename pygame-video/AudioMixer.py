@@ -0,0 +1,301 @@
+from typing import Callable, Optional
+import traceback
+import threading
+import atexit
+import time
+import pyaudio
+import numpy
+
+class AudioChannel:
+    def __init__(self, mixer: "AudioMixer", source: Callable[[int], Optional[bytes]], volume: float = 1.0, capacity: float = 0.5):
+        """
+        One player's input to an AudioMixer, a ring of 16 bit PCM in the format of the mixer.
+
+        The mixer calls source with a number of bytes to top the ring up from its feeder thread,
+        source returns less when the stream is running out and b'' when it has ended,
+        and None when it has nothing yet (a live source, or a decoder whose read would block).
+        A source is never waited on, one that is stalled must not hold up the other channels.
+        The output callback takes samples out of the ring, so nothing ever blocks on the sound card.
+        """
+
+        self.mixer = mixer
+        self.source = source
+        self.volume = volume
+
+        self.samples = numpy.zeros(int(capacity * mixer.samplerate) * mixer.channels, numpy.int16)
+
+        # these counters only ever grow until clear, write_count is changed by the feeder and read_count by the output callback
+        self.write_count = 0
+        self.read_count = 0
+        self.lock = threading.Lock()
+
+        # time.monotonic() of when the output callback last took samples
+        self.read_time = time.monotonic()
+
+        # held by the feeder while it reads from source and writes into the ring
+        # a player holds it while seeking so no audio from before the seek is written after the clear
+        self.feed_lock = threading.Lock()
+
+        self._paused = False
+        self.ended = False
+
+        # how many times the output callback needed more audio than the ring had
+        self.underruns = 0
+
+    def __len__(self):
+        return self.write_count - self.read_count
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @paused.setter
+    def paused(self, paused: bool):
+        # the mixer stops the sound card while every channel is paused, so it has to hear about changes
+        if paused != self._paused:
+            self._paused = paused
+            self.mixer.notify()
+
+    def space(self) -> int:
+        return len(self.samples) - (self.write_count - self.read_count)
+
+    def played_seconds(self) -> float:
+        # how much of the audio written since the last clear has been handed to the sound card
+        return self.read_count / (self.mixer.samplerate * self.mixer.channels)
+
+    def write(self, data: bytes) -> bool:
+        pcm = numpy.frombuffer(data, numpy.int16)
+
+        with self.lock:
+            if len(pcm) > self.space():
+                return False
+
+            start = self.write_count % len(self.samples)
+            first = min(len(pcm), len(self.samples) - start)
+            self.samples[start:start + first] = pcm[:first]
+            self.samples[:len(pcm) - first] = pcm[first:]
+            self.write_count += len(pcm)
+
+        return True
+
+    def mix_into(self, output: numpy.ndarray):
+        # adds up to len(output) samples onto output, an underrun is left silent
+        with self.lock:
+            count = min(len(output), self.write_count - self.read_count)
+            start = self.read_count % len(self.samples)
+            first = min(count, len(self.samples) - start)
+
+            if self.volume == 1.0:
+                output[:first] += self.samples[start:start + first]
+                output[first:count] += self.samples[:count - first]
+
+            else:
+                output[:first] += (self.samples[start:start + first] * self.volume).astype(numpy.int32)
+                output[first:count] += (self.samples[:count - first] * self.volume).astype(numpy.int32)
+
+            self.read_count += count
+            self.read_time = time.monotonic()
+
+            if count < len(output) and not self.ended:
+                self.underruns += 1
+
+    def clear(self):
+        # called on a seek while holding feed_lock, the audio that is waiting in the ring belongs to the old position
+        with self.lock:
+            self.write_count = 0
+            self.read_count = 0
+            self.ended = False
+
+        self.mixer.notify()
+
+    def close(self):
+        self.mixer.remove(self)
+
+class AudioMixer:
+    # one PortAudio host for the whole process, created by the first mixer
+    host: pyaudio.PyAudio = None
+    mixers: dict[Optional[int], "AudioMixer"] = {}
+    mixers_lock = threading.Lock()
+
+    def __init__(self, output_device_index: int = None, samplerate: int = 48000, channels: int = 2, frames_per_buffer: int = 1024):
+        """
+        Mixes the audio of every player on one output device in a single callback mode stream.
+
+        Use AudioMixer.get to share one mixer per device instead of creating them directly, and release
+        it when done so the device is closed once nothing uses it. Players decode their audio in the
+        format of the mixer, see Video.extract_metadata. While every channel is paused the stream is
+        stopped and the feeder sleeps, so idle players cost no cpu.
+        """
+
+        self.output_device_index = output_device_index
+        self.samplerate = samplerate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+
+        self.audio_channels: list[AudioChannel] = []
+        self.lock = threading.Lock()
+
+        # notified by the output callback whenever samples were taken out of the rings
+        # notified is set by notify so a wakeup that comes while the feeder is busy is not lost
+        self.wakeup = threading.Condition()
+        self.notified = False
+        self.running = True
+
+        # how many players got this mixer from get and have not released it yet
+        self.users = 0
+        self.stream_active = True
+
+        if AudioMixer.host is None:
+            AudioMixer.host = pyaudio.PyAudio()
+
+        self.stream = AudioMixer.host.open(
+            samplerate, channels, pyaudio.paInt16, output = True, output_device_index = output_device_index,
+            frames_per_buffer = frames_per_buffer, stream_callback = self._callback
+        )
+
+        threading.Thread(target = self._internal_feeder_thread, daemon = True).start()
+
+    @classmethod
+    def get(cls, output_device_index: int = None):
+        with cls.mixers_lock:
+            mixer = cls.mixers.get(output_device_index)
+            if mixer is None:
+                mixer = cls.mixers[output_device_index] = cls(output_device_index)
+            mixer.users += 1
+            return mixer
+
+    def release(self):
+        # the mixer is closed once the last player that got it from get lets go of it
+        with AudioMixer.mixers_lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+
+            if AudioMixer.mixers.get(self.output_device_index) is self:
+                del AudioMixer.mixers[self.output_device_index]
+
+        self.close()
+
+    @classmethod
+    def shutdown(cls):
+        # closes every shared mixer and the PortAudio host, this is registered to run when the interpreter exits
+        with cls.mixers_lock:
+            mixers, cls.mixers = list(cls.mixers.values()), {}
+
+        for mixer in mixers:
+            mixer.close()
+
+        if cls.host is not None:
+            cls.host.terminate()
+            cls.host = None
+
+    def add(self, source: Callable[[int], Optional[bytes]], volume: float = 1.0, paused: bool = False) -> AudioChannel:
+        channel = AudioChannel(self, source, volume)
+        channel.paused = paused
+        with self.lock:
+            self.audio_channels.append(channel)
+        self.notify()
+        return channel
+
+    def remove(self, channel: AudioChannel):
+        with self.lock:
+            if channel in self.audio_channels:
+                self.audio_channels.remove(channel)
+
+    def latency(self) -> float:
+        # how long it takes for a sample handed to the sound card to be heard
+        try:
+            return self.stream.get_output_latency()
+        except Exception:
+            return 0.0
+
+    def notify(self):
+        with self.wakeup:
+            self.notified = True
+            self.wakeup.notify()
+
+    def set_stream_active(self, active: bool):
+        # only called by the feeder thread, PortAudio streams can not be stopped from their own callback
+        try:
+            if active:
+                self.stream.start_stream()
+            else:
+                self.stream.stop_stream()
+            self.stream_active = active
+
+        except Exception as error:
+            traceback.print_exception(error)
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        output = numpy.zeros(frame_count * self.channels, numpy.int32)
+
+        with self.lock:
+            audio_channels = [channel for channel in self.audio_channels if not channel.paused]
+
+        for channel in audio_channels:
+            channel.mix_into(output)
+
+        self.notify()
+        return numpy.clip(output, -32768, 32767).astype(numpy.int16).tobytes(), pyaudio.paContinue
+
+    def _internal_feeder_thread(self):
+        # reads from every source whose ring has room so no player needs a thread of its own
+        chunk = self.frames_per_buffer * self.channels
+
+        while self.running:
+            fed = False
+            polling = False
+
+            with self.lock:
+                audio_channels = list(self.audio_channels)
+
+            for channel in audio_channels:
+                # a paused channel is still filled so it starts without a gap when it is unpaused
+                if channel.ended or channel.space() < chunk:
+                    continue
+
+                with channel.feed_lock:
+                    try:
+                        data = channel.source(chunk * 2)
+
+                    except Exception as error:
+                        traceback.print_exception(error)
+                        data = b''
+
+                    if data is None:
+                        # a paused channel is asked again once it is unpaused, which notifies the feeder
+                        polling = polling or not channel.paused
+                        continue
+
+                    if not data:
+                        channel.ended = True
+                        continue
+
+                    # a source can return an odd number of bytes at the very end
+                    channel.write(data[:len(data) - len(data) % 2])
+                    fed = True
+
+            # nothing is heard while every channel is paused so the sound card is stopped until one is unpaused
+            active = any(not channel.paused for channel in audio_channels)
+            if active != self.stream_active and self.running:
+                self.set_stream_active(active)
+
+            if not fed:
+                # a live source that had nothing yet is asked again soon, otherwise the feeder sleeps until it is notified
+                with self.wakeup:
+                    if not self.notified:
+                        self.wakeup.wait(self.frames_per_buffer / self.samplerate if polling else None)
+                    self.notified = False
+
+    def close(self):
+        self.running = False
+        self.notify()
+
+        try:
+            self.stream.stop_stream()
+            self.stream.close()
+
+        except Exception as error:
+            traceback.print_exception(error)
+
+atexit.register(AudioMixer.shutdown)
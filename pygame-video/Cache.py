@@ -0,0 +1,42 @@
+import threading
+import hashlib
+import os
+
+def cache_directory(*parts: str) -> str:
+    """
+    Returns (and creates) a directory inside the pygame-video cache, which follows XDG_CACHE_HOME.
+    """
+
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    directory = os.path.join(root, "pygame-video", *parts)
+    os.makedirs(directory, exist_ok = True)
+    return directory
+
+def file_key(path: str, sample_size: int = 1024 * 1024) -> str:
+    """
+    A hash that identifies the contents of a file without reading all of it.
+
+    The size and the first and last sample_size bytes are hashed, which is enough to tell
+    media files apart while staying cheap for recordings that are many gigabytes long.
+    """
+
+    digest = hashlib.sha1()
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+
+    with open(path, "rb") as file:
+        digest.update(file.read(sample_size))
+        if size > sample_size:
+            file.seek(max(sample_size, size - sample_size))
+            digest.update(file.read(sample_size))
+
+    return digest.hexdigest()
+
+def temporary_path(path: str) -> str:
+    """
+    A path next to path to write to first and then os.replace over path, so nothing ever reads a half written file.
+    It is unique for every thread, the extension is kept so the file type can still be told from it.
+    """
+
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{extension}"
@@ -0,0 +1,865 @@
+from .Metadata import Metadata
+from typing import Optional
+import multiprocessing
+import fractions
+import subprocess
+import collections
+import traceback
+import threading
+import numpy
+import time
+import mmap
+import os
+
+try:
+    import av
+except ImportError:
+    av = None
+
+def read_exact(stream, view: memoryview) -> bool:
+    # pipes can return less than was asked for so keep reading until the view is full
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            return False
+        filled += count
+    return True
+
+def channel_layout(channels: int) -> str:
+    # PyAV wants a layout name rather than a channel count
+    return {1: "mono", 2: "stereo", 6: "5.1", 8: "7.1"}.get(channels, f"{channels}c")
+
+def atempo_filters(tempo: float) -> list[str]:
+    # a single atempo only goes from half to double speed in older ffmpeg versions so bigger changes are chained
+    filters = []
+    while tempo > 2.0:
+        filters.append("atempo=2.0")
+        tempo /= 2.0
+    while tempo < 0.5:
+        filters.append("atempo=0.5")
+        tempo /= 0.5
+    filters.append(f"atempo={tempo}")
+    return filters
+
+def rational_rate(framerate: float) -> fractions.Fraction:
+    # the exact frame rate behind a probed float, 29.97002997 is 30000/1001 and 25.0 is 25
+    return fractions.Fraction(framerate).limit_denominator(1001)
+
+# the ffmpeg names of the pixel formats in FrameBuffer.PIXEL_FORMAT_BYTES
+FFMPEG_PIXEL_FORMATS = {"RGB": "rgb24", "BGRA": "bgra"}
+
+def copy_frame(frame: "av.VideoFrame", view: memoryview, size: tuple[int, int], pixel_format: str):
+    # scales and converts a decoded frame into view
+    width, height = size
+    converted = frame.reformat(width, height, FFMPEG_PIXEL_FORMATS[pixel_format])
+    plane = converted.planes[0]
+    row_bytes = len(view) // height
+
+    if plane.line_size == row_bytes:
+        view[:] = memoryview(plane)[:len(view)]
+
+    else:
+        # rows are padded for alignment so copy them one at a time
+        source = memoryview(plane)
+        for y in range(height):
+            view[y * row_bytes:(y + 1) * row_bytes] = source[y * plane.line_size:y * plane.line_size + row_bytes]
+
+class SubprocessDecoder:
+    def __init__(self, source: str, size: Optional[tuple[int, int]], framerate: float, samplerate: Optional[int], channels: int):
+        """
+        Decodes raw frames and s16le pcm by piping them out of a single ffmpeg process.
+
+        The source is demuxed once, the video comes out of stdout and the audio out of a second pipe.
+        Pass size or samplerate as None to leave out the video or the audio.
+        Seeking has to respawn the process, this is the fallback for when PyAV is not installed.
+        Changes to size, pixel_format, threads, tempo and mute are picked up by the next seek.
+        """
+
+        self.source = source
+        self.size = (int(size[0]), int(size[1])) if size else None
+        self.pixel_format = "RGB"
+
+        # the number of decoding threads, 0 lets ffmpeg decide
+        self.threads = 0
+
+        # how much faster than normal the audio is played, the pitch stays the same
+        self.tempo = 1.0
+
+        # leaves out the audio while nobody listens to it, ffmpeg would stop writing video once the audio pipe is full
+        self.mute = False
+        self.framerate = framerate
+        self.samplerate = samplerate
+        self.channels = channels
+
+        self.process: subprocess.Popen = None
+        self.video_stream = None
+        self.audio_stream = None
+
+        # only used where file descriptors can not be passed to ffmpeg, then the audio needs its own process
+        self.audio_process: subprocess.Popen = None
+
+        self.offset = 0.0
+        self.frame_index = 0
+
+    def video_arguments(self) -> list[str]:
+        return ["-map", "0:v:0", "-filter:v", "setpts=PTS-STARTPTS", "-r", str(rational_rate(self.framerate)), "-s", f"{self.size[0]}x{self.size[1]}", "-f", "rawvideo", "-pix_fmt", FFMPEG_PIXEL_FORMATS[self.pixel_format]]
+
+    def audio_arguments(self) -> list[str]:
+        filters = ["asetpts=PTS-STARTPTS"] + (atempo_filters(self.tempo) if self.tempo != 1.0 else [])
+        return ["-map", "0:a:0", "-filter:a", ",".join(filters), "-f", "s16le", "-ar", str(self.samplerate), "-ac", str(self.channels)]
+
+    def seek(self, offset: float):
+        self.close()
+        self.offset = offset
+        self.frame_index = 0
+
+        command = ["ffmpeg", "-v", "error", "-hwaccel", "auto", "-seek_timestamp", "1", "-threads", str(self.threads), "-ss", str(offset), "-i", self.source]
+        audio = self.samplerate and not self.mute
+        if not self.size and not audio:
+            return # there is nothing to decode until the audio is unmuted
+
+        if self.size:
+            command += self.video_arguments() + ["pipe:1"]
+
+        if audio and not self.size:
+            command += self.audio_arguments() + ["pipe:1"]
+
+        elif audio and os.name == "nt":
+            self.audio_process = subprocess.Popen(
+                ["ffmpeg", "-v", "error", "-seek_timestamp", "1", "-ss", str(offset), "-i", self.source] + self.audio_arguments() + ["pipe:1"],
+                stdout = subprocess.PIPE, shell = False
+            )
+            self.audio_stream = self.audio_process.stdout
+
+        elif audio:
+            # the audio is written to a second pipe that ffmpeg inherits under the same descriptor number
+            read_fd, write_fd = os.pipe()
+            command += self.audio_arguments() + [f"pipe:{write_fd}"]
+
+            try:
+                self.process = subprocess.Popen(command, stdout = subprocess.PIPE, shell = False, pass_fds = (write_fd,))
+
+            except BaseException:
+                os.close(read_fd)
+                raise
+
+            finally:
+                # ffmpeg has its own copy of the write end, the pipe ends once it exits
+                os.close(write_fd)
+
+            # ffmpeg stops writing audio while nobody takes its frames, a blocking read would hold up the shared mixer
+            # unbuffered so a read returns None instead of raising when there is nothing in the pipe yet
+            os.set_blocking(read_fd, False)
+            self.audio_stream = os.fdopen(read_fd, "rb", buffering = 0)
+            self.video_stream = self.process.stdout
+            return
+
+        self.process = subprocess.Popen(command, stdout = subprocess.PIPE, shell = False)
+        if self.size:
+            self.video_stream = self.process.stdout
+        else:
+            self.audio_stream = self.process.stdout
+
+    def read_into(self, view: memoryview, skip_before: float = None) -> Optional[float]:
+        """
+        Fills view with the next frame and returns its timestamp, or None at the end of the stream.
+        Frames with a timestamp before skip_before are passed over.
+        """
+
+        while True:
+            stream = self.video_stream
+            if not stream:
+                return None
+
+            try:
+                if not read_exact(stream, view):
+                    return None
+
+            except (OSError, ValueError):
+                return None # the pipe was closed while reading
+
+            pts = self.offset + self.frame_index / self.framerate
+            self.frame_index += 1
+
+            if skip_before is None or pts >= skip_before:
+                return pts
+
+    def read(self, size: int) -> Optional[bytes]:
+        """
+        Returns up to size bytes of pcm and b'' at the end of the stream.
+
+        When the audio shares a process with the video this never waits, it returns what is in the pipe
+        and None when there is nothing, because ffmpeg can not write audio while its video pipe is full.
+        """
+
+        stream = self.audio_stream
+        if not stream:
+            return b''
+
+        try:
+            return stream.read(size)
+
+        except (OSError, ValueError):
+            return b''
+
+    def interrupt(self):
+        # makes a read that is blocked on a pipe return
+        for process in (self.process, self.audio_process):
+            if process:
+                process.terminate()
+
+    def close(self):
+        processes = (self.process, self.audio_process)
+        streams = (self.video_stream, self.audio_stream)
+        self.process = self.audio_process = None
+        self.video_stream = self.audio_stream = None
+
+        for process in processes:
+            if process:
+                process.terminate()
+
+        for stream in streams:
+            if stream:
+                stream.close()
+
+        for process in processes:
+            if process:
+                process.wait()
+
+class AVDecoder:
+    def __init__(self, source: str, size: Optional[tuple[int, int]], framerate: float, samplerate: Optional[int], channels: int):
+        """
+        Decodes raw frames and s16le pcm in process with PyAV.
+
+        The container stays open for the lifetime of the decoder and is demuxed once for both streams.
+        Whichever of read_into and read needs more data demuxes the next packet. Audio packets are decoded
+        straight away, video packets are queued and only decoded by read_into, outside of the lock, so the
+        shared mixer thread that calls read never decodes video or waits for a frame to be decoded. Seeking moves the demuxer in place and decodes forward from the previous keyframe.
+        Frames are scaled and converted to size and pixel_format as they are read so changes apply straight away.
+        A change to threads reopens the container on the next seek, the codec can not change it once it is open.
+        The audio goes through an atempo filter when tempo is not 1, which is picked up by the next seek.
+        While mute the audio packets are not demuxed at all, which is also picked up by the next seek.
+        """
+
+        self.source = source
+        self.size = (int(size[0]), int(size[1])) if size else None
+        self.pixel_format = "RGB"
+        self.framerate = framerate
+        self.samplerate = samplerate
+        self.channels = channels
+
+        # the number of decoding threads, 0 lets the codec decide
+        self.threads = 0
+
+        # how much faster than normal the audio is played, the pitch stays the same
+        self.tempo = 1.0
+        self.stretcher: "av.filter.Graph" = None
+
+        # the audio would pile up in pending while nobody reads it
+        self.mute = False
+        self.open_container()
+
+        # a single container is not safe to use from more than one thread at a time
+        self.lock = threading.Lock()
+        self.packets = None
+        self.offset = 0.0
+        self.muted = False
+
+        self.video_packets = collections.deque()
+        self.video_frames = collections.deque()
+        self.pending = bytearray()
+        self.resampler = None
+        self.trim = False
+
+    def open_container(self):
+        self.container = av.open(self.source)
+        self.video_stream = self.container.streams.video[0] if self.size else None
+        self.audio_stream = self.container.streams.audio[0] if self.samplerate else None
+        self.container_threads = self.threads
+
+        if self.video_stream:
+            self.video_stream.thread_type = "AUTO"
+            self.video_stream.codec_context.thread_count = self.threads
+
+    def seek(self, offset: float):
+        with self.lock:
+            if self.threads != self.container_threads:
+                self.container.close()
+                self.open_container()
+
+            self.offset = offset
+            self.muted = self.mute
+            audio_stream = self.audio_stream if not self.muted else None
+            self.container.seek(int(offset * av.time_base), backward = True)
+            self.packets = self.container.demux(*[stream for stream in (self.video_stream, audio_stream) if stream])
+
+            self.video_packets.clear()
+            self.video_frames.clear()
+            self.pending.clear()
+            if audio_stream:
+                self.resampler = av.AudioResampler(format = "s16", layout = channel_layout(self.channels), rate = self.samplerate)
+                self.stretcher = self.open_stretcher() if self.tempo != 1.0 else None
+                self.stretched_samples = 0
+            else:
+                self.stretcher = None
+            self.trim = True
+
+    def open_stretcher(self) -> "av.filter.Graph":
+        # abuffer -> atempo ... -> abuffersink, in the format the resampler produces
+        graph = av.filter.Graph()
+        node = graph.add_abuffer(
+            format = "s16", layout = channel_layout(self.channels), sample_rate = self.samplerate,
+            time_base = fractions.Fraction(1, self.samplerate)
+        )
+
+        for atempo in atempo_filters(self.tempo):
+            name, _, argument = atempo.partition("=")
+            following = graph.add(name, argument)
+            node.link_to(following)
+            node = following
+
+        node.link_to(graph.add("abuffersink"))
+        graph.configure()
+        return graph
+
+    def _stretch(self, data: Optional[memoryview]):
+        # pushes pcm through the stretcher and queues what comes out, None flushes it at the end of the stream
+        if data is not None:
+            samples = len(data) // (self.channels * 2)
+            frame = av.AudioFrame.from_ndarray(
+                numpy.frombuffer(data, numpy.int16).reshape(1, -1), format = "s16", layout = channel_layout(self.channels)
+            )
+            frame.sample_rate = self.samplerate
+            frame.time_base = fractions.Fraction(1, self.samplerate)
+            frame.pts = self.stretched_samples
+            self.stretched_samples += samples
+
+        self.stretcher.push(frame if data is not None else None)
+
+        while True:
+            try:
+                stretched = self.stretcher.pull()
+            except (av.BlockingIOError, av.EOFError):
+                return
+            self.pending += memoryview(stretched.planes[0])[:stretched.samples * self.channels * 2]
+
+    def _demux_next(self) -> bool:
+        for packet in self.packets:
+            if packet.stream is self.video_stream:
+                self.video_packets.append(packet)
+
+            elif packet.stream is self.audio_stream:
+                for frame in packet.decode():
+                    self._queue_audio(frame)
+
+            return True
+
+        self.packets = None
+        if self.stretcher:
+            self._stretch(None)
+        return False
+
+    def _queue_audio(self, frame):
+        start = frame.time
+        for resampled in self.resampler.resample(frame):
+            data = memoryview(resampled.planes[0])[:resampled.samples * self.channels * 2]
+
+            if self.trim and start is not None:
+                skip = int((self.offset - start) * self.samplerate) * self.channels * 2
+                if skip >= len(data):
+                    continue
+                data = data[max(0, skip):]
+            self.trim = False
+
+            if self.stretcher:
+                self._stretch(data)
+            else:
+                self.pending += data
+
+    def read_into(self, view: memoryview, skip_before: float = None) -> Optional[float]:
+        half_frame = 0.5 / self.framerate
+
+        while True:
+            with self.lock:
+                while not self.video_frames and not self.video_packets and self.packets is not None:
+                    self._demux_next()
+
+                frame = self.video_frames.popleft() if self.video_frames else None
+                packet = self.video_packets.popleft() if frame is None and self.video_packets else None
+                if frame is None and packet is None:
+                    return None
+
+            if packet is not None:
+                # decoded outside of the lock so the audio can keep demuxing, only this thread uses the video codec
+                # frames before the offset are only decoded because the seek landed on an earlier keyframe
+                self.video_frames.extend(frame for frame in packet.decode() if frame.time is None or frame.time >= self.offset - half_frame)
+                continue
+
+            # skipped frames are never converted which is where most of the time per frame goes
+            if skip_before is None or frame.time is None or frame.time >= skip_before:
+                break
+
+        # the conversion happens outside of the lock too
+        copy_frame(frame, view, self.size, self.pixel_format)
+        return frame.time if frame.time is not None else self.offset
+
+    def read(self, size: int) -> Optional[bytes]:
+        # called by the mixer thread that every video shares, it asks again later instead of waiting for the reader
+        if not self.lock.acquire(blocking = False):
+            return None
+
+        try:
+            # demuxing for audio that is not there would queue up the rest of the video
+            if self.muted:
+                return b''
+
+            while len(self.pending) < size and self.packets is not None:
+                self._demux_next()
+
+            data = bytes(self.pending[:size])
+            del self.pending[:size]
+            return data
+
+        finally:
+            self.lock.release()
+
+    def interrupt(self):
+        # demuxing and decoding a single packet never blocks for long so there is nothing to interrupt
+        pass
+
+    def close(self):
+        with self.lock:
+            self.packets = None
+            self.video_packets.clear()
+            self.video_frames.clear()
+            self.container.close()
+
+class LiveDecoder:
+    def __init__(self, source: str, max_buffer: float = 2.0, reconnect: bool = None, timeout: float = 5.0, options: dict = None):
+        """
+        Receives a live stream (stdin or a network url) with PyAV and decodes it as it comes in.
+
+        A receiver thread demuxes and decodes into a jitter buffer of timestamped frames and pcm that
+        read_into and read take from, holding at most max_buffer seconds so a player that falls behind
+        does not run out of memory. seek only drops what is buffered before the offset, a live stream
+        can not go back. When the connection drops or a read takes longer than timeout, the stream is
+        opened again with an exponential backoff, which is the default for everything but stdin.
+        The timestamps start at 0 and carry on across reconnects, including the time it was gone for.
+
+        Call connect first to get the metadata, then set size, framerate, samplerate and channels like
+        the arguments of the other decoders before the first seek.
+        """
+
+        if av is None:
+            raise ImportError("playing live sources needs PyAV")
+
+        self.source = "pipe:0" if source == "-" else source
+        self.size: Optional[tuple[int, int]] = None
+        self.pixel_format = "RGB"
+        self.framerate = 30.0
+        self.samplerate: Optional[int] = None
+        self.channels = 2
+        self.threads = 0
+
+        # live audio is always played at normal speed, these are only here to match the other decoders
+        self.tempo = 1.0
+        self.mute = False
+
+        self.max_buffer = max_buffer
+        self.reconnect = not self.source.startswith("pipe:") if reconnect is None else reconnect
+        self.timeout = timeout
+
+        # nobuffer keeps the demuxer from holding packets back, rtsp over tcp does not lose packets
+        self.options = {"fflags": "nobuffer"}
+        if self.source.startswith("rtsp"):
+            self.options["rtsp_transport"] = "tcp"
+        self.options.update(options or {})
+
+        # the seconds to wait before the first reconnect, it doubles up to max_backoff while reconnecting keeps failing
+        self.backoff = 0.5
+        self.max_backoff = 8.0
+        self.failures = 0
+
+        self.container = None
+        self.video_stream = None
+        self.audio_stream = None
+        self.resampler = None
+
+        # guards everything below, notified whenever the jitter buffer changes
+        self.condition = threading.Condition()
+        self.video_frames: collections.deque[tuple[float, "av.VideoFrame"]] = collections.deque()
+        self.audio_chunks: collections.deque[tuple[float, bytes]] = collections.deque()
+
+        # the timestamp of the newest frame or audio that was received
+        self.edge: Optional[float] = None
+        self.received_at = 0.0
+
+        # what is added to the timestamps of the current connection to continue from the last one
+        self.shift: Optional[float] = None
+
+        self.interrupted = False
+        self.ended = False
+        self.closed = False
+
+        # counters for get_stats
+        self.reconnects = 0
+        self.frames_discarded = 0
+
+        self.receiver_thread: threading.Thread = None
+
+    def connect(self) -> Metadata:
+        # opens the stream and returns its metadata, the receiver thread calls this again to reconnect
+        self.container = av.open(self.source, options = self.options, timeout = self.timeout)
+        self.video_stream = self.container.streams.video[0] if self.container.streams.video else None
+        self.audio_stream = self.container.streams.audio[0] if self.container.streams.audio else None
+        self.resampler = None
+
+        if self.video_stream:
+            self.video_stream.thread_type = "AUTO"
+            self.video_stream.codec_context.thread_count = self.threads
+
+        return Metadata.from_container(self.container, live = True)
+
+    def disconnect(self):
+        container, self.container = self.container, None
+        if container:
+            container.close()
+
+    def stamp(self, stream_time: Optional[float]) -> Optional[float]:
+        # moves a timestamp of the current connection onto the timeline of the whole stream
+        if stream_time is None:
+            return None
+
+        with self.condition:
+            if self.shift is None:
+                # a new connection continues after the last one, the time it took to reconnect included
+                start = 0.0 if self.edge is None else self.edge + (time.monotonic() - self.received_at)
+                self.shift = start - stream_time
+
+            pts = stream_time + self.shift
+
+            # the timestamps of some streams wrap around or jump, that is taken as a new start right after the last one
+            if self.edge is not None and abs(pts - self.edge) > max(5.0, self.max_buffer):
+                self.shift = self.edge + 1 / self.framerate - stream_time
+                pts = self.edge + 1 / self.framerate
+
+            return pts
+
+    def _queue(self, queue: collections.deque, pts: float, item):
+        # must be called while holding self.condition
+        queue.append((pts, item))
+        if self.edge is None or pts > self.edge:
+            self.edge = pts
+            self.received_at = time.monotonic()
+
+        # a player that can not keep up only ever gets the newest max_buffer seconds
+        while queue and pts - queue[0][0] > self.max_buffer:
+            queue.popleft()
+            if queue is self.video_frames:
+                self.frames_discarded += 1
+
+        self.condition.notify_all()
+
+    def _receive(self):
+        # demuxes the current connection until it ends, every packet that was received resets the backoff
+        streams = [stream for stream in (self.video_stream if self.size else None, self.audio_stream if self.samplerate else None) if stream]
+
+        for packet in self.container.demux(*streams):
+            if self.closed:
+                return
+
+            if packet.stream is self.video_stream:
+                for frame in packet.decode():
+                    pts = self.stamp(frame.time)
+                    if pts is not None:
+                        with self.condition:
+                            self._queue(self.video_frames, pts, frame)
+
+            elif packet.stream is self.audio_stream:
+                if self.resampler is None:
+                    self.resampler = av.AudioResampler(format = "s16", layout = channel_layout(self.channels), rate = self.samplerate)
+
+                for frame in packet.decode():
+                    pts = self.stamp(frame.time)
+                    if pts is None:
+                        continue
+
+                    for resampled in self.resampler.resample(frame):
+                        data = bytes(memoryview(resampled.planes[0])[:resampled.samples * self.channels * 2])
+                        with self.condition:
+                            self._queue(self.audio_chunks, pts, data)
+                        pts += resampled.samples / self.samplerate
+
+            self.failures = 0
+
+    def _internal_receiver_thread(self):
+        while not self.closed:
+            try:
+                if self.container is None:
+                    self.connect()
+                self._receive()
+
+            except Exception as error:
+                if not self.closed and not self.reconnect:
+                    traceback.print_exception(error)
+
+            finally:
+                self.disconnect()
+                self.shift = None
+
+            if self.closed or not self.reconnect:
+                break
+
+            delay = min(self.max_backoff, self.backoff * 2 ** self.failures)
+            self.failures += 1
+            self.reconnects += 1
+
+            with self.condition:
+                self.condition.wait_for(lambda: self.closed, delay)
+
+        with self.condition:
+            self.ended = True
+            self.condition.notify_all()
+
+    def seek(self, offset: float):
+        # a live stream only goes forward, so this drops what was received before offset
+        with self.condition:
+            half_frame = 0.5 / self.framerate
+            while self.video_frames and self.video_frames[0][0] < offset - half_frame:
+                self.video_frames.popleft()
+
+            bytes_per_second = (self.samplerate or 0) * self.channels * 2
+            while self.audio_chunks:
+                pts, data = self.audio_chunks[0]
+                skip = int((offset - pts) * bytes_per_second) // (self.channels * 2) * self.channels * 2
+                if skip <= 0:
+                    break
+
+                self.audio_chunks.popleft()
+                if skip < len(data):
+                    self.audio_chunks.appendleft((offset, data[skip:]))
+                    break
+
+            self.interrupted = False
+
+        if self.receiver_thread is None:
+            self.receiver_thread = threading.Thread(target = self._internal_receiver_thread, daemon = True)
+            self.receiver_thread.start()
+
+    def read_into(self, view: memoryview, skip_before: float = None) -> Optional[float]:
+        # waits for the next frame, None once the stream has ended or the read was interrupted
+        with self.condition:
+            while True:
+                self.condition.wait_for(lambda: self.video_frames or self.ended or self.interrupted)
+                if self.interrupted or not self.video_frames:
+                    return None
+
+                pts, frame = self.video_frames.popleft()
+                if skip_before is None or pts >= skip_before:
+                    break
+
+        copy_frame(frame, view, self.size, self.pixel_format)
+        return pts
+
+    def read(self, size: int) -> Optional[bytes]:
+        """
+        Returns up to size bytes of the pcm that has been received, None when nothing has come in yet
+        and b'' once the stream has ended. This never waits so the mixer is not held up by the network.
+        """
+
+        with self.condition:
+            if not self.audio_chunks:
+                return b'' if self.ended else None
+
+            data = bytearray()
+            bytes_per_second = self.samplerate * self.channels * 2
+            while self.audio_chunks and len(data) < size:
+                pts, chunk = self.audio_chunks.popleft()
+                taken = chunk[:size - len(data)]
+                data += taken
+
+                if len(taken) < len(chunk):
+                    self.audio_chunks.appendleft((pts + len(taken) / bytes_per_second, chunk[len(taken):]))
+
+            return bytes(data)
+
+    def buffered(self) -> float:
+        # how many seconds of video (or audio without video) are waiting to be read
+        with self.condition:
+            queue = self.video_frames if self.size else self.audio_chunks
+            return queue[-1][0] - queue[0][0] if queue else 0.0
+
+    def interrupt(self):
+        with self.condition:
+            self.interrupted = True
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+        # a read that is waiting on the network returns once the timeout has passed
+        if self.receiver_thread:
+            self.receiver_thread.join(self.timeout + 1)
+        else:
+            self.disconnect()
+
+        with self.condition:
+            self.video_frames.clear()
+            self.audio_chunks.clear()
+
+def open_decoder(source: str, size: Optional[tuple[int, int]], framerate: float, samplerate: Optional[int], channels: int, backend: str = "auto"):
+    """
+    Opens the best available decoder, backend can be "auto", "av" or "ffmpeg".
+    """
+
+    if backend in ("auto", "av") and av is not None:
+        try:
+            return AVDecoder(source, size, framerate, samplerate, channels)
+
+        except Exception:
+            if backend == "av":
+                raise
+
+    return SubprocessDecoder(source, size, framerate, samplerate, channels)
+
+def _decoder_process_main(connection, arguments: tuple, backend: str):
+    # runs in the decoder process, it serves the requests of a ProcessDecoder one at a time
+    decoder = open_decoder(*arguments, backend)
+    mapping: mmap.mmap = None
+    views: list[memoryview] = []
+
+    while True:
+        try:
+            command, *parameters = connection.recv()
+
+        except EOFError:
+            command, parameters = "close", ()
+
+        try:
+            result = None
+
+            if command == "attach":
+                path, frame_bytes, slots = parameters
+                for view in views:
+                    view.release()
+
+                with open(path, "r+b") as file:
+                    mapping = mmap.mmap(file.fileno(), frame_bytes * slots)
+                memory = memoryview(mapping)
+                views = [memory[i * frame_bytes:(i + 1) * frame_bytes] for i in range(slots)]
+
+            elif command == "seek":
+                offset, decoder.size, decoder.pixel_format, decoder.threads, decoder.tempo, decoder.mute = parameters
+                decoder.seek(offset)
+
+            elif command == "read_into":
+                index, skip_before = parameters
+                result = decoder.read_into(views[index], skip_before)
+
+            elif command == "read":
+                result = decoder.read(parameters[0])
+
+            elif command == "close":
+                decoder.close()
+                return
+
+            connection.send(("ok", result))
+
+        except Exception as error:
+            connection.send(("error", error))
+
+class ProcessDecoder:
+    def __init__(self, source: str, size: Optional[tuple[int, int]], framerate: float, samplerate: Optional[int], channels: int, backend: str = "auto"):
+        """
+        Runs a decoder in its own process that decodes frames straight into the shared slots of a FrameBuffer.
+
+        Only the timestamps and the (much smaller) pcm cross the process boundary, the frames never get copied
+        through a pipe and decoding does not compete with the player for the GIL. attach has to be called with
+        every FrameBuffer the frames should be decoded into before it is read into.
+        """
+
+        self.size = (int(size[0]), int(size[1])) if size else None
+        self.pixel_format = "RGB"
+        self.threads = 0
+        self.tempo = 1.0
+        self.mute = False
+
+        # spawn instead of fork because the parent has threads and an SDL context that should not be copied
+        context = multiprocessing.get_context("spawn")
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target = _decoder_process_main,
+            args = (child_connection, (source, size, framerate, samplerate, channels), backend),
+            daemon = True
+        )
+        self.process.start()
+        child_connection.close()
+
+        # the connection is shared between the reader and the audio thread and a request has to get its own reply
+        self.lock = threading.Lock()
+        self.slot_indices: dict[int, int] = {}
+
+    def call(self, *command):
+        with self.lock:
+            self.connection.send(command)
+            status, result = self.connection.recv()
+
+        if status == "error":
+            raise result
+        return result
+
+    def attach(self, frame_buffer):
+        self.call("attach", frame_buffer.shared_path, frame_buffer.frame_bytes, len(frame_buffer.slots))
+        frame_buffer.release_shared_path()
+
+        # the views of the slots are long lived so they can be used to look up which slot is being read into
+        self.slot_indices = {id(slot.view): slot.index for slot in frame_buffer.slots}
+
+    def seek(self, offset: float):
+        self.call("seek", offset, self.size, self.pixel_format, self.threads, self.tempo, self.mute)
+
+    def read_into(self, view: memoryview, skip_before: float = None) -> Optional[float]:
+        try:
+            return self.call("read_into", self.slot_indices[id(view)], skip_before)
+
+        except (OSError, EOFError):
+            return None # the decoder process has exited
+
+    def read(self, size: int) -> Optional[bytes]:
+        # the reader could be waiting on a frame with the connection, the mixer asks again instead of waiting with it
+        if not self.lock.acquire(timeout = 0.01):
+            return None
+
+        try:
+            self.connection.send(("read", size))
+            status, result = self.connection.recv()
+
+        except (OSError, EOFError):
+            return b''
+
+        finally:
+            self.lock.release()
+
+        if status == "error":
+            raise result
+        return result
+
+    def interrupt(self):
+        # requests are served one at a time so a read that is in progress finishes before a seek is served
+        pass
+
+    def close(self):
+        try:
+            with self.lock:
+                self.connection.send(("close",))
+
+        except (OSError, ValueError):
+            pass # the process has already exited
+
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.connection.close()
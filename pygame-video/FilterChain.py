@@ -0,0 +1,288 @@
+from .FrameBuffer import PIXEL_FORMAT_BYTES
+from .Stats import LatencyHistogram
+from typing import Optional
+import concurrent.futures
+import threading
+import pygame
+import numpy
+import time
+import abc
+import os
+
+def channel_order(pixel_format: str) -> tuple[int, int, int]:
+    # the indices of red, green and blue in a pixel of pixel_format
+    return (2, 1, 0) if pixel_format == "BGRA" else (0, 1, 2)
+
+def clip_range(start: int, stop: int, rows: slice) -> tuple[int, int]:
+    # the part of [start, stop) that falls inside rows, empty when they do not overlap
+    start, stop = max(start, rows.start), min(stop, rows.stop)
+    return start, max(start, stop)
+
+class FrameFilter(abc.ABC):
+    """
+    A step of a FilterChain that changes the pixels of decoded frames in place.
+
+    apply gets the whole frame as a (height, width, channels) uint8 array that is a view onto a frame
+    buffer slot, and the rows it should change. With split True the chain hands the rows of a frame out
+    in bands to several threads at once, so apply must only write to its rows and must not depend on
+    what another band writes. configure is called with the size and pixel format ("RGB" or "BGRA")
+    before the first frame and whenever they change, reset after a seek.
+    """
+
+    # a name for the timings, the name of the class by default
+    name: Optional[str] = None
+    split = True
+
+    def configure(self, size: tuple[int, int], pixel_format: str):
+        self.size = size
+        self.pixel_format = pixel_format
+
+    @abc.abstractmethod
+    def apply(self, pixels: numpy.ndarray, rows: slice, pts: float):
+        pass
+
+    def reset(self):
+        pass
+
+class BrightnessContrast(FrameFilter):
+    def __init__(self, brightness: float = 0.0, contrast: float = 1.0):
+        """
+        Adds brightness (-1 to 1) to every channel and scales it around the middle grey by contrast.
+        """
+
+        self.brightness = brightness
+        self.contrast = contrast
+
+        # every value maps to the same value every time, so a lookup table replaces the arithmetic
+        values = (numpy.arange(256, dtype = numpy.float32) - 128) * contrast + 128 + brightness * 255
+        self.table = numpy.clip(numpy.rint(values), 0, 255).astype(numpy.uint8)
+
+        # looking two bytes up at once halves the lookups, the table of every pair still fits in the cache
+        pairs = numpy.arange(65536, dtype = numpy.uint32)
+        self.pair_table = (self.table[pairs & 0xff].astype(numpy.uint16) | (self.table[pairs >> 8].astype(numpy.uint16) << 8))
+
+    def apply(self, pixels: numpy.ndarray, rows: slice, pts: float):
+        band = pixels[rows]
+        if not band.flags.c_contiguous:
+            numpy.take(self.table, band, out = band, mode = "clip")
+            return
+
+        data = band.reshape(-1)
+        even = len(data) - len(data) % 2
+        pairs = data[:even].view(numpy.uint16)
+        numpy.take(self.pair_table, pairs, out = pairs, mode = "clip")
+        numpy.take(self.table, data[even:], out = data[even:], mode = "clip")
+
+class Letterbox(FrameFilter):
+    def __init__(self, aspect: float, colour: tuple[int, int, int] = (0, 0, 0)):
+        """
+        Covers the top and bottom, or the sides, of the frame with bars so the picture left between them has aspect.
+        """
+
+        self.aspect = aspect
+        self.colour = colour
+
+    def configure(self, size: tuple[int, int], pixel_format: str):
+        super().configure(size, pixel_format)
+        width, height = size
+
+        self.bar_rows = self.bar_columns = 0
+        if width / height < self.aspect:
+            self.bar_rows = round((height - width / self.aspect) / 2)
+        else:
+            self.bar_columns = round((width - height * self.aspect) / 2)
+
+        self.fill = numpy.zeros(PIXEL_FORMAT_BYTES[pixel_format], numpy.uint8)
+        self.fill[list(channel_order(pixel_format))] = self.colour
+
+    def apply(self, pixels: numpy.ndarray, rows: slice, pts: float):
+        height, width = pixels.shape[:2]
+
+        if self.bar_rows:
+            for start, stop in (clip_range(0, self.bar_rows, rows), clip_range(height - self.bar_rows, height, rows)):
+                pixels[start:stop] = self.fill
+
+        if self.bar_columns:
+            pixels[rows, :self.bar_columns] = self.fill
+            pixels[rows, width - self.bar_columns:] = self.fill
+
+class Overlay(FrameFilter):
+    def __init__(self, image: pygame.Surface, position: tuple[int, int] = (0, 0), opacity: float = 1.0):
+        """
+        Blends image over the frame with its top left corner at position, using the per pixel alpha of image.
+        """
+
+        self.image = image
+        self.position = position
+        self.opacity = opacity
+
+    def configure(self, size: tuple[int, int], pixel_format: str):
+        super().configure(size, pixel_format)
+
+        # the part of the image that is inside the frame, in the channel order of the frame
+        x, y = self.position
+        left, top = max(0, x), max(0, y)
+        right, bottom = min(size[0], x + self.image.get_width()), min(size[1], y + self.image.get_height())
+        self.area = (left, top, max(left, right), max(top, bottom))
+
+        # surfarray is indexed by x first so the arrays are transposed to rows first like the frame
+        colour = pygame.surfarray.array3d(self.image).transpose(1, 0, 2)[:, :, list(channel_order(pixel_format))]
+        if self.image.get_flags() & pygame.SRCALPHA:
+            alpha = pygame.surfarray.array_alpha(self.image).T
+        else:
+            alpha = numpy.full(colour.shape[:2], 255, numpy.uint8)
+
+        region = (slice(top - y, bottom - y), slice(left - x, right - x))
+        self.colour = colour[region].astype(numpy.int32)
+
+        # alpha out of 256 so the blend can shift instead of divide
+        self.alpha = (alpha[region].astype(numpy.int32) * round(self.opacity * 256) // 255)[:, :, None]
+
+    def apply(self, pixels: numpy.ndarray, rows: slice, pts: float):
+        left, top, right, bottom = self.area
+        start, stop = clip_range(top, bottom, rows)
+        if start == stop or left == right:
+            return
+
+        region = pixels[start:stop, left:right, :3]
+        colour = self.colour[start - top:stop - top]
+        alpha = self.alpha[start - top:stop - top]
+        region[:] = region + ((colour - region) * alpha >> 8)
+
+class MotionMask(FrameFilter):
+    def __init__(self, threshold: int = 24, tint: tuple[int, int, int] = (255, 0, 0), strength: float = 0.5):
+        """
+        Marks the pixels that changed since the previous frame and tints them by strength towards tint.
+
+        A pixel changed when the sum of its channels moved by more than threshold per channel. After every
+        frame mask holds the changed pixels and motion() the fraction of the frame that changed, pass a
+        strength of 0 to only detect motion without changing the frame.
+        """
+
+        self.threshold = threshold
+        self.tint = tint
+        self.strength = strength
+
+        self.previous: numpy.ndarray = None
+        self.mask: numpy.ndarray = None
+
+    def configure(self, size: tuple[int, int], pixel_format: str):
+        super().configure(size, pixel_format)
+        self.order = list(channel_order(pixel_format))
+        self.colour = numpy.array(self.tint, numpy.int32)
+        self.weight = round(self.strength * 256)
+
+        # the bands only ever touch their own rows of these so they can share them
+        self.previous = numpy.zeros((size[1], size[0]), numpy.int16)
+        self.mask = numpy.zeros((size[1], size[0]), bool)
+        self.reset()
+
+    def reset(self):
+        # the first frame after a seek has nothing to be compared to
+        if self.mask is not None:
+            self.valid = numpy.zeros(len(self.mask), bool)
+            self.mask[:] = False
+
+    def motion(self) -> float:
+        mask = self.mask
+        return float(mask.mean()) if mask is not None else 0.0
+
+    def apply(self, pixels: numpy.ndarray, rows: slice, pts: float):
+        band = pixels[rows]
+        mask = self.mask[rows]
+
+        # adding the channels one at a time is much faster than summing over the strided last axis
+        current = band[:, :, 0].astype(numpy.int16)
+        current += band[:, :, 1]
+        current += band[:, :, 2]
+
+        difference = current - self.previous[rows]
+        numpy.abs(difference, out = difference)
+        numpy.greater(difference, self.threshold * 3, out = mask)
+        mask[~self.valid[rows]] = False
+        self.previous[rows] = current
+        self.valid[rows] = True
+
+        if self.weight and mask.any():
+            changed = band[mask][:, self.order].astype(numpy.int32)
+            band[mask, :3] = (changed + ((self.colour - changed) * self.weight >> 8))[:, self.order]
+
+class FilterChain:
+    def __init__(self, filters: list[FrameFilter] = None, workers: int = None, min_band_rows: int = 32):
+        """
+        Runs a list of FrameFilters in order over every frame of a Video before it is published to the frame buffer.
+
+        The frames are changed in place in the frame buffer slots so nothing is copied. Each filter that can be
+        split works on bands of at least min_band_rows rows on a pool of workers threads, NumPy lets go of the
+        GIL while it works on an array so the bands run at the same time. How long every filter takes per frame
+        is recorded in timings.
+        """
+
+        self.filters: list[FrameFilter] = list(filters or [])
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.min_band_rows = min_band_rows
+        self.lock = threading.Lock()
+
+        # the pool is only started for filters that are split into more than one band
+        self.executor: concurrent.futures.ThreadPoolExecutor = None
+
+        self.timings: dict[str, LatencyHistogram] = {}
+        self.configured: tuple[tuple[int, int], str] = None
+
+    def add(self, frame_filter: FrameFilter):
+        with self.lock:
+            self.filters.append(frame_filter)
+            if self.configured:
+                frame_filter.configure(*self.configured)
+
+    def remove(self, frame_filter: FrameFilter):
+        with self.lock:
+            if frame_filter in self.filters:
+                self.filters.remove(frame_filter)
+
+    def reset(self):
+        with self.lock:
+            for frame_filter in self.filters:
+                frame_filter.reset()
+
+    def bands(self, height: int) -> list[slice]:
+        count = max(1, min(self.workers, height // self.min_band_rows))
+        bounds = [height * i // count for i in range(count + 1)]
+        return [slice(start, stop) for start, stop in zip(bounds, bounds[1:])]
+
+    def process(self, pixels: numpy.ndarray, pts: float, pixel_format: str):
+        # pixels is the (height, width, channels) array of a frame buffer slot, it is changed in place
+        with self.lock:
+            height, width = pixels.shape[:2]
+            if self.configured != ((width, height), pixel_format):
+                self.configured = ((width, height), pixel_format)
+                for frame_filter in self.filters:
+                    frame_filter.configure(*self.configured)
+
+            bands = self.bands(height)
+            if len(bands) > 1 and self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix = "FilterChain")
+
+            for frame_filter in self.filters:
+                started = time.perf_counter()
+
+                if frame_filter.split and len(bands) > 1:
+                    # every band has to be done before the next filter starts on the frame
+                    jobs = [self.executor.submit(frame_filter.apply, pixels, rows, pts) for rows in bands]
+                    for job in jobs:
+                        job.result()
+                else:
+                    frame_filter.apply(pixels, slice(0, height), pts)
+
+                name = frame_filter.name or type(frame_filter).__name__
+                timing = self.timings.get(name)
+                if timing is None:
+                    timing = self.timings[name] = LatencyHistogram()
+                timing.record(time.perf_counter() - started)
+
+    def get_stats(self) -> dict[str, dict]:
+        return {name: timing.to_dict() for name, timing in list(self.timings.items())}
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait = True, cancel_futures = True)
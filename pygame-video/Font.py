@@ -1,5 +1,5 @@
 from .Vector2 import Vector2
-from typing import Union
+import collections
 import pygame
 
 class Character:
@@ -9,6 +9,9 @@ class Character:
         self.surface = surface
         self.rect = surface.get_rect()
 
+        # where the character is stored in Font.atlas
+        self.atlas_rect: pygame.Rect = None
+
 class Font:
     def __init__(
         self,
@@ -21,6 +24,7 @@ class Font:
         antialias: bool = True,
         colorkey_foreground: bool = False,
         colorkey_background: bool = True,
+        render_cache_size: int = 256,
     ):
         self.foreground_color = foreground_color
         self.background_color = background_color
@@ -39,6 +43,17 @@ class Font:
         # this characters dict is a dict of all the characters that have been generated
         self.characters: dict[str, Character] = {}
 
+        # every generated character is also packed into this one surface so text can be drawn with a single blits call
+        # characters are packed left to right into shelves that are the height of the font
+        self.atlas: pygame.Surface = None
+        self.atlas_width = 1024
+        self.atlas_cursor = [0, 0]
+        self.shelf_height = 0
+
+        # the most recently rendered strings, the least recently used is dropped once there are more than render_cache_size
+        self.render_cache: collections.OrderedDict[tuple, tuple[pygame.Surface, tuple[int, int]]] = collections.OrderedDict()
+        self.render_cache_size = render_cache_size
+
         # we are generating the space character here so we can get the font height
         self.generate_character(" ")
         self.font_height = self.characters.get(" ").size.y
@@ -48,36 +63,66 @@ class Font:
         except: surface = self.FONT.render(" ", self.antialias, self.foreground_color, self.background_color)
 
         char = Character(symbol, surface)
+        self.add_to_atlas(char)
         self.characters[symbol] = char
 
+    def add_to_atlas(self, char: Character):
+        width, height = char.surface.get_size()
+        x, y = self.atlas_cursor
+
+        # start a new shelf when the character does not fit on the current one
+        if x + width > self.atlas_width:
+            x = 0
+            y += self.shelf_height
+
+        if self.atlas is None:
+            self.shelf_height = height
+            self.atlas = pygame.Surface((max(self.atlas_width, width), height * 4))
+            self.atlas.fill(self.background_color)
+
+        # grow the atlas, the characters already in it keep their place
+        atlas_width, atlas_height = self.atlas.get_size()
+        if y + height > atlas_height or width > atlas_width:
+            atlas = pygame.Surface((max(atlas_width, width), max(atlas_height * 2, y + height)))
+            atlas.fill(self.background_color)
+            atlas.blit(self.atlas, (0, 0))
+            self.atlas = atlas
+
+        char.atlas_rect = pygame.Rect(x, y, width, height)
+        self.atlas.blit(char.surface, char.atlas_rect)
+
+        self.shelf_height = max(self.shelf_height, height)
+        self.atlas_cursor = [x + width, y]
+
     def create_rows_from_text(self, text: str, width: int = -1, xstart: int = None):
         if xstart is None:
             xstart = 0
 
         text_rows: list[list[Character]] = [[]]
-        current_position = Vector2(xstart, 0)
+        characters = self.characters
+        x = xstart
 
         for symbol in text:
-            if not symbol in self.characters:
+            char = characters.get(symbol)
+            if char is None:
                 self.generate_character(symbol)
+                char = characters[symbol]
 
-            char = self.characters.get(symbol)
+            newline = symbol == "\r" or symbol == "\n"
 
             if width != -1:
-                if current_position.x + char.rect.w >= width:
-                    if symbol not in ["\r", "\n"]:
+                if x + char.rect.w >= width:
+                    if not newline:
                         text_rows.append([])
-                    current_position.x = 0
-                    current_position.y += self.font_height
+                    x = 0
 
-            if symbol in ["\r", "\n"]:
+            if newline:
                 text_rows.append([])
-                current_position.x = 0
-                current_position.y += self.font_height
+                x = 0
 
             else:
                 text_rows[-1].append(char)
-                current_position.x += char.rect.w
+                x += char.rect.w
 
         return text_rows
 
@@ -94,58 +139,99 @@ class Font:
             len(rows) * self.font_height
         )
 
-    def render_max_size(self, text: str, size: Vector2, start: Vector2 = None):
-        if start is None:
-            start = Vector2
-
-        text_rows: list[list[Character]] = self.create_rows_from_text(text, size.x, start.x)
-
-        total_font_size = self.get_size_from_rows(text_rows, size.x)
-
-        current_position = start
-        output_surface = pygame.Surface(size + start)
-
+    def blit_rows(self, output_surface: pygame.Surface, rows: list[list[Character]], x: int, y: int):
+        # every character is drawn from the atlas in a single blits call, returns where the text ended
         if self.colorkey_foreground:
             output_surface.set_colorkey(self.foreground_color)
 
         if self.colorkey_background:
             output_surface.set_colorkey(self.background_color)
 
-        for i, row in enumerate(text_rows):
+        atlas = self.atlas
+        sequence = []
+        font_height = self.font_height
+
+        for i, row in enumerate(rows):
             for char in row:
-                output_surface.blit(char.surface, current_position)
-                current_position.x += char.rect.w
+                sequence.append((atlas, (x, y), char.atlas_rect))
+                x += char.rect.w
+
+            if i < len(rows) - 1:
+                x = 0
+                y += font_height
+
+        output_surface.blits(sequence, doreturn = False)
+        return x, y
+
+    def cached_render(self, key: tuple):
+        cached = self.render_cache.get(key)
+        if cached is None:
+            return None
+
+        self.render_cache.move_to_end(key)
+        surface, position = cached
+        return surface, Vector2(position)
+
+    def cache_render(self, key: tuple, surface: pygame.Surface, position: tuple[int, int]):
+        self.render_cache[key] = (surface, position)
+        if len(self.render_cache) > self.render_cache_size:
+            self.render_cache.popitem(last = False)
+
+    def render_key(self, *parts):
+        # the colors and flags are part of the key because they can be changed after the font was created
+        return parts + (
+            tuple(self.foreground_color), tuple(self.background_color),
+            self.colorkey_foreground, self.colorkey_background
+        )
 
-            if i < len(text_rows) - 1:
-                current_position.x = 0
-                current_position.y += self.font_height
+    def render_max_size(self, text: str, size: Vector2, start: Vector2 = None, cache: bool = True):
+        """
+        Renders text wrapped to size.x into a surface of size + start.
 
-        return output_surface, current_position
+        The surface is cached and returned again for the same arguments, copy it before drawing on it.
+        Pass cache as False for text that changes all the time, so it does not push everything else out of the cache.
+        """
 
-    def render_max_width(self, text: str, width: int = -1, start: Vector2 = None):
         if start is None:
             start = Vector2(0, 0)
 
-        text_rows: list[list[Character]] = self.create_rows_from_text(text, width, start.x)
+        key = self.render_key("size", text, int(size.x), int(size.y), int(start.x), int(start.y))
+        cached = self.cached_render(key) if cache else None
+        if cached:
+            return cached
 
-        total_font_size = self.get_size_from_rows(text_rows, width)
-        total_font_size += start
-        current_position = start
-        output_surface = pygame.Surface(total_font_size)
+        text_rows: list[list[Character]] = self.create_rows_from_text(text, size.x, start.x)
 
-        if self.colorkey_foreground:
-            output_surface.set_colorkey(self.foreground_color)
+        output_surface = pygame.Surface(size + start)
+        position = self.blit_rows(output_surface, text_rows, start.x, start.y)
 
-        if self.colorkey_background:
-            output_surface.set_colorkey(self.background_color)
+        if cache:
+            self.cache_render(key, output_surface, position)
+        return output_surface, Vector2(position)
 
-        for i, row in enumerate(text_rows):
-            for char in row:
-                output_surface.blit(char.surface, current_position)
-                current_position.x += char.rect.w
+    def render_max_width(self, text: str, width: int = -1, start: Vector2 = None, cache: bool = True):
+        """
+        Renders text wrapped to width into a surface that is just big enough for it.
+
+        The surface is cached and returned again for the same arguments, copy it before drawing on it.
+        Pass cache as False for text that changes all the time, so it does not push everything else out of the cache.
+        """
 
-            if i < len(text_rows) - 1:
-                current_position.x = 0
-                current_position.y += self.font_height
+        if start is None:
+            start = Vector2(0, 0)
+
+        key = self.render_key("width", text, width, int(start.x), int(start.y))
+        cached = self.cached_render(key) if cache else None
+        if cached:
+            return cached
+
+        text_rows: list[list[Character]] = self.create_rows_from_text(text, width, start.x)
+
+        total_font_size = self.get_size_from_rows(text_rows, width)
+        total_font_size += start
+        output_surface = pygame.Surface(total_font_size)
+        position = self.blit_rows(output_surface, text_rows, start.x, start.y)
 
-        return output_surface, current_position
\ No newline at end of file
+        if cache:
+            self.cache_render(key, output_surface, position)
+        return output_surface, Vector2(position)
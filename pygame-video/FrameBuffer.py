@@ -0,0 +1,179 @@
+from typing import Optional
+import threading
+import tempfile
+import pygame
+import numpy
+import mmap
+import os
+
+# bytes per pixel of the pixel formats pygame.image.frombuffer can wrap
+PIXEL_FORMAT_BYTES = {"RGB": 3, "BGRA": 4}
+
+def create_shared_mapping(size: int) -> tuple[str, mmap.mmap]:
+    """
+    Creates a file backed memory mapping that other processes can map by opening the returned path.
+    The file is created in /dev/shm where it exists so it never touches a disk.
+    """
+
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    descriptor, path = tempfile.mkstemp(prefix = "pygame-video-", dir = directory)
+
+    try:
+        os.ftruncate(descriptor, size)
+        return path, mmap.mmap(descriptor, size)
+
+    finally:
+        os.close(descriptor)
+
+class FrameSlot:
+    def __init__(self, index: int, size: tuple[int, int], pixel_format: str = "RGB", data: memoryview = None):
+        self.index = index
+        self.size = size
+
+        # the raw bytes of the frame, this is allocated once and reused for every frame
+        # data is given when the slot lives in memory that is shared with a decoder process
+        self.data = data if data is not None else bytearray(size[0] * size[1] * PIXEL_FORMAT_BYTES[pixel_format])
+        self.view = memoryview(self.data)
+
+        # the same bytes as a (height, width, channels) array for the filters of a FilterChain
+        self.pixels = numpy.frombuffer(self.data, numpy.uint8).reshape(size[1], size[0], PIXEL_FORMAT_BYTES[pixel_format])
+
+        # the surface is a view onto self.data so writing into the slot updates the surface without a copy
+        self.surface = pygame.image.frombuffer(self.data, size, pixel_format)
+
+        # BGRA matches the layout of most 32 bit displays, the alpha is ignored so it blits without blending
+        if pixel_format == "BGRA":
+            self.surface.set_alpha(None)
+
+        # presentation timestamp in seconds of the frame currently stored in this slot
+        self.pts = -1.0
+
+        # a number that is unique for every frame that has been written into any slot of the buffer
+        self.frame_id = -1
+
+class FrameBuffer:
+    def __init__(self, size: tuple[int, int], slots: int = 8, pixel_format: str = "RGB", shared: bool = False):
+        """
+        A bounded single producer / single consumer ring of preallocated frame slots.
+
+        The producer (the decode reader thread) asks for a writable slot, fills slot.view
+        and then calls publish. The consumer (the presenter) pops ready slots.
+        One slot is always reserved for the frame that is currently being presented so the
+        producer never writes into a surface that is on screen, also across clear.
+
+        When shared is True the slots live in one memory mapping that a decoder process
+        maps as well (see Decoder.ProcessDecoder), so frames are decoded straight into them.
+        """
+
+        if slots < 2:
+            raise ValueError("a FrameBuffer needs at least 2 slots")
+
+        self.size = (int(size[0]), int(size[1]))
+        self.pixel_format = pixel_format
+        self.frame_bytes = self.size[0] * self.size[1] * PIXEL_FORMAT_BYTES[pixel_format]
+
+        # the path of the shared mapping, this is None once the decoder process has mapped it and the file is removed
+        self.shared_path: str = None
+        self.shared_memory: mmap.mmap = None
+
+        if shared:
+            self.shared_path, self.shared_memory = create_shared_mapping(self.frame_bytes * slots)
+            memory = memoryview(self.shared_memory)
+            self.slots = [FrameSlot(i, self.size, pixel_format, memory[i * self.frame_bytes:(i + 1) * self.frame_bytes]) for i in range(slots)]
+
+        else:
+            self.slots = [FrameSlot(i, self.size, pixel_format) for i in range(slots)]
+
+        # these counters only ever grow, write_count is only changed by the producer and read_count only by the consumer
+        self.write_count = 0
+        self.read_count = 0
+
+        # clear rewinds write_count so frame ids come from a counter of their own
+        self.published = 0
+
+        # only taken by the consumer and by clear, so a clear never interleaves with a pop
+        self.read_lock = threading.Lock()
+
+        # set whenever the consumer frees a slot so a producer waiting on a full buffer can continue
+        self.space_available = threading.Event()
+
+        # set to wake up and stop a producer that is waiting on a full buffer
+        self.interrupted = False
+
+    def __len__(self):
+        return self.write_count - self.read_count
+
+    def is_full(self):
+        return self.write_count - self.read_count >= len(self.slots) - 1
+
+    def writable_slot(self, timeout: float = None) -> Optional[FrameSlot]:
+        """
+        Returns the next slot the producer can write into, waiting until there is space.
+        Returns None if the buffer was interrupted or the timeout ran out.
+        """
+
+        while self.is_full():
+            self.space_available.clear()
+
+            # the consumer could have freed a slot between the check above and the clear
+            if not self.is_full():
+                break
+
+            if self.interrupted or not self.space_available.wait(timeout):
+                return None
+
+        if self.interrupted:
+            return None
+
+        return self.slots[self.write_count % len(self.slots)]
+
+    def publish(self, slot: FrameSlot, pts: float):
+        slot.pts = pts
+        slot.frame_id = self.published
+        self.published += 1
+        self.write_count += 1
+
+    def peek(self) -> Optional[FrameSlot]:
+        if self.write_count - self.read_count <= 0:
+            return None
+        return self.slots[self.read_count % len(self.slots)]
+
+    def pop(self) -> Optional[FrameSlot]:
+        with self.read_lock:
+            slot = self.peek()
+            if slot is not None:
+                self.read_count += 1
+                self.space_available.set()
+            return slot
+
+    def latest(self) -> Optional[FrameSlot]:
+        """
+        Pops every ready slot and returns the newest one, or None if nothing is ready.
+        """
+
+        slot = None
+        while self.write_count - self.read_count > 0:
+            slot = self.pop()
+        return slot
+
+    def release_shared_path(self):
+        # once every process has mapped the memory the file is not needed, the mapping stays valid until it is closed
+        if self.shared_path:
+            try:
+                os.remove(self.shared_path)
+            except OSError:
+                pass # windows can not remove a file that is mapped, it is left in the temporary directory
+            self.shared_path = None
+
+    def interrupt(self):
+        self.interrupted = True
+        self.space_available.set()
+
+    def clear(self):
+        # must only be called while no producer is running, the consumer can still be popping
+        # the frames that were not popped are dropped by rewinding the producer, so the slot before
+        # read_count (the one on screen) stays reserved
+        with self.read_lock:
+            self.write_count = self.read_count
+        self.interrupted = False
+        self.space_available.set()
@@ -0,0 +1,184 @@
+from .Decoder import open_decoder
+from .KeyframeIndex import KeyframeIndex
+from .FrameBuffer import PIXEL_FORMAT_BYTES
+from .Metadata import Metadata
+from typing import Iterator, Optional, Union
+import concurrent.futures
+import multiprocessing
+import tempfile
+import numpy
+import pygame
+import math
+import mmap
+import os
+
+def read_frames(decoder, size: tuple[int, int], framerate: float, start: float, end: Optional[float], step: Optional[float], origin: float) -> Iterator[tuple[float, bytearray]]:
+    """
+    Yields the timestamp and bytes of every frame of decoder from start until end, in the pixel format of the decoder.
+
+    With a step only the first frame at or after every origin + k * step is yielded and the frames in between
+    are never converted. A frame belongs to [start, end) when it is within half a frame of it, which is where
+    the decoder puts a frame after seeking, so consecutive ranges never share or miss a frame.
+    """
+
+    half_frame = 0.5 / framerate
+    frame_bytes = size[0] * size[1] * PIXEL_FORMAT_BYTES[decoder.pixel_format]
+
+    # the first point on the grid that a frame of this range can be the answer to
+    k = math.floor((start - half_frame - origin) / step) + 1 if step else 0
+
+    decoder.seek(start)
+    while True:
+        target = origin + k * step if step else None
+        data = bytearray(frame_bytes)
+        pts = decoder.read_into(memoryview(data), target - half_frame if step else None)
+        if pts is None or (end is not None and pts >= end - half_frame):
+            return
+
+        yield pts, data
+
+        # a frame answers every point on the grid it is the closest frame to
+        while step and origin + k * step - half_frame <= pts:
+            k += 1
+
+def shared_directory() -> Optional[str]:
+    # /dev/shm is memory so handing frames over through it never touches a disk
+    return "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+def _extract_segment(source: str, size: tuple[int, int], framerate: float, start: float, end: float, step: Optional[float], origin: float, backend: str, threads: int) -> tuple[str, list[float]]:
+    # runs in a worker process, writes the frames of one segment to a file and returns its path and their timestamps
+    decoder = open_decoder(source, size, framerate, None, 0, backend)
+
+    # the cores are shared between the workers instead of every decoder starting a thread for each of them
+    decoder.threads = threads
+    descriptor, path = tempfile.mkstemp(prefix = "pygame-video-", dir = shared_directory())
+    timestamps = []
+
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            for pts, data in read_frames(decoder, size, framerate, start, end, step, origin):
+                file.write(data)
+                timestamps.append(pts)
+
+    except BaseException:
+        os.remove(path)
+        raise
+
+    finally:
+        decoder.close()
+
+    return path, timestamps
+
+class FrameExtractor:
+    def __init__(self, source: str, size: tuple[int, int] = None, metadata: Metadata = None, decoder_backend: str = "auto"):
+        """
+        Decodes the frames of a source as fast as the decoder can produce them, for offline jobs.
+
+        Nothing is paced by a clock or presented, every frame is yielded with its timestamp in seconds.
+        size is the size of the frames, the size of the video by default. Use iter_frames_parallel
+        to spread a long source over several processes.
+        """
+
+        self.source = source
+        self.metadata = metadata or Metadata.probe(source)
+        if not self.metadata.has_video:
+            raise ValueError(f"{source} has no video to extract frames from")
+
+        self.size = (int(size[0]), int(size[1])) if size else (self.metadata.width, self.metadata.height)
+        self.framerate = abs(self.metadata.framerate)
+        self.decoder_backend = decoder_backend
+
+    def convert(self, data: Union[bytearray, memoryview], format: str) -> Union[numpy.ndarray, pygame.Surface]:
+        # format is "array" for a (height, width, 3) uint8 array or "surface" for a pygame.Surface, both RGB
+        if format == "array":
+            return numpy.frombuffer(data, numpy.uint8).reshape(self.size[1], self.size[0], 3)
+
+        if format == "surface":
+            return pygame.image.frombuffer(data, self.size, "RGB")
+
+        raise ValueError(f"unknown frame format {format}")
+
+    def iter_frames(self, start: float = 0.0, end: float = None, step: float = None, format: str = "array") -> Iterator[tuple[float, Union[numpy.ndarray, pygame.Surface]]]:
+        """
+        Yields (timestamp, frame) for the frames from start until end, the end of the source by default.
+
+        With step only one frame every step seconds is yielded. Every frame is a new array or surface,
+        so they can be kept without being copied.
+        """
+
+        decoder = open_decoder(self.source, self.size, self.framerate, None, 0, self.decoder_backend)
+        try:
+            for pts, data in read_frames(decoder, self.size, self.framerate, start, end, step, start):
+                yield pts, self.convert(data, format)
+
+        finally:
+            decoder.close()
+
+    def segments(self, start: float, end: float, count: int) -> list[tuple[float, float]]:
+        # about count ranges that each start on a keyframe, so a worker never decodes frames it does not yield
+        keyframes = [t for t in KeyframeIndex.load(self.source).keyframes if start < t < end]
+        length = (end - start) / max(1, count)
+
+        boundaries = [start]
+        for keyframe in keyframes:
+            if keyframe - boundaries[-1] >= length:
+                boundaries.append(keyframe)
+        boundaries.append(end)
+
+        return list(zip(boundaries, boundaries[1:]))
+
+    def iter_frames_parallel(self, start: float = 0.0, end: float = None, step: float = None, format: str = "array", workers: int = None) -> Iterator[tuple[float, Union[numpy.ndarray, pygame.Surface]]]:
+        """
+        Yields the same frames as iter_frames, decoded by workers processes at the same time.
+
+        The range is split into segments at keyframes, every worker decodes one segment at a time and
+        the segments are yielded in order. Only a few segments more than there are workers are decoded
+        ahead, the frames of a segment wait in shared memory until they are yielded.
+        """
+
+        end = self.metadata.duration if end is None else end
+        workers = workers or os.cpu_count() or 1
+
+        # starting a process costs more than it saves with a single worker
+        if workers == 1:
+            yield from self.iter_frames(start, end, step, format)
+            return
+
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        pending = list(self.segments(start, end, workers * 4))
+        jobs: list[concurrent.futures.Future] = []
+
+        # spawn instead of fork because the parent has threads and an SDL context that should not be copied
+        executor = concurrent.futures.ProcessPoolExecutor(workers, multiprocessing.get_context("spawn"))
+
+        try:
+            while pending or jobs:
+                while pending and len(jobs) < workers * 2:
+                    segment_start, segment_end = pending.pop(0)
+                    jobs.append(executor.submit(
+                        _extract_segment, self.source, self.size, self.framerate,
+                        segment_start, segment_end, step, start, self.decoder_backend, threads
+                    ))
+
+                path, timestamps = jobs.pop(0).result()
+                try:
+                    yield from self.read_segment(path, timestamps, format)
+                finally:
+                    os.remove(path)
+
+        finally:
+            # segments that were decoded but not yielded because the caller stopped early are removed as well
+            executor.shutdown(wait = True, cancel_futures = True)
+            for job in jobs:
+                if not job.cancelled() and job.exception() is None:
+                    os.remove(job.result()[0])
+
+    def read_segment(self, path: str, timestamps: list[float], format: str) -> Iterator[tuple[float, Union[numpy.ndarray, pygame.Surface]]]:
+        if not timestamps:
+            return
+
+        frame_bytes = self.size[0] * self.size[1] * 3
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as mapping:
+            for i, pts in enumerate(timestamps):
+                # copied out of the mapping so the frame outlives the file
+                yield pts, self.convert(bytearray(mapping[i * frame_bytes:(i + 1) * frame_bytes]), format)
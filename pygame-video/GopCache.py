@@ -0,0 +1,136 @@
+from .FrameExtractor import read_frames
+from .KeyframeIndex import KeyframeIndex
+from .Decoder import open_decoder
+from .FrameBuffer import PIXEL_FORMAT_BYTES
+from typing import Optional
+import concurrent.futures
+import collections
+import threading
+import bisect
+import math
+
+class GopCache:
+    def __init__(self, source: str, index: KeyframeIndex, size: tuple[int, int], pixel_format: str, framerate: float, capacity: int = 3, max_bytes: int = 512 * 1024 * 1024, backend: str = "auto"):
+        """
+        The decoded frames of the most recently used GOPs (a keyframe and the frames up to the next one) of a source.
+
+        Playing backwards and stepping back a frame need the frames before the current one, which a decoder
+        can only reach by decoding forward from the keyframe before them. Every GOP is decoded once, by a
+        decoder of its own, and kept until more than capacity GOPs or more than max_bytes of frames are held.
+        Whenever a GOP is used the one before it is decoded in the background so playing backwards does not wait for it.
+
+        A GOP that would take more than half of max_bytes, or the whole source when there is no index, is
+        split into windows that each seek to their start and decode forward from there instead.
+        """
+
+        self.source = source
+        self.index = index
+        self.size = size
+        self.pixel_format = pixel_format
+        self.framerate = framerate
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+
+        # the longest part of the source that is decoded at once, so the one in use and the one before it both fit
+        frame_bytes = size[0] * size[1] * PIXEL_FORMAT_BYTES[pixel_format]
+        self.window = max(1, max_bytes // (2 * frame_bytes)) / framerate
+
+        self.decoder = open_decoder(source, size, framerate, None, 0, backend)
+        self.decoder.pixel_format = pixel_format
+
+        # the frames of every cached GOP (or window) by where it starts, as (timestamps, frames) in the order they are shown
+        self.gops: collections.OrderedDict[float, tuple[list[float], list[bytearray]]] = collections.OrderedDict()
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+
+        # a single worker decodes the GOPs so a prefetch and a read of the same GOP never decode it twice
+        self.executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix = "GopCache")
+        self.jobs: dict[float, concurrent.futures.Future] = {}
+
+    def segment(self, t: float) -> tuple[float, Optional[float]]:
+        # the start and end of the GOP or window that the frame at t is decoded with, the end is None at the end of the source
+        keyframe = self.index.previous(t)
+        end = self.index.next(keyframe + 0.5 / self.framerate) if len(self.index) else None
+        if end is not None and end - keyframe <= self.window:
+            return keyframe, end
+
+        start = keyframe + max(0, math.floor((t - keyframe) / self.window)) * self.window
+        return start, start + self.window if end is None else min(start + self.window, end)
+
+    def decode(self, start: float, end: Optional[float]) -> tuple[list[float], list[bytearray]]:
+        # runs on the worker
+        timestamps, frames = [], []
+
+        try:
+            for pts, data in read_frames(self.decoder, self.size, self.framerate, start, end, None, start):
+                timestamps.append(pts)
+                frames.append(data)
+
+            with self.lock:
+                self.gops[start] = (timestamps, frames)
+                self.cached_bytes += sum(len(data) for data in frames)
+
+                # the GOP that was just decoded is kept even when it is bigger than max_bytes on its own
+                while len(self.gops) > 1 and (len(self.gops) > self.capacity or self.cached_bytes > self.max_bytes):
+                    _, (_, evicted) = self.gops.popitem(last = False)
+                    self.cached_bytes -= sum(len(data) for data in evicted)
+
+        finally:
+            # a GOP that failed to decode is tried again the next time it is needed
+            with self.lock:
+                del self.jobs[start]
+
+        return timestamps, frames
+
+    def submit(self, start: float, end: Optional[float]) -> Optional[concurrent.futures.Future]:
+        # must be called while holding self.lock, returns None when the GOP is already cached
+        if start in self.gops:
+            self.gops.move_to_end(start)
+            return None
+
+        job = self.jobs.get(start)
+        if job is None:
+            job = self.jobs[start] = self.executor.submit(self.decode, start, end)
+        return job
+
+    def gop(self, start: float, end: Optional[float]) -> tuple[list[float], list[bytearray]]:
+        with self.lock:
+            job = self.submit(start, end)
+            if job is None:
+                return self.gops[start]
+
+        return job.result()
+
+    def prefetch(self, start: float, end: Optional[float]):
+        with self.lock:
+            self.submit(start, end)
+
+    def frame_before(self, t: float) -> Optional[tuple[float, bytearray]]:
+        """
+        Returns the timestamp and bytes of the last frame before t, or None when there is no frame before t.
+        """
+
+        # without an index the source is decoded in windows from the start
+        first = self.index.keyframes[0] if len(self.index) else 0.0
+        start, end = self.segment(t)
+
+        while True:
+            timestamps, frames = self.gop(start, end)
+
+            i = bisect.bisect_left(timestamps, t) - 1
+            if i >= 0:
+                # the GOP before is decoded while this one is being shown
+                if start > first:
+                    self.prefetch(*self.segment(start - 0.5 / self.framerate))
+                return timestamps[i], frames[i]
+
+            if start <= first:
+                return None
+            start, end = self.segment(start - 0.5 / self.framerate)
+
+    def close(self):
+        self.executor.shutdown(wait = True, cancel_futures = True)
+        self.decoder.close()
+        with self.lock:
+            self.gops.clear()
+            self.cached_bytes = 0
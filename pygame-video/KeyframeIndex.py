@@ -0,0 +1,97 @@
+from .Cache import cache_directory, file_key, temporary_path
+from typing import Optional
+import subprocess
+import bisect
+import json
+import os
+
+try:
+    import av
+except ImportError:
+    av = None
+
+class KeyframeIndex:
+    def __init__(self, keyframes: list[float]):
+        """
+        The sorted timestamps in seconds of every keyframe in the first video stream of a source.
+        """
+
+        self.keyframes = sorted(keyframes)
+
+    def __len__(self):
+        return len(self.keyframes)
+
+    def previous(self, t: float) -> float:
+        # the keyframe a decoder has to start from to reach t
+        i = bisect.bisect_right(self.keyframes, t) - 1
+        return self.keyframes[max(0, i)] if self.keyframes else 0.0
+
+    def next(self, t: float) -> Optional[float]:
+        i = bisect.bisect_left(self.keyframes, t)
+        return self.keyframes[i] if i < len(self.keyframes) else None
+
+    def nearest(self, t: float) -> float:
+        before = self.previous(t)
+        after = self.next(t)
+        if after is None or abs(t - before) <= abs(after - t):
+            return before
+        return after
+
+    def gop_length(self) -> float:
+        # the average distance between keyframes
+        if len(self.keyframes) < 2:
+            return 0.0
+        return (self.keyframes[-1] - self.keyframes[0]) / (len(self.keyframes) - 1)
+
+    @staticmethod
+    def scan(source: str) -> list[float]:
+        # only the packets are read, nothing is decoded
+        if av is not None:
+            try:
+                with av.open(source) as container:
+                    stream = container.streams.video[0]
+                    return [
+                        float(packet.pts * packet.time_base) for packet in container.demux(stream)
+                        if packet.is_keyframe and packet.pts is not None
+                    ]
+
+            except Exception:
+                pass
+
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", source],
+            capture_output = True, shell = False, text = True
+        ).stdout
+
+        keyframes = []
+        for line in output.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                keyframes.append(float(pts_time))
+        return keyframes
+
+    @classmethod
+    def load(cls, source: str):
+        """
+        Loads the index of source from the cache, scanning the source and persisting the index the first time.
+        """
+
+        path = os.path.join(cache_directory("keyframes"), file_key(source) + ".json")
+
+        if os.path.exists(path):
+            try:
+                with open(path) as file:
+                    return cls(json.load(file))
+
+            except (OSError, ValueError):
+                pass # a broken cache entry is rebuilt below
+
+        keyframes = cls.scan(source)
+
+        # write to a temporary file first so another process never reads half an index
+        temporary = temporary_path(path)
+        with open(temporary, "w") as file:
+            json.dump(keyframes, file)
+        os.replace(temporary, path)
+
+        return cls(keyframes)
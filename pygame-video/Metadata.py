@@ -0,0 +1,209 @@
+from .Cache import cache_directory, temporary_path
+from typing import Iterable, Optional
+import concurrent.futures
+import subprocess
+import traceback
+import hashlib
+import json
+import os
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# the protocols of sources that are received as they are produced rather than read from a file
+STREAM_PROTOCOLS = ("http", "https", "rtsp", "rtsps", "rtmp", "rtp", "srt", "udp", "tcp")
+
+def is_stream_source(source: str) -> bool:
+    """
+    True for stdin ("-" or "pipe:") and the urls of network streams, which are played live by default.
+    """
+
+    if source == "-" or source.startswith("pipe:"):
+        return True
+
+    protocol, separator, _ = source.partition("://")
+    return bool(separator) and protocol.lower() in STREAM_PROTOCOLS
+
+class Metadata:
+    def __init__(
+        self,
+        duration: float = -1,
+        has_video: bool = False,
+        width: int = -1,
+        height: int = -1,
+        framerate: float = -1,
+        has_audio: bool = False,
+        samplerate: int = -1,
+        channels: int = -1,
+        live: bool = False,
+    ):
+        """
+        What a Video needs to know about a source before it can be opened.
+
+        framerate is the real frame rate of the first video stream, samplerate and channels
+        are of the first audio stream. Use Metadata.probe to get the metadata of a source.
+        live is True for a stream that was received rather than read, its duration is -1 when it is not known.
+        """
+
+        self.duration = duration
+        self.has_video = has_video
+        self.width = width
+        self.height = height
+        self.framerate = framerate
+        self.has_audio = has_audio
+        self.samplerate = samplerate
+        self.channels = channels
+        self.live = live
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, values: dict):
+        return cls(**values)
+
+    @staticmethod
+    def cache_path(source: str) -> Optional[str]:
+        # the path, modification time and size identify a file without reading it, None for urls and other streams
+        try:
+            stat = os.stat(source)
+        except (OSError, ValueError):
+            return None
+
+        key = hashlib.sha1(f"{os.path.abspath(source)}|{stat.st_mtime_ns}|{stat.st_size}".encode()).hexdigest()
+        return os.path.join(cache_directory("metadata"), key + ".json")
+
+    @classmethod
+    def from_container(cls, container: "av.container.InputContainer", live: bool = False):
+        # the metadata of a container that was opened with PyAV
+        metadata = cls(live = live)
+
+        if container.duration is not None:
+            metadata.duration = container.duration / av.time_base
+
+        if container.streams.video:
+            stream = container.streams.video[0]
+            rate = stream.base_rate or stream.average_rate or stream.guessed_rate
+            metadata.has_video = True
+            metadata.width = stream.codec_context.width
+            metadata.height = stream.codec_context.height
+            metadata.framerate = float(rate) if rate else -1
+
+            if metadata.duration < 0 and stream.duration is not None:
+                metadata.duration = float(stream.duration * stream.time_base)
+
+        if container.streams.audio:
+            stream = container.streams.audio[0]
+            metadata.has_audio = True
+            metadata.samplerate = stream.codec_context.sample_rate
+            metadata.channels = stream.codec_context.channels
+
+            if metadata.duration < 0 and stream.duration is not None:
+                metadata.duration = float(stream.duration * stream.time_base)
+
+        return metadata
+
+    @classmethod
+    def scan(cls, source: str):
+        # the container headers are read in this process which is much cheaper than starting ffprobe
+        if av is not None:
+            try:
+                with av.open(source) as container:
+                    metadata = cls.from_container(container)
+
+            except Exception:
+                metadata = None
+
+            # some containers (MPEG-TS, MKV that was written as a stream) do not store how long they are
+            # ffprobe estimates it from the packets instead
+            if metadata is not None:
+                if metadata.duration < 0:
+                    try:
+                        metadata.duration = cls.scan_ffprobe(source).duration
+                    except (OSError, ValueError, KeyError):
+                        pass
+                return metadata
+
+        return cls.scan_ffprobe(source)
+
+    @classmethod
+    def scan_ffprobe(cls, source: str):
+        probed: dict = json.loads(subprocess.run(
+            ["ffprobe", "-v", "error", "-show_streams", "-print_format", "json", '-show_entries', 'format=duration', source],
+            capture_output = True, shell = False, text = True
+        ).stdout)
+
+        durations = [probed["format"].get("duration")] + [stream.get("duration") for stream in probed["streams"]]
+        metadata = cls(duration = next((float(duration) for duration in durations if duration not in (None, "N/A")), -1))
+        for stream in probed["streams"]:
+            if stream["codec_type"] == "video" and not metadata.has_video:
+                numerator, denominator = [float(p) for p in stream["r_frame_rate"].split("/")]
+                metadata.has_video = True
+                metadata.width = stream["width"]
+                metadata.height = stream["height"]
+                metadata.framerate = numerator / denominator
+
+            if stream["codec_type"] == "audio" and not metadata.has_audio:
+                metadata.has_audio = True
+                metadata.samplerate = int(stream["sample_rate"])
+                metadata.channels = stream["channels"]
+
+        return metadata
+
+    @classmethod
+    def probe(cls, source: str, use_cache: bool = True):
+        """
+        Returns the metadata of source, from the cache when the file has not changed since it was last probed.
+        """
+
+        path = cls.cache_path(source) if use_cache else None
+
+        if path and os.path.exists(path):
+            try:
+                with open(path) as file:
+                    metadata = cls.from_dict(json.load(file))
+
+                # older entries could have been written without a duration
+                if metadata.duration >= 0:
+                    return metadata
+
+            except (OSError, ValueError, TypeError):
+                pass # a broken cache entry is rebuilt below
+
+        metadata = cls.scan(source)
+
+        # a duration that could not be found is probed again next time instead of being taken as the end
+        if path and metadata.duration >= 0:
+            # write to a temporary file first so another process never reads half an entry
+            temporary = temporary_path(path)
+            with open(temporary, "w") as file:
+                json.dump(metadata.to_dict(), file)
+            os.replace(temporary, path)
+
+        return metadata
+
+    @classmethod
+    def probe_many(cls, sources: Iterable[str], workers: int = None, use_cache: bool = True) -> dict[str, Optional["Metadata"]]:
+        """
+        Probes many sources at the same time, the sources that could not be probed map to None.
+
+        Probing mostly waits on the disk or on ffprobe so more workers than cores are used by default.
+        """
+
+        sources = list(dict.fromkeys(sources))
+        results: dict[str, Optional[Metadata]] = dict.fromkeys(sources)
+
+        workers = workers or min(32, (os.cpu_count() or 4) * 4)
+        with concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix = "Metadata") as pool:
+            jobs = {pool.submit(cls.probe, source, use_cache): source for source in sources}
+
+            for job in concurrent.futures.as_completed(jobs):
+                try:
+                    results[jobs[job]] = job.result()
+
+                except Exception as error:
+                    traceback.print_exception(error)
+
+        return results
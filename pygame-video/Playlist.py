@@ -0,0 +1,203 @@
+from .Vector2 import Vector2
+from .Video import Video
+from .Font import Font
+from typing import Optional
+import threading
+import pygame
+
+class Playlist:
+    def __init__(
+        self,
+        sources: list[str],
+        loop: bool = True,
+        prefetch_time: float = 5.0,
+        prefetch_frames: int = 7,
+        font: Font = None,
+        **kwargs
+    ):
+        """
+        Plays sources one after another without a gap between them.
+
+        prefetch_time seconds before the current video ends the next one is set up paused, so by the time
+        it is needed its decoder is running and its first prefetch_frames frames and its audio are buffered.
+        The other keyword arguments are passed on to every Video.
+        """
+
+        self.sources = list(sources)
+        self.loop = loop
+        self.prefetch_time = prefetch_time
+        self.prefetch_frames = prefetch_frames
+
+        # one font for every video so the glyphs are only rendered once
+        self.font = font or Font("Ariel", 24)
+        self.video_arguments = kwargs
+
+        # the video that is playing and the one that is being prefetched, with their index in self.sources
+        self.current: Video = None
+        self.index = -1
+        self.upcoming: Video = None
+        self.upcoming_index = -1
+
+        self.lock = threading.Lock()
+        self.skip_requested = False
+
+        # set to wake up the playlist thread, for example to skip to the next video
+        self.wakeup = threading.Event()
+        self.running = True
+        self.playlist_thread = threading.Thread(target = self._internal_playlist_thread, daemon = True)
+        self.playlist_thread.start()
+
+    def add(self, source: str):
+        with self.lock:
+            self.sources.append(source)
+
+    def next_index(self, index: int) -> Optional[int]:
+        # the index of the video after index, None at the end of a playlist that does not loop
+        with self.lock:
+            if not self.sources:
+                return None
+
+            if index + 1 < len(self.sources):
+                return index + 1
+
+            return 0 if self.loop else None
+
+    def skip(self):
+        # moves on to the next video straight away
+        self.skip_requested = True
+        self.wakeup.set()
+
+    def prefetch(self, after: int) -> Optional[Video]:
+        # sets up the video that comes after index, paused so it only decodes ahead
+        index = self.next_index(after)
+        if index is None:
+            return None
+
+        self.upcoming_index = index
+        self.upcoming = Video(
+            self.sources[index], font = self.font, playing = False,
+            frame_buffer_slots = self.prefetch_frames + 1, **self.video_arguments
+        )
+        return self.upcoming
+
+    def is_finished(self, video: Video) -> bool:
+        if not video.ready_event.is_set():
+            return False
+
+        if video.setup_error is not None or (not video.has_video and not video.has_audio):
+            return True
+
+        return self.remaining(video) <= 0
+
+    def remaining(self, video: Video) -> float:
+        # the audio that is still on its way through the output latency is already queued, so the audio
+        # of the next video is started that much earlier to be heard straight after it
+        latency = video.audio_mixer.latency() if video.audio_channel is not None else 0
+        return video.duration - video.presentation_clock.time() - latency
+
+    def advance(self) -> bool:
+        # switches to the upcoming video, skipping the sources that fail to open, returns False when there is nothing left
+        after = self.index
+        for _ in range(len(self.sources)):
+            upcoming = self.upcoming or self.prefetch(after)
+            if upcoming is None:
+                return False
+
+            # only waits when the upcoming video was not prefetched in time
+            upcoming.ready_event.wait()
+
+            self.upcoming = None
+            if not self.running:
+                # close could have missed a video that was made while it was closing
+                upcoming.close()
+                return False
+
+            if upcoming.setup_error is None:
+                break
+
+            upcoming.close()
+            after = self.upcoming_index
+
+        else:
+            return False
+
+        previous = self.current
+        with self.lock:
+            self.current = upcoming
+            self.index = self.upcoming_index
+            self.upcoming_index = -1
+
+        upcoming.play()
+
+        if previous:
+            previous.close()
+
+        return True
+
+    def _internal_playlist_thread(self):
+        while self.running:
+            current = self.current
+
+            if current is None or self.skip_requested or self.is_finished(current):
+                self.skip_requested = False
+                if not self.advance():
+                    self.running = False
+                    return
+                continue
+
+            # a source that fails to open is skipped while the current video is still playing
+            upcoming = self.upcoming
+            if upcoming is not None and upcoming.ready_event.is_set() and upcoming.setup_error is not None:
+                upcoming.close()
+                self.upcoming = None
+                self.prefetch(self.upcoming_index)
+                continue
+
+            remaining = self.remaining(current) if current.ready_event.is_set() else self.prefetch_time
+            if self.upcoming is None and self.upcoming_index < 0 and remaining <= self.prefetch_time:
+                self.prefetch(self.index)
+
+            # checked often near the end so the switch happens within a few milliseconds of it
+            self.wakeup.wait(max(0.002, min(0.1, remaining / 2)))
+            self.wakeup.clear()
+
+    def draw(self, display: pygame.Surface, area: pygame.Rect, force: bool = False) -> list[pygame.Rect]:
+        current = self.current
+        if current is None or not current.decoder:
+            return []
+        return current.draw(display, area, force)
+
+    def mouse_down(self, area: pygame.Rect, mouse_pos: Vector2):
+        if self.current:
+            self.current.mouse_down(area, mouse_pos)
+
+    def mouse_move(self, area: pygame.Rect, mouse_pos: Vector2):
+        if self.current:
+            self.current.mouse_move(area, mouse_pos)
+
+    def mouse_up(self, area: pygame.Rect, mouse_pos: Vector2):
+        if self.current:
+            self.current.mouse_up(area, mouse_pos)
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+
+        # a video that is still being set up stops straight away once it is closed, so an advance waiting for it returns
+        upcoming = self.upcoming
+        if upcoming:
+            upcoming.close()
+
+        # the thread could be making or switching to a video right now, everything it made is closed once it has exited
+        if self.playlist_thread is not threading.current_thread():
+            self.playlist_thread.join()
+
+        for video in (self.current, self.upcoming):
+            if video:
+                video.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,80 @@
+import threading
+import time
+
+class PresentationClock:
+    def __init__(self, max_extrapolation: float = 0.1):
+        """
+        The clock that decides which frame should be on screen.
+
+        While audio is playing the clock follows the audio that is coming out of the speakers (audio master),
+        the player calls sync_to_audio whenever the mixer has played more of it and the time in between is extrapolated.
+        Without audio the clock follows time.monotonic (wall clock).
+        The clock runs rate times as fast as the wall clock, a negative rate runs it backwards.
+        """
+
+        # the audio clock is never extrapolated further than this past the last sync
+        # so the picture waits for the sound instead of running ahead when the audio stalls
+        self.max_extrapolation = max_extrapolation
+
+        self.lock = threading.Lock()
+        self.media_time = 0.0
+        self.anchor = time.monotonic()
+        self.audio_master = False
+        self.paused = False
+        self.rate = 1.0
+
+    def _elapsed(self, now: float):
+        if self.paused:
+            return 0.0
+
+        elapsed = now - self.anchor
+        if self.audio_master:
+            elapsed = min(elapsed, self.max_extrapolation)
+        return elapsed * self.rate
+
+    def time(self) -> float:
+        with self.lock:
+            return self.media_time + self._elapsed(time.monotonic())
+
+    def reset(self, media_time: float):
+        with self.lock:
+            self.media_time = media_time
+            self.anchor = time.monotonic()
+            self.audio_master = False
+
+    def sync_to_audio(self, media_time: float, at: float = None):
+        # media_time is the position of the audio that was being heard at time.monotonic() at, which defaults to now
+        with self.lock:
+            self.media_time = media_time
+            self.anchor = time.monotonic() if at is None else at
+            self.audio_master = True
+
+    def release_audio(self):
+        # the audio has ended or was disabled so continue from where it was on the wall clock
+        with self.lock:
+            now = time.monotonic()
+            self.media_time += self._elapsed(now)
+            self.anchor = now
+            self.audio_master = False
+
+    def pause(self):
+        with self.lock:
+            if not self.paused:
+                now = time.monotonic()
+                self.media_time += self._elapsed(now)
+                self.anchor = now
+                self.paused = True
+
+    def resume(self):
+        with self.lock:
+            if self.paused:
+                self.anchor = time.monotonic()
+                self.paused = False
+
+    def set_rate(self, rate: float):
+        # the time so far is kept and only what comes after runs at the new rate
+        with self.lock:
+            now = time.monotonic()
+            self.media_time += self._elapsed(now)
+            self.anchor = now
+            self.rate = rate
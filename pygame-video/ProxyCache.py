@@ -0,0 +1,171 @@
+from .Cache import cache_directory, file_key, temporary_path
+from typing import Optional
+import concurrent.futures
+import subprocess
+import traceback
+import threading
+import os
+
+try:
+    import av
+except ImportError:
+    av = None
+
+class ProxyCache:
+    def __init__(self, directory: str = None, max_bytes: int = 4 * 1024 ** 3, height: int = 360, codec: str = "mjpeg", workers: int = 1):
+        """
+        Low resolution copies of sources, transcoded in the background for playing in small areas.
+
+        Every frame of a proxy is a keyframe (codec is an intra frame codec) height pixels high, so it
+        decodes cheaply and seeks to any frame at once, and the audio is kept losslessly. The proxies are
+        stored in directory keyed by the file hash and the least recently used ones are deleted once they
+        take up more than max_bytes. Share one cache between the videos that should use it, see Video.
+        """
+
+        self.directory = directory or cache_directory("proxies")
+        os.makedirs(self.directory, exist_ok = True)
+        self.max_bytes = max_bytes
+        self.height = height
+        self.codec = codec
+
+        # one transcode at a time by default so generating proxies does not take the cores playback needs
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix = "ProxyCache")
+        self.pending: dict[str, concurrent.futures.Future] = {}
+        self.lock = threading.Lock()
+
+    def path(self, source: str) -> str:
+        return os.path.join(self.directory, f"{file_key(source)}_{self.height}p_{self.codec}.mkv")
+
+    def get(self, source: str) -> Optional[str]:
+        """
+        Returns the path of the proxy of source if it has been generated, and marks it as used.
+        """
+
+        path = self.path(source)
+        try:
+            # the modification time is when the proxy was last used, evict goes by it
+            os.utime(path)
+            return path
+
+        except OSError:
+            return None
+
+    def request(self, source: str) -> concurrent.futures.Future:
+        """
+        Generates the proxy of source in the background unless it exists, the future gives its path.
+        """
+
+        with self.lock:
+            future = self.pending.get(source)
+            if future is None:
+                future = self.pending[source] = self.executor.submit(self.generate, source)
+            return future
+
+    def generate(self, source: str) -> str:
+        try:
+            path = self.get(source)
+            if path:
+                return path
+
+            path = self.path(source)
+            temporary = temporary_path(path)
+
+            try:
+                if av is not None:
+                    self.transcode_av(source, temporary)
+                else:
+                    self.transcode_ffmpeg(source, temporary)
+                os.replace(temporary, path)
+
+            finally:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+
+            self.evict(keep = path)
+            return path
+
+        finally:
+            with self.lock:
+                self.pending.pop(source, None)
+
+    def proxy_size(self, width: int, height: int) -> tuple[int, int]:
+        # most codecs want even sizes for 4:2:0 chroma
+        proxy_height = min(height, self.height)
+        return (max(2, round(width * proxy_height / height / 2) * 2), max(2, proxy_height // 2 * 2))
+
+    def transcode_av(self, source: str, path: str):
+        with av.open(source) as input_container, av.open(path, "w", format = "matroska") as output_container:
+            video_input = input_container.streams.video[0]
+            video_input.thread_type = "AUTO"
+            audio_input = input_container.streams.audio[0] if input_container.streams.audio else None
+
+            framerate = video_input.average_rate or 30
+            width, height = self.proxy_size(video_input.codec_context.width, video_input.codec_context.height)
+            pixel_format = "yuvj420p" if self.codec == "mjpeg" else "yuv420p"
+
+            video_output = output_container.add_stream(self.codec, rate = framerate)
+            video_output.width, video_output.height = width, height
+            video_output.pix_fmt = pixel_format
+            video_output.codec_context.time_base = video_input.time_base
+            video_output.codec_context.gop_size = 1
+
+            # about a bit per pixel is plenty for an intra frame proxy
+            video_output.bit_rate = int(width * height * float(framerate))
+
+            audio_output = None
+            if audio_input is not None:
+                audio_output = output_container.add_stream("flac", rate = audio_input.codec_context.sample_rate)
+                audio_output.layout = audio_input.codec_context.layout
+
+            # the timestamps are carried over so the proxy lines up with the source frame for frame
+            streams = [video_input] + ([audio_input] if audio_input is not None else [])
+            for frame in input_container.decode(*streams):
+                if frame.pts is None:
+                    continue
+
+                if isinstance(frame, av.VideoFrame):
+                    converted = frame.reformat(width, height, pixel_format)
+                    converted.pts, converted.time_base = frame.pts, frame.time_base
+                    output_container.mux(video_output.encode(converted))
+                else:
+                    output_container.mux(audio_output.encode(frame))
+
+            for stream in (video_output, audio_output):
+                if stream:
+                    output_container.mux(stream.encode(None))
+
+    def transcode_ffmpeg(self, source: str, path: str):
+        command = [
+            "ffmpeg", "-v", "error", "-y", "-i", source, "-map", "0:v:0", "-map", "0:a:0?",
+            "-vf", f"scale=-2:{self.height}", "-c:v", self.codec, "-g", "1", "-q:v", "5", "-c:a", "flac", "-copyts", path
+        ]
+        subprocess.run(command, shell = False, check = True)
+
+    def evict(self, keep: str = None):
+        """
+        Deletes the least recently used proxies until the cache fits in max_bytes again.
+        """
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".mkv") and ".tmp" not in entry.name:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+
+            try:
+                os.remove(path)
+                total -= size
+
+            except OSError as error:
+                # the proxy could be open on a system that does not allow deleting open files
+                traceback.print_exception(error)
+
+    def close(self):
+        self.executor.shutdown(wait = False, cancel_futures = True)
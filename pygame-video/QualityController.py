@@ -0,0 +1,140 @@
+import time
+
+class DecodeSettings:
+    def __init__(self, scale: float = 1.0, frame_divisor: int = 1, threads: int = 0):
+        """
+        How much work the decoder of a video does.
+
+        scale is applied to the output size the video negotiated with the display, only every frame_divisor-th
+        frame is converted and presented and threads is the number of decoder threads, 0 lets the decoder decide.
+        """
+
+        self.scale = scale
+        self.frame_divisor = frame_divisor
+        self.threads = threads
+
+    def __eq__(self, other):
+        return isinstance(other, DecodeSettings) and (self.scale, self.frame_divisor, self.threads) == (other.scale, other.frame_divisor, other.threads)
+
+    def __repr__(self):
+        return f"DecodeSettings(scale = {self.scale}, frame_divisor = {self.frame_divisor}, threads = {self.threads})"
+
+    def needs_restart(self, other: "DecodeSettings") -> bool:
+        # the frame divisor is applied by the reader, everything else is only picked up when the decoder restarts
+        return self.scale != other.scale or self.threads != other.threads
+
+class QualityController:
+    # from the best quality to the cheapest
+    LEVELS = [
+        DecodeSettings(1.0, 1, 0),
+        DecodeSettings(0.75, 1, 4),
+        DecodeSettings(0.5, 1, 2),
+        DecodeSettings(0.5, 2, 2),
+        DecodeSettings(0.25, 2, 1),
+        DecodeSettings(0.25, 3, 1),
+    ]
+
+    def __init__(
+        self,
+        levels: list[DecodeSettings] = None,
+        window: float = 1.0,
+        busy: float = 0.8,
+        idle: float = 0.4,
+        low_buffer: float = 0.25,
+        upgrade_after: float = 5.0,
+        max_upgrade_after: float = 60.0,
+    ):
+        """
+        Steps the decode settings of a video down when it can not keep up and back up when there is headroom.
+
+        Every window seconds the controller looks at the frames that were dropped, how full the frame buffer was
+        and how much of the time per frame went into decoding. A video is under pressure when it dropped frames,
+        decoding took more than busy of the time per frame or the buffer was less than low_buffer full.
+        It steps back up after upgrade_after seconds without pressure, decoding under idle of the time per frame
+        and a buffer that is more than three quarters full. Every step down right after a step up doubles
+        upgrade_after, up to max_upgrade_after, so a machine on the edge does not keep going up and down.
+        """
+
+        self.levels = levels or self.LEVELS
+        self.level = 0
+
+        self.window = window
+        self.busy = busy
+        self.idle = idle
+        self.low_buffer = low_buffer
+        self.upgrade_after = upgrade_after
+        self.max_upgrade_after = max_upgrade_after
+
+        self.last_change_was_up = False
+        self.headroom_since: float = None
+        self.restart()
+
+    @property
+    def settings(self) -> DecodeSettings:
+        return self.levels[self.level]
+
+    def restart(self):
+        # called when the decoder restarts, the buffer is empty afterwards and says nothing about the load
+        self.window_start = time.monotonic()
+        self.decode_time = 0.0
+        self.decoded = 0
+        self.buffer_fill = 0.0
+        self.buffer_samples = 0
+        self.frames_dropped: int = None
+
+    def record_decode(self, seconds: float):
+        # called by the reader after every frame it decoded
+        self.decode_time += seconds
+        self.decoded += 1
+
+    def update(self, buffer_fill: float, frames_dropped: int, frame_duration: float) -> bool:
+        """
+        Called by the presenter with how full the buffer is (0 to 1), the total number of dropped frames and
+        the duration of a frame. Returns True when self.settings has changed.
+        """
+
+        now = time.monotonic()
+        if self.frames_dropped is None:
+            self.frames_dropped = frames_dropped
+
+        self.buffer_fill += buffer_fill
+        self.buffer_samples += 1
+
+        if now - self.window_start < self.window or not self.decoded:
+            return False
+
+        dropped = frames_dropped - self.frames_dropped
+        buffer_fill = self.buffer_fill / self.buffer_samples
+
+        # only every frame_divisor-th frame is presented so that is how long each of them can take
+        load = (self.decode_time / self.decoded) / (frame_duration * self.settings.frame_divisor)
+
+        self.restart()
+        self.frames_dropped = frames_dropped
+
+        if dropped > 0 or load > self.busy or buffer_fill < self.low_buffer:
+            self.headroom_since = None
+            if self.level + 1 >= len(self.levels):
+                return False
+
+            if self.last_change_was_up:
+                self.upgrade_after = min(self.upgrade_after * 2, self.max_upgrade_after)
+
+            self.level += 1
+            self.last_change_was_up = False
+            return True
+
+        if load < self.idle and buffer_fill > 0.75 and self.level > 0:
+            if self.headroom_since is None:
+                self.headroom_since = now
+
+            elif now - self.headroom_since >= self.upgrade_after:
+                self.headroom_since = None
+                self.level -= 1
+                self.last_change_was_up = True
+                return True
+
+        else:
+            self.headroom_since = None
+
+        return False
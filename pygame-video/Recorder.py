@@ -0,0 +1,376 @@
+from .Decoder import FFMPEG_PIXEL_FORMATS, channel_layout, rational_rate
+from .FrameBuffer import PIXEL_FORMAT_BYTES
+from typing import Optional
+import collections
+import subprocess
+import traceback
+import threading
+import fractions
+import pygame
+import numpy
+import os
+
+try:
+    import av
+except ImportError:
+    av = None
+
+class SubprocessEncoder:
+    def __init__(self, path: str, codec: str, input_size: tuple[int, int], pixel_format: str, size: tuple[int, int], framerate: fractions.Fraction, samplerate: Optional[int], channels: int):
+        """
+        Encodes raw frames written to the stdin of an ffmpeg process, and s16le pcm written to a second pipe.
+
+        The audio is left out where ffmpeg can not inherit the second pipe.
+        """
+
+        command = [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", FFMPEG_PIXEL_FORMATS[pixel_format], "-s", f"{input_size[0]}x{input_size[1]}", "-r", str(framerate), "-i", "pipe:0",
+        ]
+
+        self.audio_pipe = None
+        read_fd = None
+        if samplerate and os.name != "nt":
+            read_fd, write_fd = os.pipe()
+            command += ["-f", "s16le", "-ar", str(samplerate), "-ac", str(channels), "-i", f"pipe:{read_fd}", "-map", "0:v", "-map", "1:a"]
+            self.audio_pipe = os.fdopen(write_fd, "wb")
+
+        command += ["-c:v", codec, "-pix_fmt", "yuv420p", "-s", f"{size[0]}x{size[1]}", path]
+
+        try:
+            self.process = subprocess.Popen(command, stdin = subprocess.PIPE, shell = False, pass_fds = (read_fd,) if read_fd is not None else ())
+        except BaseException:
+            if self.audio_pipe:
+                self.audio_pipe.close()
+            raise
+        finally:
+            if read_fd is not None:
+                os.close(read_fd)
+
+        self.has_audio = self.audio_pipe is not None
+
+    def write_video(self, data: memoryview, index: int):
+        # raw video has no timestamps, the recorder writes a frame for every index
+        self.process.stdin.write(data)
+
+    def write_audio(self, data: bytes):
+        self.audio_pipe.write(data)
+
+    def close(self):
+        # closing the inputs is how ffmpeg knows the recording has ended
+        for stream in (self.process.stdin, self.audio_pipe):
+            if stream:
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+
+        self.process.wait()
+
+class AVEncoder:
+    def __init__(self, path: str, codec: str, input_size: tuple[int, int], pixel_format: str, size: tuple[int, int], framerate: fractions.Fraction, samplerate: Optional[int], channels: int):
+        """
+        Encodes and muxes in process with PyAV, the video and the audio are written from different threads.
+        """
+
+        self.container = av.open(path, "w")
+        self.input_size = input_size
+        self.pixel_format = pixel_format
+        self.size = size
+
+        self.video_stream = self.container.add_stream(codec, rate = framerate)
+        self.video_stream.width, self.video_stream.height = size
+        self.video_stream.pix_fmt = "yuv420p"
+        self.video_stream.codec_context.time_base = fractions.Fraction(1, framerate)
+
+        self.audio_stream = None
+        if samplerate:
+            self.audio_stream = self.container.add_stream(self.container.default_audio_codec, rate = samplerate)
+            self.audio_stream.layout = channel_layout(channels)
+        self.has_audio = self.audio_stream is not None
+
+        self.channels = channels
+        self.samplerate = samplerate
+        self.samples_written = 0
+
+        # the muxer is shared between the video and the audio thread
+        self.lock = threading.Lock()
+
+    def _mux(self, stream, frame):
+        packets = stream.encode(frame)
+        with self.lock:
+            self.container.mux(packets)
+
+    def write_video(self, data: memoryview, index: int):
+        width, height = self.input_size
+        pixels = numpy.frombuffer(data, numpy.uint8).reshape(height, width, PIXEL_FORMAT_BYTES[self.pixel_format])
+        frame = av.VideoFrame.from_ndarray(pixels, format = FFMPEG_PIXEL_FORMATS[self.pixel_format])
+        if self.size != self.input_size:
+            frame = frame.reformat(self.size[0], self.size[1])
+        frame.pts = index
+        self._mux(self.video_stream, frame)
+
+    def write_audio(self, data: bytes):
+        frame = av.AudioFrame.from_ndarray(numpy.frombuffer(data, numpy.int16).reshape(1, -1), format = "s16", layout = channel_layout(self.channels))
+        frame.sample_rate = self.samplerate
+        frame.time_base = fractions.Fraction(1, self.samplerate)
+        frame.pts = self.samples_written
+        self.samples_written += frame.samples
+        self._mux(self.audio_stream, frame)
+
+    def close(self):
+        # flushes the frames the encoders are still holding on to
+        for stream in (self.video_stream, self.audio_stream):
+            if stream:
+                self._mux(stream, None)
+        self.container.close()
+
+def open_encoder(path: str, codec: str, input_size: tuple[int, int], pixel_format: str, size: tuple[int, int], framerate: fractions.Fraction, samplerate: Optional[int], channels: int, backend: str = "auto"):
+    """
+    Opens the best available encoder, backend can be "auto", "av" or "ffmpeg".
+    """
+
+    if backend in ("auto", "av") and av is not None:
+        try:
+            return AVEncoder(path, codec, input_size, pixel_format, size, framerate, samplerate, channels)
+
+        except Exception:
+            if backend == "av":
+                raise
+
+    return SubprocessEncoder(path, codec, input_size, pixel_format, size, framerate, samplerate, channels)
+
+class Recorder:
+    def __init__(
+        self,
+        path: str,
+        input_size: tuple[int, int],
+        pixel_format: str,
+        framerate: float,
+        position: float,
+        samplerate: Optional[int] = None,
+        channels: int = 2,
+        codec: str = "libx264",
+        size: tuple[int, int] = None,
+        queue_frames: int = 30,
+        queue_audio: float = 2.0,
+        backend: str = "auto",
+    ):
+        """
+        Encodes the frames and pcm a player has already decoded to path, see Video.start_recording.
+
+        add_frame and add_audio never wait: they copy into a queue of at most queue_frames frames
+        and queue_audio seconds of pcm that writer threads hand to the encoder, what does not fit is
+        dropped and counted. Both are placed on one timeline by their media time, starting from position.
+        Frames that are missing from it (dropped or never presented) are filled in by repeating the frame
+        before, gaps in the audio are filled with silence, and split continues the timeline after a seek.
+        """
+
+        self.path = path
+        self.input_size = (int(input_size[0]), int(input_size[1]))
+        self.pixel_format = pixel_format
+        # the encoders want the rate as a fraction, a float like 29.97 would make the time base inexact
+        self.framerate = rational_rate(framerate)
+        self.samplerate = samplerate
+        self.channels = channels
+        self.size = (int(size[0]), int(size[1])) if size else self.input_size
+
+        self.encoder = open_encoder(path, codec, self.input_size, pixel_format, self.size, self.framerate, samplerate, channels, backend)
+        self.has_audio = self.encoder.has_audio
+
+        # the media time that is at 0 in the recording, and the end of what has been queued so far
+        self.origin = position
+        self.queued_until = 0.0
+
+        self.condition = threading.Condition()
+        self.video_queue: collections.deque[Optional[tuple[bytearray, tuple[int, int], str, float]]] = collections.deque()
+        self.audio_queue: collections.deque[Optional[tuple[bytes, float]]] = collections.deque()
+
+        # frame copies are reused once they have been encoded, at most queue_frames of them exist
+        self.free_buffers: list[bytearray] = []
+        self.queue_frames = queue_frames
+        self.allocated = 0
+        self.audio_queued = 0
+        self.max_audio_queued = int(queue_audio * (samplerate or 0) * channels * 2)
+
+        self.frames_recorded = 0
+        self.frames_dropped = 0
+        self.audio_dropped = 0.0
+        self.error: Exception = None
+        self.closed = False
+
+        self.video_thread = threading.Thread(target = self._internal_video_thread, daemon = True)
+        self.video_thread.start()
+
+        self.audio_thread: threading.Thread = None
+        if self.has_audio:
+            self.audio_thread = threading.Thread(target = self._internal_audio_thread, daemon = True)
+            self.audio_thread.start()
+
+    def add_frame(self, view: memoryview, pts: float, size: tuple[int, int], pixel_format: str):
+        # called by the presenter with the frame that was just put on screen
+        with self.condition:
+            if self.closed:
+                return
+
+            if self.free_buffers:
+                buffer = self.free_buffers.pop()
+            elif self.allocated < self.queue_frames:
+                buffer = None
+                self.allocated += 1
+            else:
+                self.frames_dropped += 1
+                return
+
+        # the copy is made outside the lock so the writer thread can keep taking frames
+        if buffer is None or len(buffer) != len(view):
+            buffer = bytearray(len(view))
+        buffer[:] = view
+
+        time = pts - self.origin
+        with self.condition:
+            self.video_queue.append((buffer, size, pixel_format, time))
+            self.queued_until = max(self.queued_until, time + 1 / self.framerate)
+            self.condition.notify_all()
+
+    def add_audio(self, data: bytes, position: float):
+        # called with the pcm starting at media time position on its way to the mixer
+        if not self.has_audio:
+            return
+
+        with self.condition:
+            if self.closed:
+                return
+
+            if self.audio_queued + len(data) > self.max_audio_queued:
+                self.audio_dropped += len(data) / (self.samplerate * self.channels * 2)
+                return
+
+            time = position - self.origin
+            self.audio_queue.append((bytes(data), time))
+            self.audio_queued += len(data)
+            self.queued_until = max(self.queued_until, time + len(data) / (self.samplerate * self.channels * 2))
+            self.condition.notify_all()
+
+    def split(self, position: float):
+        # after a seek the media at position carries on from where the recording has got to
+        with self.condition:
+            self.origin = position - self.queued_until
+
+    def _take(self, queue: collections.deque):
+        with self.condition:
+            self.condition.wait_for(lambda: queue)
+            return queue.popleft()
+
+    def convert(self, buffer: bytearray, size: tuple[int, int], pixel_format: str) -> bytes:
+        # the output was renegotiated while recording, the encoder still wants the size and format it was started with
+        surface = pygame.image.frombuffer(buffer, size, pixel_format)
+        if size != self.input_size:
+            surface = pygame.transform.smoothscale(surface, self.input_size)
+        return pygame.image.tobytes(surface, self.pixel_format)
+
+    def _internal_video_thread(self):
+        written = -1
+        previous: Optional[bytearray] = None
+
+        # whether previous is a frame copy from free_buffers or a converted frame, only copies go back to be reused
+        previous_pooled = False
+
+        while True:
+            item = self._take(self.video_queue)
+            if item is None:
+                break
+
+            buffer, size, pixel_format, time = item
+            index = round(time * self.framerate)
+            released = [buffer]
+
+            try:
+                if self.error is None and index > written:
+                    data = buffer if (size, pixel_format) == (self.input_size, self.pixel_format) else self.convert(buffer, size, pixel_format)
+
+                    # the frames that were not presented are filled in with the one before, so the video keeps time with the audio
+                    if previous is not None:
+                        for missing in range(written + 1, index):
+                            self.encoder.write_video(memoryview(previous), missing)
+
+                    self.encoder.write_video(memoryview(data), index)
+                    written = index
+                    self.frames_recorded += 1
+
+                    # the frame is kept to fill in a gap after it, the one before goes back to be reused
+                    released = ([] if data is buffer else [buffer]) + ([previous] if previous_pooled else [])
+                    previous, previous_pooled = (buffer, True) if data is buffer else (bytearray(data), False)
+
+            except Exception as error:
+                self.error = error
+                traceback.print_exception(error)
+
+            finally:
+                with self.condition:
+                    self.free_buffers.extend(released)
+
+    def _internal_audio_thread(self):
+        frame_bytes = self.channels * 2
+        written = 0
+
+        while True:
+            item = self._take(self.audio_queue)
+            if item is None:
+                break
+
+            data, time = item
+            with self.condition:
+                self.audio_queued -= len(data)
+
+            # the audio before the seek that was still queued overlaps the recording so far, a gap is silence
+            target = round(time * self.samplerate)
+            if target < written:
+                data = data[(written - target) * frame_bytes:]
+
+            try:
+                # the silence is written a second at a time so a long gap does not have to be held at once
+                while self.error is None and target > written:
+                    silence = min(target - written, self.samplerate)
+                    self.encoder.write_audio(bytes(silence * frame_bytes))
+                    written += silence
+
+                if self.error is None and data:
+                    self.encoder.write_audio(data)
+                    written += len(data) // frame_bytes
+
+            except Exception as error:
+                self.error = error
+                traceback.print_exception(error)
+
+    def get_stats(self) -> dict:
+        return {
+            "path": self.path,
+            "frames_recorded": self.frames_recorded,
+            "frames_dropped": self.frames_dropped,
+            "audio_dropped": self.audio_dropped,
+            "queued_frames": len(self.video_queue),
+        }
+
+    def close(self):
+        """
+        Encodes everything that is still queued and finishes the file.
+        """
+
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.video_queue.append(None)
+            self.audio_queue.append(None)
+            self.condition.notify_all()
+
+        self.video_thread.join()
+        if self.audio_thread:
+            self.audio_thread.join()
+
+        try:
+            self.encoder.close()
+
+        except Exception as error:
+            traceback.print_exception(error)
@@ -0,0 +1,165 @@
+from typing import Callable
+import collections
+import traceback
+import threading
+import logging
+import bisect
+import time
+
+class LatencyHistogram:
+    # the upper bound in seconds of every bucket, the last one catches everything slower
+    BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, float("inf"))
+
+    def __init__(self):
+        self.counts = [0] * len(self.BOUNDS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        # the upper bound of the bucket the p-th percentile falls in, the max for the last bucket
+        if not self.count:
+            return 0.0
+
+        target = p / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                (f"<={bound * 1000:g}ms" if bound != float("inf") else f">{self.BOUNDS[-2] * 1000:g}ms"): count
+                for bound, count in zip(self.BOUNDS, self.counts)
+            },
+        }
+
+class RateMeter:
+    def __init__(self, window: float = 1.0):
+        """
+        Counts how many times tick was called per second over the last window seconds.
+        """
+
+        self.window = window
+        self.ticks = collections.deque()
+
+        # tick is called by the reader while the presenter and the thread that draws call rate
+        self.lock = threading.Lock()
+
+    def prune(self, now: float):
+        # must be called while holding self.lock
+        while self.ticks and self.ticks[0] < now - self.window:
+            self.ticks.popleft()
+
+    def tick(self, now: float = None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.ticks.append(now)
+            self.prune(now)
+
+    def rate(self, now: float = None) -> float:
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.prune(now)
+            return len(self.ticks) / self.window
+
+class PlaybackStats:
+    def __init__(self, report_interval: float = 1.0):
+        """
+        Performance counters of a single Video, see Video.get_stats for everything that is reported.
+
+        Listeners added with add_listener are called with the stats every report_interval seconds
+        from the thread that presents the video, log_to adds a listener that writes them to a logger.
+        """
+
+        self.decode_rate = RateMeter()
+        self.present_rate = RateMeter()
+
+        self.frames_decoded = 0
+        self.read_latency = LatencyHistogram()
+
+        # reads from the decoder that took longer than a frame, the presenter can only keep up from its buffer
+        self.pipe_stalls = 0
+
+        # from the seek being asked for until the first frame after it was on screen
+        self.seek_latency = LatencyHistogram()
+        self.seek_started: float = None
+
+        # how far the frame on screen is from the presentation clock (which follows the audio) in seconds
+        # positive when the picture is behind the sound
+        self.av_offset = 0.0
+        self.av_offset_average = 0.0
+
+        self.report_interval = report_interval
+        self.reported_at = time.monotonic()
+        self.listeners: list[Callable[[dict], None]] = []
+        self.lock = threading.Lock()
+
+    def record_decode(self, seconds: float, frame_duration: float):
+        self.decode_rate.tick()
+        self.frames_decoded += 1
+        self.read_latency.record(seconds)
+        if seconds > frame_duration:
+            self.pipe_stalls += 1
+
+    def record_seek(self):
+        self.seek_started = time.perf_counter()
+
+    def record_present(self, av_offset: float):
+        self.present_rate.tick()
+
+        self.av_offset = av_offset
+        self.av_offset_average += (av_offset - self.av_offset_average) * 0.1
+
+        if self.seek_started is not None:
+            self.seek_latency.record(time.perf_counter() - self.seek_started)
+            self.seek_started = None
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def log_to(self, logger: logging.Logger = None, level: int = logging.INFO, name: str = "") -> Callable[[dict], None]:
+        # returns the listener so it can be removed again
+        logger = logger or logging.getLogger("pygame-video")
+        listener = lambda stats: logger.log(level, "%s %s", name, stats)
+        self.add_listener(listener)
+        return listener
+
+    def due(self, now: float) -> bool:
+        # True once every report_interval seconds while there are listeners
+        if not self.listeners or now - self.reported_at < self.report_interval:
+            return False
+        self.reported_at = now
+        return True
+
+    def report(self, stats: dict):
+        with self.lock:
+            listeners = list(self.listeners)
+
+        for listener in listeners:
+            try:
+                listener(stats)
+
+            except Exception as error:
+                traceback.print_exception(error)
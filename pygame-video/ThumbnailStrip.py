@@ -0,0 +1,144 @@
+from .KeyframeIndex import KeyframeIndex
+from .Cache import cache_directory, file_key, temporary_path
+from .Decoder import read_exact
+from typing import Optional
+import subprocess
+import threading
+import bisect
+import json
+import os
+import pygame
+
+try:
+    import av
+except ImportError:
+    av = None
+
+class ThumbnailStrip:
+    def __init__(self, source: str, index: KeyframeIndex, video_size: tuple[int, int], width: int = 160, interval: float = 2.0, columns: int = 32):
+        """
+        Low resolution thumbnails of the keyframes of a source for previewing while scrubbing.
+
+        Only keyframes are decoded, at most one every interval seconds. The thumbnails are cached
+        on disk as a single sprite sheet keyed by the file hash so they are only generated once.
+        """
+
+        self.source = source
+        self.index = index
+        self.interval = interval
+        self.columns = columns
+
+        self.size = (int(width), max(1, round(width * video_size[1] / video_size[0])))
+
+        # filled in by generate, in order, so they can be used while the strip is still being generated
+        # get runs on the thread that draws, lock keeps it from seeing a surface without its timestamp
+        self.timestamps: list[float] = []
+        self.surfaces: list[pygame.Surface] = []
+        self.lock = threading.Lock()
+        self.ready = False
+
+        key = f"{file_key(source)}_{self.size[0]}x{self.size[1]}_{interval}"
+        directory = cache_directory("thumbnails")
+        self.sheet_path = os.path.join(directory, key + ".png")
+        self.timestamps_path = os.path.join(directory, key + ".json")
+
+    def get(self, t: float) -> Optional[pygame.Surface]:
+        # the thumbnail of the last keyframe at or before t
+        with self.lock:
+            if not self.surfaces:
+                return None
+            i = bisect.bisect_right(self.timestamps, t) - 1
+            return self.surfaces[max(0, i)]
+
+    def add(self, t: float, surface: pygame.Surface):
+        with self.lock:
+            self.timestamps.append(t)
+            self.surfaces.append(surface)
+
+    def generate(self):
+        if not self.load():
+            for t, surface in self.decode_keyframes():
+                if self.timestamps and t < self.timestamps[-1] + self.interval:
+                    continue
+
+                self.add(t, surface)
+
+            self.save()
+
+        self.ready = True
+
+    def decode_keyframes(self):
+        if av is not None:
+            try:
+                with av.open(self.source) as container:
+                    stream = container.streams.video[0]
+
+                    # the decoder throws away everything that is not a keyframe without decoding it
+                    stream.codec_context.skip_frame = "NONKEY"
+                    for frame in container.decode(stream):
+                        if frame.time is None:
+                            continue
+
+                        image = frame.to_ndarray(width = self.size[0], height = self.size[1], format = "rgb24")
+                        yield frame.time, pygame.image.frombuffer(image.tobytes(), self.size, "RGB")
+                return
+
+            except Exception:
+                pass
+
+        process = subprocess.Popen(
+            ["ffmpeg", "-v", "error", "-skip_frame", "nokey", "-i", self.source, "-vf", f"scale={self.size[0]}:{self.size[1]}", "-vsync", "passthrough", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"],
+            stdout = subprocess.PIPE, shell = False
+        )
+
+        try:
+            # the frames come out in the same order as the keyframes in the index
+            for t in self.index.keyframes:
+                data = bytearray(self.size[0] * self.size[1] * 3)
+                if not read_exact(process.stdout, memoryview(data)):
+                    break
+                yield t, pygame.image.frombuffer(data, self.size, "RGB")
+
+        finally:
+            process.terminate()
+            process.stdout.close()
+            process.wait()
+
+    def load(self) -> bool:
+        if not os.path.exists(self.sheet_path) or not os.path.exists(self.timestamps_path):
+            return False
+
+        try:
+            with open(self.timestamps_path) as file:
+                timestamps = json.load(file)
+            sheet = pygame.image.load(self.sheet_path)
+
+        except (OSError, ValueError, pygame.error):
+            return False
+
+        for i, t in enumerate(timestamps):
+            rect = pygame.Rect((i % self.columns) * self.size[0], (i // self.columns) * self.size[1], *self.size)
+            self.add(t, sheet.subsurface(rect))
+
+        return True
+
+    def save(self):
+        if not self.surfaces:
+            return
+
+        rows = (len(self.surfaces) + self.columns - 1) // self.columns
+        sheet = pygame.Surface((min(len(self.surfaces), self.columns) * self.size[0], rows * self.size[1]))
+        sheet.blits([
+            (surface, ((i % self.columns) * self.size[0], (i // self.columns) * self.size[1]))
+            for i, surface in enumerate(self.surfaces)
+        ], doreturn = False)
+
+        # the timestamps are written last so a sheet is never used without them
+        temporary = temporary_path(self.sheet_path)
+        pygame.image.save(sheet, temporary)
+        os.replace(temporary, self.sheet_path)
+
+        temporary = temporary_path(self.timestamps_path)
+        with open(temporary, "w") as file:
+            json.dump(self.timestamps, file)
+        os.replace(temporary, self.timestamps_path)
@@ -2,168 +2,199 @@ from __future__ import annotations
 from typing import Iterable, Union
 import pygame
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def pair(other) -> tuple[float, float]:
+    # a number is used for both components, anything else is unpacked like a tuple
+    if isinstance(other, (int, float)):
+        return other, other
+
+    try:
+        x, y = other
+    except TypeError:
+        return other, other # numbers that are not ints or floats like numpy scalars
+
+    return x, y
+
 class Vector2(pygame.math.Vector2):
+    # no __dict__ so a Vector2 is as small as a pygame.math.Vector2
+    __slots__ = ()
+
     def __init__(self, x: Union[int, float] = None, y: Union[int, float] = None):
         """
         A Vector2 class that inherits from pygame.math.Vector2
 
         You can create one by passing in two numbers, or a tuple of two numbers.
+        The operators work per component and are done by pygame in C, a number is used for both components.
+        They return a Vector2 so the results keep the methods of this class, also when the vector is on the right.
+        The in place operators change the vector instead of creating a new one.
         """
 
-        if not y == None:
+        if y is not None:
             super().__init__(x, y) # its not a tuple
 
-        elif isinstance(x, tuple):
-            super().__init__(x[0], x[1]) # its a tuple
+        elif x is None:
+            super().__init__(0, 0)
 
-        elif isinstance(x, int) or isinstance(x, float):
+        elif isinstance(x, (int, float)):
             super().__init__(x, x) # its a single number
 
-        elif x is None:
-            super().__init__(0, 0)
+        else:
+            super().__init__(x) # its a tuple or another vector
 
     def __tuple__(self):
-        return (self[0], self[1])
+        return (self.x, self.y)
 
     def __list__(self):
-        return [self[0], self[1]]
+        return [self.x, self.y]
 
     def __abs__(self):
-        return Vector2(abs(self[0]), abs(self[1]))
+        return Vector2(abs(self.x), abs(self.y))
 
     def to_int(self):
-        return Vector2(int(self[0]), int(self[1]))
+        return Vector2(int(self.x), int(self.y))
 
     def copy(self):
-        return Vector2(self[0], self[1])
+        return Vector2(self.x, self.y)
 
     def __round__(self, i):
-        return Vector2(round(self[0], i), round(self[1], i))
+        return Vector2(round(self.x, i), round(self.y, i))
 
     def __imul__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        self[0] *= other[0]
-        self[1] *= other[1]
-        return Vector2(self[0], self[1])
+        x, y = pair(other)
+        self.x *= x
+        self.y *= y
+        return self
 
     def __mul__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return Vector2(self[0] * other[0], self[1] * other[1])
+        return Vector2(self.elementwise() * other)
+
+    def __rmul__(self, other: Union[Vector2, tuple[float, float]]):
+        return Vector2(other * self.elementwise())
 
     def __isub__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        self[0] -= other[0]
-        self[1] -= other[1]
-        return Vector2(self[0], self[1])
+        x, y = pair(other)
+        self.x -= x
+        self.y -= y
+        return self
 
     def __sub__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return Vector2(self[0] - other[0], self[1] - other[1])
+        return Vector2(self.elementwise() - other)
+
+    def __rsub__(self, other: Union[Vector2, tuple[float, float]]):
+        return Vector2(other - self.elementwise())
 
     def __iadd__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        self[0] += other[0]
-        self[1] += other[1]
-        return Vector2(self[0], self[1])
+        x, y = pair(other)
+        self.x += x
+        self.y += y
+        return self
 
     def __add__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return Vector2(self[0] + other[0], self[1] + other[1])
+        return Vector2(self.elementwise() + other)
+
+    def __radd__(self, other: Union[Vector2, tuple[float, float]]):
+        return Vector2(other + self.elementwise())
 
     def __itruediv__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        self[0] /= other[0]
-        self[1] /= other[1]
-        return Vector2(self[0], self[1])
+        x, y = pair(other)
+        self.x /= x
+        self.y /= y
+        return self
 
     def __truediv__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return Vector2(self[0] / other[0], self[1] / other[1])
+        # pygame divides by a number by multiplying with its inverse which can be off in the last digit
+        if isinstance(other, (int, float)):
+            return Vector2(self.x / other, self.y / other)
+        return Vector2(self.elementwise() / other)
+
+    def __rtruediv__(self, other: Union[Vector2, tuple[float, float]]):
+        return Vector2(other / self.elementwise())
 
     def __ifloordiv__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        self[0] //= other[0]
-        self[1] //= other[1]
-        return Vector2(self[0], self[1])
+        x, y = pair(other)
+        self.x //= x
+        self.y //= y
+        return self
 
+    # floor division gives ints like it always has, callers use the result as pixel coordinates
     def __floordiv__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return Vector2(int(self[0] // other[0]), int(self[1] // other[1]))
+        x, y = pair(other)
+        return Vector2(int(self.x // x), int(self.y // y))
+
+    def __rfloordiv__(self, other: Union[Vector2, tuple[float, float]]):
+        x, y = pair(other)
+        return Vector2(int(x // self.x), int(y // self.y))
 
     def __mod__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return Vector2(self[0] % other[0], self[1] % other[1])
+        return Vector2(self.elementwise() % other)
+
+    def __rmod__(self, other: Union[Vector2, tuple[float, float]]):
+        return Vector2(other % self.elementwise())
 
     def __imod__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        self[0] %= other[0]
-        self[1] %= other[1]
-        return Vector2(self[0], self[1])
+        x, y = pair(other)
+        self.x %= x
+        self.y %= y
+        return self
 
     def __pow__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return Vector2(self[0] ** other[0], self[1] ** other[1])
+        return Vector2(self.elementwise() ** other)
+
+    def __rpow__(self, other: Union[Vector2, tuple[float, float]]):
+        return Vector2(other ** self.elementwise())
 
     def __ipow__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        self[0] **= other[0]
-        self[1] **= other[1]
-        return Vector2(self[0], self[1])
+        x, y = pair(other)
+        self.x **= x
+        self.y **= y
+        return self
 
+    # the comparisons are only true when they are true for both components
     def __lt__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return self[0] < other[0] and self[1] < other[1]
+        return self.elementwise() < other
 
     def __le__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return self[0] <= other[0] and self[1] <= other[1]
+        return self.elementwise() <= other
 
     def __eq__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return self[0] == other[0] and self[1] == other[1]
+        return self.elementwise() == other
 
     def __ne__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return self[0] != other[0] and self[1] != other[1]
+        return self.elementwise() != other
 
     def __ge__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return self[0] >= other[0] and self[1] >= other[1]
+        return self.elementwise() >= other
 
     def __gt__(self, other: Union[Vector2, tuple[float, float]]):
-        if not isinstance(other, Iterable):
-            other = (other, other)
-        return self[0] > other[0] and self[1] > other[1]
+        return self.elementwise() > other
 
+    @staticmethod
     def get_average(values: Iterable[Union[Vector2, tuple[int, int]]]):
-        total = Vector2(0, 0)
-        for val in values:
-            total += val
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            return Vector2(*values.mean(axis = 0).tolist())
 
-        return total / Vector2(len(values), len(values))
+        total_x = total_y = 0.0
+        count = 0
+        for x, y in values:
+            total_x += x
+            total_y += y
+            count += 1
 
+        return Vector2(total_x / count, total_y / count)
+
+    @staticmethod
     def sum(values: Iterable[Union[Vector2, tuple[int, int]]]):
-        total = Vector2(0, 0)
-        for val in values:
-            total += val
+        # a numpy array of shape (n, 2) is summed by numpy, converting a list to an array first is slower than the loop
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            return Vector2(*values.sum(axis = 0).tolist())
+
+        total_x = total_y = 0.0
+        for x, y in values:
+            total_x += x
+            total_y += y
 
-        return total
\ No newline at end of file
+        return Vector2(total_x, total_y)
@@ -1,53 +1,203 @@
-from .exceptions import NoAudioOrVideoException
+from .PresentationClock import PresentationClock
+from .AudioMixer import AudioMixer, AudioChannel
+from .Decoder import open_decoder, ProcessDecoder, LiveDecoder
+from .ThumbnailStrip import ThumbnailStrip
+from .FrameExtractor import FrameExtractor
+from .QualityController import QualityController, DecodeSettings
+from .KeyframeIndex import KeyframeIndex
+from .GopCache import GopCache
+from .FrameBuffer import FrameBuffer, FrameSlot
+from .FilterChain import FilterChain, FrameFilter
+from .Recorder import Recorder
+from .ProxyCache import ProxyCache
+from .Stats import PlaybackStats
+from .Metadata import Metadata, is_stream_source
 from .Vector2 import Vector2
 from .Font import Font
-import subprocess
+import concurrent.futures
 import traceback
 import threading
-import pyaudio
+import asyncio
 import pygame
-import json
 import time
 
 class Video:
-    def __init__(self, source: str, font: Font = None, block: bool = False, play_audio: bool = True, audio_output_index: int = None):
+    # the playback rates the audio is played at, it is muted outside of them and while playing backwards
+    AUDIO_RATES = (0.25, 4.0)
+
+    def __init__(self, source: str, font: Font = None, block: bool = False, play_audio: bool = True, audio_output_index: int = None, volume: float = 1.0, decoder_backend: str = "auto", managed: bool = False, transport: str = "pipe", metadata: Metadata = None, playing: bool = True, frame_buffer_slots: int = 8, adaptive_quality: bool = True, debug_overlay: bool = False, live: bool = None, jitter_buffer_ms: int = 200, filters: list[FrameFilter] = None, proxies: ProxyCache = None):
         # the source of all audio/video
         self.source = source
 
         # the font class for drawing text when self.draw is called
         self.font = font or Font("Ariel", 24)
 
+        # when managed a VideoGroup does the setup, presenting and decoding instead of the threads of this video
+        self.managed = managed
+        self.decode_job: concurrent.futures.Future = None
+
         # internal locks to prevent race conditions between threads
         self.frame_lock = threading.Lock()
         self.seeking_lock = threading.Lock()
 
-        # will only be used if only self.has_video
-        self.clock = pygame.time.Clock()
+        # audio master clock when there is audio, wall clock otherwise
+        self.presentation_clock = PresentationClock()
+
+        # counters for how well playback is keeping up with the presentation clock
+        self.frames_presented = 0
+        self.frames_dropped = 0
+        self.frames_duplicated = 0
+
+        # the rest of the performance counters, see get_stats
+        # with debug_overlay they are drawn over the top left of the video
+        self.stats = PlaybackStats()
+        self.debug_overlay = debug_overlay
+        self.overlay_surface: pygame.Surface = None
+        self.overlay_time = 0.0
+        self.drawn_overlay_key: int = None
 
         # frame will a pygame.Surface or None if there is no frame
         self.frame = None
 
+        # decoded frames waiting to be presented, this is created once the video size is known
+        # a video that is set up while not playing decodes ahead until the buffer is full, which is how a Playlist prefetches
+        self.frame_buffer: FrameBuffer = None
+        self.frame_buffer_slots = frame_buffer_slots
+
+        # the size and pixel format the decoder produces frames in
+        # draw negotiates these with the decoder so frames can be blitted without scaling or converting them
+        self.output_size: tuple[int, int] = None
+        self.pixel_format = "RGB"
+        self.requested_output: tuple[tuple[int, int], str, bool] = None
+        self.requested_output_time = 0
+        self.output_negotiation_delay = 0.3
+
+        # the size negotiated with the display before decode_quality scales it, None until the first draw
+        self.negotiated_size: tuple[int, int] = None
+
+        # the decode settings in use, and the settings that are applied once playback reaches a keyframe
+        # when adaptive_quality is True the quality controller steps them down under cpu pressure and back up again
+        self.decode_settings = DecodeSettings()
+        self.pending_settings: DecodeSettings = None
+        self.quality_controller = QualityController() if adaptive_quality else None
+
+        # changes every frame in place before it is published, off the thread that draws, see FilterChain.py
+        self.filter_chain: FilterChain = FilterChain(filters) if filters else None
+
+        # tees the presented frames and the audio on its way to the mixer to a file, see start_recording
+        self.recorder: Recorder = None
+
+        # the last scaled frame, reused while neither the frame nor the target size change
+        self.frame_id = -1
+        self.scaled_frame: pygame.Surface = None
+        self.scaled_frame_key: tuple[int, tuple[int, int]] = None
+        self.reader_thread: threading.Thread = None
+
+        # the timestamp of the newest decoded frame, decode_ended is set once the decoder has no frames left until the next seek
+        self.decoded_pts = -1.0
+        self.decode_ended = False
+
+        # until when the frame on screen should be shown, used to count repeated frames
+        self.shown_until = 0.0
+
+        # the timestamp of the frame on screen, step_frames starts from it
+        self.frame_pts = 0.0
+
         # this will be used when self.draw is called
         self.info_surface: pygame.Surface = None
-
-        # ffmpeg processes to get video/audio from source
-        self.video_process: subprocess.Popen = None
-        self.audio_process: subprocess.Popen = None
+        self.info_surface_key: tuple = None
+        self.timestamp_cache: dict[str, tuple[tuple[str, int], pygame.Surface]] = {}
+
+        # what was drawn by the last call to self.draw, used to skip drawing when nothing has changed
+        self.drawn_frame_key: tuple = None
+        self.drawn_info_key: tuple = None
+
+        # a long lived decoder that demuxes source once for both the video and the audio, see Decoder.py
+        # with the "shared_memory" transport it runs in its own process and decodes into shared frame slots
+        self.decoder_backend = decoder_backend
+        self.transport = transport
+        self.decoder = None
+        self.decoder_source: str = None
+        self.reader_generation = 0
+
+        # with proxies a low resolution copy of the source is made in the background, and decoded instead of
+        # the source while it is drawn no bigger than the proxy, see prepare_proxy and negotiate_output
+        self.proxies = proxies
+        self.proxy_path: str = None
+        self.proxy_size: tuple[int, int] = None
+        self.use_proxy = False
+        self.proxy_switches = 0
 
         # set parameters for audio
         self.play_audio = play_audio
         self.audio_output_index = audio_output_index
 
-        # the output stream for source audio
-        # this will only be set if source has audio and self.play_audio is True
-        self.speakers: pyaudio.Stream = None
+        # the shared mixer of the output device and this video's input to it, see AudioMixer.py
+        # these will only be set if source has audio and self.play_audio is True
+        self.audio_mixer: AudioMixer = None
+        self.audio_channel: AudioChannel = None
+        self._volume = volume
+
+        # used to work out which part of the audio is being heard
+        self.audio_start = 0
+        self.audio_synced_count = 0
+
+        # how fast the video plays, a negative rate plays it backwards, see playback_rate
+        self._playback_rate = 1.0
+
+        # the decoded GOPs that playing backwards and stepping back are served from, made when they are first needed
+        self.gop_cache: GopCache = None
+
+        # set by step_frames, the reader is only started again once playing continues
+        self.stepped = False
+
+        # a live source is played as it is received, jitter_buffer seconds behind the newest frame, see follow_live_edge
+        # None plays stdin and network urls live, pass False to play the url of a file like a file
+        self.live = live
+        self.jitter_buffer = jitter_buffer_ms / 1000
+
+        # how far playback can fall behind the newest frame before it skips ahead to catch up
+        self.max_live_lag = self.jitter_buffer + max(self.jitter_buffer, 0.25)
+        self.live_restarted = 0.0
+        self.live_catch_ups = 0
 
-        # internal state
-        self.playing = True
+        # internal state, playing is changed through play and pause so the player thread hears about it
+        self._playing = playing
+        self.closed = False
+
+        # set to wake the player thread up early, for example when playing starts
+        # while paused or at the end the player thread sleeps on it until something changes
+        self.wakeup = threading.Event()
+        self.player_thread: threading.Thread = None
+
+        # the timestamp of the first frame decoded after the last seek, None until it has been decoded, see seek
+        self.seek_landed: float = None
+        self.seek_done = threading.Event()
+
+        # seek_lock keeps seeks in the order they were made, pending_seek is the newest target of a seek without block
+        self.seek_lock = threading.Lock()
+        self.pending_seek: float = None
         self.pressed = ""
         self.progress = 0
 
-        # metadata of the source
+        # where the seek bar is being dragged to, only used while self.pressed is "progress_bar"
+        self.scrub_progress = 0
+
+        # used for previewing and snapping seeks, these are built in the background after the metadata is known
+        self.keyframe_index: KeyframeIndex = None
+        self.thumbnails: ThumbnailStrip = None
+
+        # set once keyframe_index is there, the GOP cache waits for it instead of scanning the source itself
+        self.index_ready = threading.Event()
+
+        # set once setup_thread has finished, setup_error is the exception it raised if it failed
+        self.ready_event = threading.Event()
+        self.ready_lock = threading.Lock()
+        self.ready_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.setup_error: Exception = None
+
+        # metadata of the source, probed by extract_metadata unless it was already given
+        self.metadata = metadata
         self.has_audio = False
         self.has_video = False
         self.duration = -1
@@ -59,148 +209,1009 @@ class Video:
         if block:
             self.setup_thread()
 
-        else:
+        elif not managed:
             threading.Thread(target = self.setup_thread, daemon = True).start()
 
-    def start_ffmpeg_at_offset(self, start_offset: float = 0):
-        if self.seeking_lock.locked(): return
+    @classmethod
+    def open(cls, source: str, **kwargs):
+        """
+        Creates a video without waiting for it to be set up, await video.ready() before using it.
+
+        Pass metadata from Metadata.probe_many to skip probing when opening many sources.
+        """
+
+        kwargs["block"] = False
+        return cls(source, **kwargs)
+
+    async def ready(self):
+        """
+        Waits until the video has been set up without blocking the event loop, raises the exception setup failed with.
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        with self.ready_lock:
+            if self.ready_event.is_set():
+                future.set_result(None)
+            else:
+                self.ready_waiters.append((loop, future))
+
+        await future
+
+        if self.setup_error is not None:
+            raise self.setup_error
+        return self
+
+    def set_ready(self):
+        with self.ready_lock:
+            self.ready_event.set()
+            waiters, self.ready_waiters = self.ready_waiters, []
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(lambda future = future: future.done() or future.set_result(None))
+
+    def start_ffmpeg_at_offset(self, start_offset: float = 0, wait: bool = False) -> bool:
+        # returns whether it restarted, without wait it does nothing while another restart is running
+        if not wait and self.seeking_lock.locked():
+            return False
+
         with self.seeking_lock, self.frame_lock:
-            self.progress = start_offset
+            self.progress = max(0, start_offset)
+            if not self.decoder or self.closed:
+                return False
+
+            if self.has_video:
+                self.stats.record_seek()
+
+            # without video a seek lands exactly where it was asked to
+            self.seek_landed = None if self.has_video else start_offset
             if self.has_video:
-                if self.video_process:
-                    self.video_process.terminate()
-                    self.video_process = None
+                self.seek_done.clear()
+            else:
+                self.seek_done.set()
 
-                self.video_process = subprocess.Popen(
-                    ["ffmpeg", "-v", "error", "-hwaccel", "auto", "-seek_timestamp", "1", "-threads", "8", "-ss", str(start_offset), "-i", self.source, "-filter:v", "setpts=PTS-STARTPTS", "-r", str(self.framerate), "-s", f"{int(self.video_size.x)}x{int(self.video_size.y)}", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"],
-                    stdout = subprocess.PIPE,
-                    shell = False
-                )
+            if self.has_video:
+                self.stop_reader_thread()
 
-                self.frame = pygame.image.frombuffer(
-                    self.video_process.stdout.read(int(self.video_size.x * self.video_size.y * 3)),
-                    (int(self.video_size.x), int(self.video_size.y)), "RGB"
-                )
+                # the frames after a seek have nothing to do with the ones before it
+                if self.filter_chain:
+                    self.filter_chain.reset()
 
-            if self.has_audio and self.play_audio:
-                if self.audio_process:
-                    self.audio_process.terminate()
-                    self.audio_process = None
+                # the output was renegotiated so the slots have to be reallocated
+                if self.frame_buffer.size != self.output_size or self.frame_buffer.pixel_format != self.pixel_format:
+                    self.frame_buffer = FrameBuffer(self.output_size, self.frame_buffer_slots, self.pixel_format, self.transport == "shared_memory")
+                    if self.transport == "shared_memory":
+                        self.decoder.attach(self.frame_buffer)
+
+                # draw switched between the proxy and the source, the frame on screen stays until the new decoder catches up
+                source = self.proxy_path if self.use_proxy and self.proxy_path else self.source
+                if source != self.decoder_source:
+                    self.switch_decoder(source)
+
+                self.decoder.size = self.output_size
+                self.decoder.pixel_format = self.pixel_format
+                self.decoder.threads = self.decode_settings.threads
+
+                # playing backwards starts from the frame at the offset, as if the frame after it was just decoded
+                if self._playback_rate < 0:
+                    self.decoded_pts = start_offset + 1 / self.framerate
 
-                if self.speakers:
-                    self.speakers.close()
-                    self.speakers = None
+                if self.quality_controller:
+                    self.quality_controller.restart()
 
-                self.speakers = pyaudio.PyAudio().open(self.samplerate, self.channels, pyaudio.paInt16, output = True)
-                self.audio_process = subprocess.Popen(
-                    ["ffmpeg", "-v", "error", "-hwaccel", "auto", "-seek_timestamp", "1", "-threads", "8", "-ss", str(start_offset), "-i", self.source, "-itsoffset", str(round(self.speakers.get_output_latency(), 2)), "-i", self.source, "-r", str(self.framerate), "-filter:a", "asetpts=PTS-STARTPTS", "-f", "s16le", "-ar", str(self.samplerate), "-ac", str(self.channels), "pipe:1"],
-                    stdout = subprocess.PIPE, shell = False
-                )
+            # the audio is stretched by the decoder so it keeps its pitch at other rates
+            self.decoder.tempo = self._playback_rate if self.audio_audible() else 1.0
 
-                if self.has_audio:
-                    self.audio_process.stdout.read(self.calculate_pcm_bytes_to_read(
-                        0.1 if not self.has_video else (1 / self.framerate), self.channels, self.samplerate
-                    ))
+            # audio that is not heard is not decoded, nobody would read it and the decoder would wait for it to be
+            self.decoder.mute = not self.audio_audible()
+
+            # the recording carries on after the seek without a jump
+            if self.recorder is not None:
+                self.recorder.split(start_offset)
+
+            # the decoder stays open and seeks in place, only the subprocess fallback respawns ffmpeg
+            if self.audio_channel is not None:
+                # the mixer reads audio while holding feed_lock so nothing from before the seek is queued after it
+                with self.audio_channel.feed_lock:
+                    self.decoder.seek(start_offset)
+                    self.audio_channel.clear()
+                    self.audio_start = start_offset
+
+            else:
+                self.decoder.seek(start_offset)
+
+            # a managed video is decoded by the worker pool of its VideoGroup instead
+            if self.has_video and not self.managed:
+                self.reader_thread = threading.Thread(target = self._internal_reader_thread, args = (self.reader_generation,), daemon = True)
+                self.reader_thread.start()
+
+            if self.has_audio and self.play_audio:
+                self.audio_start = start_offset
+                self.audio_synced_count = 0
+
+            self.presentation_clock.reset(start_offset)
+            self.presentation_clock.set_rate(self._playback_rate)
+            self.stepped = False
+
+            # the clock must not run from the seek until the player notices the video is paused
+            if not self.playing:
+                self.presentation_clock.pause()
+
+        # the player thread could be asleep at the end of the video
+        self.wakeup.set()
+        return True
+
+    def stop_reader_thread(self):
+        # any reader that is still running belongs to an older generation and will exit
+        self.reader_generation += 1
+
+        if self.decoder:
+            self.decoder.interrupt()
+
+        # wake the reader up if it is waiting on a full buffer
+        if self.frame_buffer:
+            self.frame_buffer.interrupt()
+
+        if self.reader_thread:
+            self.reader_thread.join()
+            self.reader_thread = None
+
+        if self.decode_job:
+            concurrent.futures.wait([self.decode_job])
+            self.decode_job = None
+
+        self.decoded_pts = -1.0
+        self.decode_ended = False
+
+        if self.frame_buffer:
+            self.frame_buffer.clear()
+
+    def _internal_reader_thread(self, generation: int):
+        # decodes ahead of the presenter by filling self.frame_buffer straight from the decoder
+        while self.decode_next_frame(generation):
+            pass
+
+    def decode_next_frame(self, generation: int, block: bool = True, min_interval: float = 0) -> bool:
+        """
+        Decodes the next frame into self.frame_buffer.
+
+        Returns False when the stream has ended, a seek has replaced generation or, if block is False, the buffer is full.
+        Frames less than min_interval after the previously decoded frame are skipped, which is how a
+        VideoGroup lowers the frame rate of small tiles.
+        """
+
+        frame_buffer = self.frame_buffer
+        if generation != self.reader_generation:
+            return False
+
+        slot = frame_buffer.writable_slot(None if block else 0)
+        if slot is None:
+            return False
+
+        # a lower decode quality only presents every frame_divisor-th frame
+        if self.decode_settings.frame_divisor > 1:
+            min_interval = max(min_interval, self.decode_settings.frame_divisor / self.framerate)
+
+        # faster than normal only as many frames as at normal speed are presented, the rest would be dropped
+        if abs(self._playback_rate) > 1:
+            min_interval = max(min_interval, abs(self._playback_rate) / self.framerate)
+
+        if self._playback_rate < 0:
+            return self.decode_previous_frame(generation, slot, min_interval)
+
+        skip_before = self.decoded_pts + min_interval - 0.5 / self.framerate if min_interval else None
+        started = time.perf_counter()
+        pts = self.decoder.read_into(slot.view, skip_before)
+        if generation != self.reader_generation:
+            return False # a seek has replaced this reader
+
+        if pts is None:
+            # a seek to the very end has no frame to land on
+            self.decode_ended = True
+            self.seek_done.set()
+            return False
+
+        elapsed = time.perf_counter() - started
+        self.stats.record_decode(elapsed, 1 / self.framerate)
+        if self.quality_controller:
+            self.quality_controller.record_decode(elapsed)
+
+        self.filter_frame(slot, pts, frame_buffer.pixel_format)
+        frame_buffer.publish(slot, pts)
+        self.decoded_pts = pts
+        self.land(pts)
+        return True
+
+    def decode_previous_frame(self, generation: int, slot, min_interval: float) -> bool:
+        # playing backwards the frames come out of the GOP cache, every GOP is decoded once while the one after it is shown
+        started = time.perf_counter()
+        gop_cache = self.get_gop_cache()
+        if gop_cache is None:
+            # asks again shortly, a seek still replaces this reader in the meantime
+            self.index_ready.wait(0.05)
+            return generation == self.reader_generation
+
+        found = gop_cache.frame_before(self.decoded_pts - max(min_interval, 1 / self.framerate) + 0.5 / self.framerate)
+        if generation != self.reader_generation:
+            return False # a seek has replaced this reader
+
+        if found is None:
+            self.decode_ended = True # the start of the stream
+            return False
+
+        pts, data = found
+        slot.view[:] = data
+        self.stats.record_decode(time.perf_counter() - started, 1 / self.framerate)
+
+        self.filter_frame(slot, pts, self.frame_buffer.pixel_format)
+        self.frame_buffer.publish(slot, pts)
+        self.decoded_pts = pts
+        self.land(pts)
+        return True
+
+    def land(self, pts: float):
+        # the first frame decoded after a seek is the one it landed on
+        if self.seek_landed is None:
+            self.seek_landed = pts
+            self.seek_done.set()
+
+            # a paused player is asleep, it is woken up to show the frame, see show_landed_frame
+            self.wakeup.set()
+
+    def seek(self, t: float, mode: str = "exact", block: bool = False, timeout: float = None) -> float:
+        """
+        Seeks to t seconds and returns the timestamp of the frame it landed on when block is True.
+
+        "fast" snaps t to the nearest keyframe, so nothing has to be decoded and thrown away to get there
+        (until the keyframe index has been built in the background t is used as it is). "exact" decodes from
+        the keyframe before t and discards the frames up to the one at t, so it takes longer the longer the
+        GOPs of the source are. While paused the frame it landed on is shown straight away.
+
+        Without block the seek happens in the background and seek_landed is set once the frame has been decoded.
+        With block this waits for it for at most timeout seconds, and returns None when it did not land in time
+        or could not seek (the video is closed or has nothing to decode).
+
+        The ffmpeg fallback decoder (without PyAV) does not hand out the timestamps of the stream, it counts
+        frames at the frame rate from where it was seeked to, so there the returned timestamp is where the
+        frame is expected to be rather than one read from the source.
+        """
+
+        if mode not in ("fast", "exact"):
+            raise ValueError(f"mode has to be \"fast\" or \"exact\", not {mode!r}")
+
+        if self.live:
+            raise ValueError("a live source can not be seeked")
+
+        t = max(0, min(t, self.duration))
+        if mode == "fast" and self.keyframe_index and len(self.keyframe_index):
+            t = self.keyframe_index.nearest(t)
+
+        if not block:
+            # seeks that come in faster than they can be done (dragging the seek bar) only go to the newest target
+            self.pending_seek = t
+            threading.Thread(target = self.run_pending_seek, daemon = True).start()
+            return None
+
+        with self.seek_lock:
+            self.pending_seek = None
+
+            # waits for a restart that is already running instead of being skipped by it
+            if not self.start_ffmpeg_at_offset(t, wait = True):
+                return None
+
+        return self.seek_landed if self.seek_done.wait(timeout) else None
+
+    def run_pending_seek(self):
+        with self.seek_lock:
+            t, self.pending_seek = self.pending_seek, None
+            if t is not None:
+                self.start_ffmpeg_at_offset(t, wait = True)
+
+    def show_landed_frame(self):
+        # a paused player takes no frames, except the one a seek landed on so seeking while paused shows where it went
+        landed = self.seek_landed
+        if landed is None or landed == self.frame_pts or not self.frame_buffer:
+            return
+
+        slot = self.frame_buffer.peek()
+        if slot is None or slot.pts != landed:
+            return
+
+        self.frame_buffer.pop()
+        self.frame = slot.surface
+        self.frame_id += 1
+        self.frame_pts = slot.pts
+        self.progress = slot.pts
+        self.stats.record_present(0.0)
+
+        self.presentation_clock.reset(slot.pts)
+        self.presentation_clock.pause()
+
+    def filter_frame(self, slot: FrameSlot, pts: float, pixel_format: str):
+        # runs on the reader (or a VideoGroup worker) so the filters never hold up drawing
+        if self.filter_chain is not None:
+            self.filter_chain.process(slot.pixels, pts, pixel_format)
+
+    def add_filter(self, frame_filter: FrameFilter):
+        """
+        Adds a filter to the end of the filter chain, it applies to the frames decoded from now on.
+        """
+
+        if self.filter_chain is None:
+            self.filter_chain = FilterChain()
+        self.filter_chain.add(frame_filter)
+
+    def remove_filter(self, frame_filter: FrameFilter):
+        if self.filter_chain is not None:
+            self.filter_chain.remove(frame_filter)
+
+    def read_audio(self, size: int):
+        # the source of the audio channel, the pcm is handed to the recorder on its way to the mixer
+        data = self.decoder.read(size)
+
+        # the stretched audio of other rates does not line up with the media time of the frames
+        recorder = self.recorder
+        if data and recorder is not None and self._playback_rate == 1.0:
+            recorder.add_audio(data, self.audio_start + self.audio_channel.write_count / (self.samplerate * self.channels))
+
+        return data
+
+    def start_recording(self, path: str, codec: str = "libx264", size: tuple[int, int] = None, queue_frames: int = 30, backend: str = "auto") -> Recorder:
+        """
+        Records what the video is showing to path, from the frames and audio that are decoded for playback anyway.
+
+        The frames are taken after the filters, as they are presented, and encoded with codec at size (the size
+        of the frame buffer by default) on background threads. Playback never waits for the encoder, when it falls
+        behind by more than queue_frames frames the frames are dropped and counted in the recording stats. Audio is
+        only recorded while playing at the normal rate. Any recording that was running is stopped first.
+        """
+
+        if not self.has_video:
+            raise ValueError("only a video with a video stream can be recorded")
+
+        self.stop_recording()
+
+        has_audio = self.audio_channel is not None
+        self.recorder = Recorder(
+            path, self.frame_buffer.size, self.frame_buffer.pixel_format, self.framerate, self.presentation_clock.time(),
+            self.samplerate if has_audio else None, self.channels, codec, size, queue_frames, backend = backend
+        )
+        return self.recorder
+
+    def stop_recording(self) -> dict:
+        """
+        Stops recording and waits for the file to be finished, returns the stats of the recording.
+        """
+
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return {}
+
+        recorder.close()
+        return recorder.get_stats()
+
+    def get_gop_cache(self) -> GopCache:
+        # made again whenever the output was renegotiated, the frames are stored in the format of the frame buffer
+        # None until build_seek_preview has the keyframe index, scanning the whole source here would hold up the caller
+        if self.keyframe_index is None:
+            return None
+
+        size, pixel_format = self.frame_buffer.size, self.frame_buffer.pixel_format
+        gop_cache = self.gop_cache
+        if gop_cache is None or gop_cache.size != size or gop_cache.pixel_format != pixel_format:
+            if gop_cache is not None:
+                gop_cache.close()
+
+            gop_cache = self.gop_cache = GopCache(self.source, self.keyframe_index, size, pixel_format, self.framerate, backend = self.decoder_backend)
+
+        return gop_cache
 
     def setup_thread(self):
-        self.extract_metadata()
-        self.start_ffmpeg_at_offset(0)
+        try:
+            self.extract_metadata()
+
+            # a live source starts a jitter buffer behind the first frame
+            self.start_ffmpeg_at_offset(-self.jitter_buffer if self.live else 0)
+
+        except Exception as error:
+            self.setup_error = error
+            raise
+
+        finally:
+            self.set_ready()
+
+        # closed while it was being set up, close has released whatever was acquired
+        if self.closed:
+            return
 
         # _internal_player_thread cant be created until extract_metadata if executed
         # otherwise it will just return because has_video and has_audio are set to False by default
-        threading.Thread(target = self._internal_player_thread, daemon = True).start()      
+        if not self.managed:
+            self.player_thread = threading.Thread(target = self._internal_player_thread, daemon = True)
+            self.player_thread.start()
+
+        if self.has_video and not self.live:
+            threading.Thread(target = self.build_seek_preview, daemon = True).start()
+
+        # small sources are already cheap to decode
+        if self.proxies is not None and self.has_video and not self.live and self.video_size.y > self.proxies.height:
+            threading.Thread(target = self.prepare_proxy, daemon = True).start()
 
     def extract_metadata(self):
-        metadata: dict[str, str] = json.loads(subprocess.run(
-            ["ffprobe", "-v", "error", "-show_streams", "-print_format", "json", '-show_entries', 'format=duration', self.source],
-            capture_output = True, shell = False, text = True
-        ).stdout)
+        if self.live is None:
+            self.live = is_stream_source(self.source)
+
+        if self.live:
+            # a live source can only be read once so the metadata comes from the connection it is played from
+            # the receiver thread of the decoder already decodes off the player's threads so the transport is always a pipe
+            live_decoder = LiveDecoder(self.source, max(1.0, self.jitter_buffer * 4))
+            self.metadata = live_decoder.connect()
+            self.transport = "pipe"
+
+        # probing is skipped when the source has not changed since it was last probed, see Metadata.probe
+        elif self.metadata is None:
+            self.metadata = Metadata.probe(self.source)
+        metadata = self.metadata
 
         with self.seeking_lock, self.frame_lock:
-            self.duration: float = float(metadata["format"]["duration"])
-            for stream in metadata['streams']:
-                print(stream)
-                if stream['codec_type'] == 'video':
-                    self.video_size = Vector2(stream['width'], stream['height'])
-                    parts = [float(p) for p in stream["r_frame_rate"].split("/")]
-                    self.framerate = int(abs(parts[0] / parts[1]) + 1)
-                    self.has_video = True
-
-                if stream['codec_type'] == 'audio' and self.play_audio:
-                    self.samplerate = int(stream["sample_rate"])
-                    self.channels = stream["channels"]
-                    self.has_audio = True
-
-        if self.has_audio and self.play_audio:
-            self.speakers = pyaudio.PyAudio().open(self.samplerate, self.channels, pyaudio.paInt16, output = True, output_device_index = self.audio_output_index)
-
-    def calculate_pcm_bytes_to_read(self, t: float, channels: int, samplerate: int):
-        return int(samplerate * t) * channels * 2
+            # close ran while probing, nothing had been acquired yet so it had nothing to release
+            # from here on close waits for the lock and releases the mixer and the decoder that are acquired below
+            if self.closed:
+                if self.live:
+                    live_decoder.close()
+                return
 
-    def _internal_player_thread(self):
-        while True:
-            if not self.playing:
-                time.sleep(0.1)
-                continue
+            # a live source has no end until the stream ends, see follow_live_edge
+            self.duration: float = float("inf") if self.live else metadata.duration
+            if metadata.has_video:
+                self.video_size = Vector2(metadata.width, metadata.height)
+                self.output_size = (int(self.video_size.x), int(self.video_size.y))
+                self.frame_buffer = FrameBuffer(self.output_size, self.frame_buffer_slots, self.pixel_format, self.transport == "shared_memory")
+
+                # some live streams do not say what their frame rate is
+                # this is the real rate, the decoders stamp the frames of the ffmpeg fallback with it
+                self.framerate = abs(metadata.framerate) if metadata.framerate > 0 else 30
+                self.has_video = True
+
+            if metadata.has_audio and self.play_audio:
+                # the decoder resamples the audio to the format of the mixer so it can be mixed with other videos
+                self.audio_mixer = AudioMixer.get(self.audio_output_index)
+                self.samplerate = self.audio_mixer.samplerate
+                self.channels = self.audio_mixer.channels
+                self.has_audio = True
+
+            if self.live:
+                self.decoder = live_decoder
+                self.decoder_source = self.source
+                self.decoder.size = self.output_size if self.has_video else None
+                self.decoder.framerate = self.framerate
+                self.decoder.samplerate = self.samplerate if self.has_audio else None
+                self.decoder.channels = self.channels
+
+            elif self.has_video or self.has_audio:
+                self.decoder = self.create_decoder(self.source)
 
-            # if there is no audio or video to be played then end this loop
-            if not self.has_audio and not self.has_video:
+            if self.has_audio and self.play_audio:
+                # the mixer reads straight from the decoder on its own thread
+                self.audio_channel = self.audio_mixer.add(self.read_audio, self._volume, not self.playing)
+
+    def create_decoder(self, source: str):
+        decoder_arguments = (
+            source,
+            self.output_size if self.has_video else None, self.framerate,
+            self.samplerate if self.has_audio else None, self.channels,
+            self.decoder_backend
+        )
+
+        self.decoder_source = source
+        if self.transport == "shared_memory":
+            decoder = ProcessDecoder(*decoder_arguments)
+            if self.has_video:
+                decoder.attach(self.frame_buffer)
+            return decoder
+
+        return open_decoder(*decoder_arguments)
+
+    def switch_decoder(self, source: str):
+        # called by start_ffmpeg_at_offset, which seeks the new decoder to where the old one was
+        decoder = self.create_decoder(source)
+
+        # the mixer could be reading from the old decoder right now
+        if self.audio_channel is not None:
+            with self.audio_channel.feed_lock:
+                decoder, self.decoder = self.decoder, decoder
+        else:
+            decoder, self.decoder = self.decoder, decoder
+
+        decoder.close()
+        self.proxy_switches += 1
+
+    def prepare_proxy(self):
+        # the proxy is generated once per source and cache, draw switches to it once it is ready
+        try:
+            path = self.proxies.get(self.source) or self.proxies.request(self.source).result()
+            metadata = Metadata.probe(path)
+
+            # the audio comes out of the same decoder so a proxy without it can not be used
+            if self.closed or not metadata.has_video or (self.has_audio and not metadata.has_audio):
+                return
+
+            self.proxy_size = (metadata.width, metadata.height)
+            self.proxy_path = path
+
+        except Exception as error:
+            traceback.print_exception(error)
+
+    @property
+    def volume(self) -> float:
+        return self._volume
+
+    @volume.setter
+    def volume(self, volume: float):
+        self._volume = volume
+        if self.audio_channel is not None:
+            self.audio_channel.volume = volume
+
+    def sync_to_audio(self):
+        # keeps the presentation clock on the audio that is being heard
+        channel = self.audio_channel
+        if channel is None:
+            return
+
+        if (channel.ended and not len(channel)) or not self.audio_audible():
+            # the audio has ended, if there is video left it carries on with the wall clock
+            if self.presentation_clock.audio_master:
+                self.presentation_clock.release_audio()
+            return
+
+        # the clock is only synced when the mixer has taken more audio, syncing in between would hold it still
+        # until the mixer has taken any audio since the last seek the clock runs on its own
+        read_count, read_time = channel.read_count, channel.read_time
+        if read_count == self.audio_synced_count:
+            return
+        self.audio_synced_count = read_count
+
+        # the audio is stretched so every second of it that is heard is playback_rate seconds of the source
+        self.presentation_clock.sync_to_audio(max(
+            self.audio_start, self.audio_start + (channel.played_seconds() - self.audio_mixer.latency()) * self._playback_rate
+        ), read_time)
+
+    @property
+    def playing(self) -> bool:
+        return self._playing
+
+    @playing.setter
+    def playing(self, playing: bool):
+        if playing:
+            self.play()
+        else:
+            self.pause()
+
+    def play(self):
+        # starts playing straight away instead of when the player thread next checks
+        self._playing = True
+        if self.audio_channel is not None:
+            self.audio_channel.paused = not self.audio_audible()
+
+        # the reader was stopped to step through frames so it starts again from the frame on screen
+        if self.stepped:
+            threading.Thread(target = lambda: self.start_ffmpeg_at_offset(self.presentation_clock.time()), daemon = True).start()
+
+        self.wakeup.set()
+
+    def pause(self):
+        # the reader and the mixer fill up what they have room for and then wait, so a paused video uses no cpu
+        self._playing = False
+        if self.audio_channel is not None:
+            self.audio_channel.paused = True
+
+        self.wakeup.set()
+
+    def stop(self):
+        """
+        Pauses and goes back to the start, the decoders stay open so playing again starts straight away.
+        """
+
+        self.pause()
+        if not self.live:
+            threading.Thread(target = lambda: self.start_ffmpeg_at_offset(0), daemon = True).start()
+
+    def audio_audible(self) -> bool:
+        return self.AUDIO_RATES[0] <= self._playback_rate <= self.AUDIO_RATES[1]
+
+    @property
+    def playback_rate(self) -> float:
+        return self._playback_rate
+
+    @playback_rate.setter
+    def playback_rate(self, rate: float):
+        """
+        How fast the video plays, 0.5 is half speed and -1 plays it backwards at normal speed.
+
+        Frames are skipped or shown for longer to keep up with the rate and the audio is stretched
+        so it keeps its pitch. Playing backwards is served from a cache of decoded GOPs.
+        """
+
+        if rate == 0:
+            raise ValueError("a playback rate of 0 is a pause, set playing to False instead")
+
+        if self.live and rate != 1.0:
+            raise ValueError("a live source can only be played at its own pace")
+
+        if rate == self._playback_rate:
+            return
+
+        self._playback_rate = rate
+        position = max(0, min(self.presentation_clock.time(), self.duration))
+
+        # the audio in the ring and the frames in the buffer were made for the old rate
+        threading.Thread(target = lambda: self.start_ffmpeg_at_offset(position), daemon = True).start()
+
+    def step_frames(self, count: int = 1):
+        """
+        Pauses and shows the frame count frames after the one on screen, a negative count steps back.
+
+        The frames come from the GOP cache, so stepping back through a GOP only decodes it once. The frame
+        is shown in the background, until the keyframe index has been built it is an exact seek instead.
+        """
+
+        if not self.has_video or self.frame_buffer is None or self.live:
+            return
+
+        self.pause()
+
+        # the GOP of the frame may have to be decoded first, the caller (usually the event loop) does not wait for it
+        threading.Thread(target = self.show_stepped_frame, args = (count,), daemon = True).start()
+
+    def show_stepped_frame(self, count: int):
+        with self.seeking_lock, self.frame_lock:
+            if self.closed:
+                return
+
+            # steps that come in quicker than they are shown each go on from the frame of the one before
+            # the frame before the point half a frame after the target is the one at the target
+            t = max(0, min(self.frame_pts + count / self.framerate, self.duration))
+            gop_cache = self.get_gop_cache()
+            if gop_cache is not None:
+                self.stop_reader_thread()
+                found = gop_cache.frame_before(t + 0.5 / self.framerate)
+                if found is not None:
+                    self.show_step(*found)
                 return
 
-            # wait for the video process to be spawned
-            if self.has_video and not self.video_process:
-                self.clock.tick(self.framerate)
-                continue
+        # until build_seek_preview has the keyframe index there is no GOP cache to step through
+        self.seek(t)
+
+    def show_step(self, pts: float, data: bytearray):
+        # called while holding seeking_lock and frame_lock, with the reader stopped
+        slot = self.frame_buffer.writable_slot(0)
+        slot.view[:] = data
+        self.filter_frame(slot, pts, self.frame_buffer.pixel_format)
+        self.frame_buffer.publish(slot, pts)
+        self.frame_buffer.pop()
+
+        self.frame = slot.surface
+        self.frame_id += 1
+        self.frame_pts = pts
+        self.progress = pts
 
-            # wait for the audio process to be spawned
-            if self.has_audio and not self.audio_process:
-                time.sleep(0.1)
+        self.presentation_clock.reset(pts)
+        self.presentation_clock.pause()
+        self.stepped = True
 
-            # wait for the audio output to be opened
-            if self.has_audio and not self.speakers:
-                time.sleep(0.1)
+    def close(self):
+        """
+        Stops decoding and playing, closes the decoder and lets go of the audio device, the video can not be
+        played again after this. It returns once the player thread has exited, calling it again does nothing.
+        """
 
-            if self.progress >= self.duration:
-                time.sleep(0.1)
-                continue
+        if self.closed:
+            return
 
-            # if the source does not have audio then we will wait the framerate
-            if self.has_video and not self.has_audio:
-                self.clock.tick(self.framerate)
+        self.closed = True
+        self.wakeup.set()
+
+        with self.seeking_lock, self.frame_lock:
+            if self.has_video:
+                self.stop_reader_thread()
 
-            with self.frame_lock:
-                frame_data = b''
-                audio_data = b''
+            if self.audio_channel is not None:
+                self.audio_channel.close()
 
-                try:
-                    if self.has_video:
-                        frame_data = self.video_process.stdout.read(int(self.video_size.x * self.video_size.y * 3))
-                        if frame_data:
-                            self.frame = pygame.image.frombuffer(
-                                frame_data, (int(self.video_size.x), int(self.video_size.y)), "RGB"
-                            )
+            # the device is closed once no other video uses its mixer
+            if self.audio_mixer is not None:
+                self.audio_mixer.release()
 
-                    if self.has_audio and self.play_audio:
-                        audio_data = self.audio_process.stdout.read(self.calculate_pcm_bytes_to_read(
-                            0.1 if not self.has_video else (1 / self.framerate), self.channels, self.samplerate
-                        ))
+            if self.gop_cache:
+                self.gop_cache.close()
 
-                        if audio_data:
-                            self.speakers.write(audio_data)
+            if self.filter_chain:
+                self.filter_chain.close()
 
-                    if not frame_data and not audio_data:
-                        raise NoAudioOrVideoException
+            self.stop_recording()
 
-                    self.progress += 0.1 if not self.has_video else 1 / self.framerate
+            if self.decoder:
+                # the mixer could be reading from the decoder right now
+                if self.audio_channel is not None:
+                    with self.audio_channel.feed_lock:
+                        self.decoder.close()
+                else:
+                    self.decoder.close()
 
-                except NoAudioOrVideoException:
-                    if not self.progress >= self.duration:
-                        self.progress += 0.1 if not self.has_video else 1 / self.framerate
+        if self.player_thread and self.player_thread is not threading.current_thread():
+            self.player_thread.join()
 
-                    else: print("end of video")
+    def __enter__(self):
+        return self
 
-                except Exception as error:
-                    traceback.print_exception(error)
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def iter_frames(self, start: float = 0.0, end: float = None, step: float = None, size: tuple[int, int] = None, format: str = "array"):
+        """
+        Yields (timestamp, frame) as fast as the frames can be decoded, see FrameExtractor.iter_frames.
+
+        A decoder of its own is used so this does not disturb playback.
+        """
+
+        return FrameExtractor(self.source, size, self.metadata, self.decoder_backend).iter_frames(start, end, step, format)
+
+    def iter_frames_parallel(self, start: float = 0.0, end: float = None, step: float = None, size: tuple[int, int] = None, format: str = "array", workers: int = None):
+        # the same frames as iter_frames decoded by several processes, see FrameExtractor.iter_frames_parallel
+        return FrameExtractor(self.source, size, self.metadata, self.decoder_backend).iter_frames_parallel(start, end, step, format, workers)
+
+    def _internal_player_thread(self):
+        # presents decoded frames when the presentation clock reaches their timestamp
+        while not self.closed:
+            delay = self.present()
+
+            # if there is no audio or video to be played then end this loop
+            if delay is None:
+                return
+
+            self.wakeup.wait(None if delay == float("inf") else delay)
+            self.wakeup.clear()
+
+    def present(self):
+        """
+        Presents the frame that is due on the presentation clock and moves the progress along.
+
+        Returns how many seconds to wait before calling it again, float("inf") while paused or at the end
+        when nothing changes until play, pause or a seek wakes the player, or None if there is nothing to play.
+        This is called in a loop by the player thread, or by a VideoGroup scheduler when the video is managed.
+        """
+
+        if self.closed:
+            return None
+
+        if self.audio_channel is not None:
+            self.audio_channel.paused = not self.playing or not self.audio_audible()
+
+        if not self.playing:
+            self.presentation_clock.pause()
+            self.show_landed_frame()
+            return float("inf")
+
+        self.presentation_clock.resume()
+        self.sync_to_audio()
+
+        if not self.has_audio and not self.has_video:
+            return None
+
+        now = self.presentation_clock.time()
+        if self.live:
+            self.follow_live_edge(now)
+        self.progress = max(0, min(now, self.duration))
+
+        # playing backwards the frames come in the opposite order and the start is the end
+        rate = self._playback_rate
+        direction = 1 if rate > 0 else -1
+        if self.progress >= self.duration if rate > 0 else self.progress <= 0:
+            # everything has been heard, so the mixer can stop the sound card until there is a seek
+            if self.audio_channel is not None:
+                self.audio_channel.paused = True
+            return float("inf")
+
+        # without video the clock is only needed to move the progress along
+        if not self.has_video or not self.frame_buffer:
+            return 0.1
+
+        frame_duration = 1 / self.framerate
+        self.update_decode_quality(now)
+
+        # faster than normal the reader skips frames, so the frames it decodes are further apart
+        frame_interval = frame_duration * max(1.0, abs(rate)) * direction
+
+        if self.stats.due(time.monotonic()):
+            self.stats.report(self.get_stats())
+
+        try:
+            # the frames are decoded ahead so this never waits on the decoder
+            slot = self.frame_buffer.peek()
+
+            # half a frame of tolerance so frames are not shown late because of sleep granularity
+            if slot is not None and (slot.pts - now) * direction <= frame_duration / 2:
+                slot = self.frame_buffer.pop()
+
+                # every other frame that is already due is too late to be shown
+                upcoming = self.frame_buffer.peek()
+                while upcoming is not None and (upcoming.pts - now) * direction <= 0:
+                    slot = self.frame_buffer.pop()
+                    upcoming = self.frame_buffer.peek()
+                    self.frames_dropped += 1
+
+                self.frame = slot.surface
+                self.frame_id += 1
+                self.frame_pts = slot.pts
+                self.frames_presented += 1
+                self.stats.record_present((now - slot.pts) * direction)
+                self.shown_until = slot.pts + frame_interval
+
+                # copied before the slot can be handed back to the reader, this never waits on the encoder
+                if self.recorder is not None:
+                    self.recorder.add_frame(slot.view, slot.pts, self.frame_buffer.size, self.frame_buffer.pixel_format)
+
+            # the next frame is not decoded yet so the one on screen is shown for another frame
+            elif self.frame is not None and (now - self.shown_until) * direction >= abs(frame_interval):
+                self.frames_duplicated += 1
+                self.shown_until += frame_interval
+
+            # wait until the next frame is due, but never longer than a frame, the clock runs rate times as fast
+            slot = self.frame_buffer.peek()
+            if slot is not None:
+                return max(0, min((slot.pts - now) * direction - frame_duration / 2, frame_duration)) / abs(rate)
+            return frame_duration / 2 / abs(rate)
+
+        except Exception as error:
+            traceback.print_exception(error)
+            return frame_duration
+
+    def follow_live_edge(self, now: float):
+        """
+        Keeps a live source playing jitter_buffer seconds behind the newest frame that was received.
+
+        When playback falls more than max_live_lag behind, after a stall or a pause, or runs past the newest
+        frame without audio to hold the clock back, it starts again jitter_buffer behind the newest frame.
+        """
+
+        decoder = self.decoder
+        if decoder.ended:
+            # the stream is over, once everything that was received has been shown it ends like a file does
+            if self.duration == float("inf") and not decoder.buffered() and not (self.frame_buffer and len(self.frame_buffer)):
+                self.duration = max(0, now)
+            return
+
+        edge = decoder.edge
+        if edge is None or self.seeking_lock.locked() or time.monotonic() - self.live_restarted < self.jitter_buffer:
+            return
+
+        lag = edge - now
+        if 0 <= lag <= self.max_live_lag:
+            return
+
+        self.live_restarted = time.monotonic()
+        self.live_catch_ups += 1
+        threading.Thread(target = lambda: self.start_ffmpeg_at_offset(edge - self.jitter_buffer), daemon = True).start()
+
+    def live_latency(self) -> float:
+        # how far playback is behind the newest frame that was received, 0 for a file or once the stream has ended
+        decoder = self.decoder
+        if not self.live or decoder is None or decoder.ended or decoder.edge is None:
+            return 0.0
+        return decoder.edge - self.presentation_clock.time()
+
+    @property
+    def decode_quality(self) -> DecodeSettings:
+        return self.decode_settings
+
+    @decode_quality.setter
+    def decode_quality(self, settings: DecodeSettings):
+        # fixed settings turn the quality controller off, they are applied at the next keyframe
+        self.quality_controller = None
+        self.pending_settings = settings
+
+    def scaled_output_size(self) -> tuple[int, int]:
+        width, height = self.negotiated_size or (int(self.video_size.x), int(self.video_size.y))
+        scale = self.decode_settings.scale
+        return (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    def update_decode_quality(self, now: float):
+        controller = self.quality_controller
+        if controller and controller.update(len(self.frame_buffer) / (len(self.frame_buffer.slots) - 1), self.frames_dropped, 1 / self.framerate):
+            self.pending_settings = controller.settings
+
+        settings = self.pending_settings
+        if settings is None or self.seeking_lock.locked():
+            return
+
+        restart = settings.needs_restart(self.decode_settings)
+
+        # the decoder is restarted just after a keyframe so it does not have to decode its way forward from the one before
+        if restart and self.keyframe_index and len(self.keyframe_index):
+            if now - self.keyframe_index.previous(now) > 1 / self.framerate:
+                return
+
+        self.pending_settings = None
+        self.decode_settings = settings
+
+        if restart:
+            self.output_size = self.scaled_output_size()
+            threading.Thread(target = lambda: self.start_ffmpeg_at_offset(self.presentation_clock.time()), daemon = True).start()
+
+    def get_stats(self) -> dict:
+        """
+        A snapshot of the performance counters, the latencies are in seconds.
+
+        decode_fps and present_fps are measured over the last second. pipe_stalls counts the reads from the decoder
+        that took longer than a frame and av_offset is how far the frame on screen is behind the presentation clock,
+        which follows the audio while there is any. filter_time has the time per frame of every filter by its name
+        and recording the counters of the recording, see start_recording. proxy is True while the proxy is being decoded
+        and seek_landed is the timestamp of the frame the last seek landed on.
+        """
+
+        stats = self.stats
+        channel = self.audio_channel
+        frame_buffer = self.frame_buffer
+
+        return {
+            "source": self.source,
+            "progress": self.progress,
+            "decode_fps": stats.decode_rate.rate(),
+            "present_fps": stats.present_rate.rate(),
+            "frames_decoded": stats.frames_decoded,
+            "frames_presented": self.frames_presented,
+            "frames_dropped": self.frames_dropped,
+            "frames_duplicated": self.frames_duplicated,
+            "read_latency": stats.read_latency.to_dict(),
+            "pipe_stalls": stats.pipe_stalls,
+            "seek_latency": stats.seek_latency.to_dict(),
+            "seek_landed": self.seek_landed,
+            "audio_underruns": channel.underruns if channel is not None else 0,
+            "av_offset": stats.av_offset,
+            "av_offset_average": stats.av_offset_average,
+            "buffered_frames": len(frame_buffer) if frame_buffer else 0,
+            "buffer_capacity": len(frame_buffer.slots) - 1 if frame_buffer else 0,
+            "decode_scale": self.decode_settings.scale,
+            "decode_frame_divisor": self.decode_settings.frame_divisor,
+            "decode_threads": self.decode_settings.threads,
+            "playback_rate": self._playback_rate,
+            "live_latency": self.live_latency(),
+            "live_catch_ups": self.live_catch_ups,
+            "reconnects": self.decoder.reconnects if self.live and self.decoder else 0,
+            "filter_time": self.filter_chain.get_stats() if self.filter_chain else {},
+            "recording": self.recorder.get_stats() if self.recorder else {},
+            "proxy": self.decoder_source == self.proxy_path if self.proxy_path else False,
+            "proxy_switches": self.proxy_switches,
+        }
+
+    def update_debug_overlay(self) -> float:
+        # the text is rendered again twice a second, returns the key of what the overlay shows
+        now = time.monotonic()
+        if self.overlay_surface and now - self.overlay_time < 0.5:
+            return self.overlay_time
+
+        stats = self.get_stats()
+        read_latency, seek_latency = stats["read_latency"], stats["seek_latency"]
+        text = "\n".join([
+            f"decode {stats['decode_fps']:.1f} fps  present {stats['present_fps']:.1f} fps",
+            f"dropped {stats['frames_dropped']}  duplicated {stats['frames_duplicated']}  stalls {stats['pipe_stalls']}",
+            f"read p50 {read_latency['p50'] * 1000:.0f} ms  p95 {read_latency['p95'] * 1000:.0f} ms  max {read_latency['max'] * 1000:.0f} ms",
+            f"seek p50 {seek_latency['p50'] * 1000:.0f} ms  max {seek_latency['max'] * 1000:.0f} ms",
+            f"a/v {stats['av_offset_average'] * 1000:+.0f} ms  underruns {stats['audio_underruns']}",
+            f"buffer {stats['buffered_frames']}/{stats['buffer_capacity']}  scale {stats['decode_scale']}  1/{stats['decode_frame_divisor']} frames" + ("  proxy" if stats["proxy"] else ""),
+        ] + ([
+            f"live latency {stats['live_latency'] * 1000:.0f} ms  catch ups {stats['live_catch_ups']}  reconnects {stats['reconnects']}",
+        ] if self.live else []) + ([
+            "filters " + "  ".join(f"{name} {timing['mean'] * 1000:.1f} ms" for name, timing in stats["filter_time"].items()),
+        ] if stats["filter_time"] else []) + ([
+            f"recording {stats['recording']['frames_recorded']} frames  dropped {stats['recording']['frames_dropped']}  queued {stats['recording']['queued_frames']}",
+        ] if stats["recording"] else []))
+
+        # the text is different every time, caching it would fill the shared font's cache with surfaces that are never used again
+        self.overlay_surface, _ = self.font.render_max_width(text, cache = False)
+        self.overlay_time = now
+        return now
 
     def fit_resolution(self, from_res, to_res):
         width1, height1 = from_res
@@ -239,10 +1250,75 @@ class Video:
         return seekbar_rect
 
     def get_frame(self, size: tuple[int, int]):
+        frame_id = self.frame_id
         frame = self.frame
-        if frame:
-            return pygame.transform.smoothscale(frame, self.fit_resolution(frame.get_size(), size))
-        return False
+        if not frame:
+            return False
+
+        frame_size = frame.get_size()
+        fitted = self.fit_resolution(frame_size, size)
+
+        # the decoder already scaled the frame, a pixel of difference is only rounding
+        if abs(fitted[0] - frame_size[0]) <= 1 and abs(fitted[1] - frame_size[1]) <= 1:
+            return frame
+
+        key = (frame_id, fitted)
+        if key != self.scaled_frame_key:
+            # smoothscale writes in the format of the source so the surface is made again when the decoder changed it
+            scaled_frame = self.scaled_frame
+            if not scaled_frame or scaled_frame.get_size() != fitted or scaled_frame.get_bitsize() != frame.get_bitsize():
+                self.scaled_frame = pygame.Surface(fitted, 0, frame)
+
+            pygame.transform.smoothscale(frame, fitted, self.scaled_frame)
+            self.scaled_frame_key = key
+
+        return self.scaled_frame
+
+    def negotiate_output(self, display: pygame.Surface, size: tuple[int, int]):
+        """
+        Asks the decoder to produce frames that fit size in the pixel format of display.
+
+        The request has to stay the same for output_negotiation_delay seconds before the decoder
+        is restarted at the current position, so resizing a window does not restart it on every frame.
+        """
+
+        if not self.has_video or not self.frame_buffer:
+            return
+
+        # the decoder never upscales, pygame does that from the native frame
+        native_size = (int(self.video_size.x), int(self.video_size.y))
+        target = self.fit_resolution(native_size, size)
+        if target[0] >= native_size[0] or target[1] >= native_size[1]:
+            target = native_size
+        self.negotiated_size = (max(1, target[0]), max(1, target[1]))
+
+        # the proxy is decoded whenever it has at least as many pixels as will be shown
+        proxy_size = self.proxy_size
+        use_proxy = proxy_size is not None and self.negotiated_size[0] <= proxy_size[0] and self.negotiated_size[1] <= proxy_size[1]
+        target = self.scaled_output_size()
+
+        # BGRA is the memory layout of the usual 32 bit XRGB display so blitting it is a straight copy
+        pixel_format = "RGB"
+        if display.get_bitsize() == 32 and display.get_masks()[:3] == (0xff0000, 0xff00, 0xff):
+            pixel_format = "BGRA"
+
+        request = (target, pixel_format, use_proxy)
+        if request == (self.frame_buffer.size, self.frame_buffer.pixel_format, self.use_proxy):
+            self.requested_output = None
+            return
+
+        now = time.monotonic()
+        if request != self.requested_output:
+            self.requested_output = request
+            self.requested_output_time = now
+            return
+
+        if now - self.requested_output_time < self.output_negotiation_delay or self.seeking_lock.locked():
+            return
+
+        self.requested_output = None
+        self.output_size, self.pixel_format, self.use_proxy = request
+        threading.Thread(target = lambda: self.start_ffmpeg_at_offset(self.presentation_clock.time()), daemon = True).start()
 
     def generate_timestamp(self, duration: float):
         hours = int(duration / (60 * 60))
@@ -259,79 +1335,186 @@ class Video:
 
         return timestamp
 
+    def calculate_seekbar_progress(self, area: pygame.Rect, mouse_pos: Vector2, height: int = 28) -> float:
+        seekbar_rect = self.calculate_seekbar_rect(area, height)
+        pos = (mouse_pos.x - seekbar_rect.left)
+        pos = max(0, min(seekbar_rect.width, pos))
+        return self.duration * (pos / seekbar_rect.width)
+
     def mouse_down(self, area: pygame.Rect, mouse_pos: Vector2):
+        # a live source can not be seeked
+        if self.live:
+            self.pressed = ""
+            return
+
         height = 28
         seekbar_rect = self.calculate_seekbar_rect(area, height)
 
         if mouse_pos.x > seekbar_rect.left and mouse_pos.x < seekbar_rect.right and mouse_pos.y > seekbar_rect.top and mouse_pos.y < seekbar_rect.bottom:
             self.pressed = "progress_bar"
 
-            pos = (mouse_pos.x - seekbar_rect.left)
-            pos = max(0, min(seekbar_rect.width, pos))
-            progress = self.duration * (pos / seekbar_rect.width)
-            print(progress)
-            if not self.seeking_lock.locked():
-                threading.Thread(target = lambda: self.start_ffmpeg_at_offset(int(progress))).start()
+            # nothing is decoded while dragging, draw shows a cached thumbnail until the mouse is released
+            self.scrub_progress = self.calculate_seekbar_progress(area, mouse_pos, height)
 
         else:
             self.pressed = ""
 
     def mouse_move(self, area: pygame.Rect, mouse_pos: Vector2):
-        height = 28
-        seekbar_rect = self.calculate_seekbar_rect(area, height)
-
         if self.pressed == "progress_bar":
-            pos = (mouse_pos.x - seekbar_rect.left)
-            pos = max(0, min(seekbar_rect.width, pos))
-            progress = self.duration * (pos / seekbar_rect.width)
-            if not self.seeking_lock.locked():
-                threading.Thread(target = lambda: self.start_ffmpeg_at_offset(int(progress))).start()
+            self.scrub_progress = self.calculate_seekbar_progress(area, mouse_pos)
 
     def mouse_up(self, area: pygame.Rect, mouse_pos: Vector2):
+        if self.pressed == "progress_bar":
+            progress = self.calculate_seekbar_progress(area, mouse_pos)
+
+            # starting at a keyframe means the decoder does not have to decode its way to the offset
+            self.seek(progress, "fast")
+
         self.pressed = ""
 
-    def draw(self, display: pygame.Surface, area: pygame.Rect):
-        frame = self.get_frame(area.size)
-        if frame:
-            display.blit(frame, frame.get_rect(center = area.center))
+    def build_seek_preview(self):
+        # the index and thumbnails are cached on disk so this is only slow the first time a source is opened
+        try:
+            self.keyframe_index = KeyframeIndex.load(self.source)
 
-        else:
-            display.fill((0, 0, 0), area)
+        except Exception as error:
+            traceback.print_exception(error)
 
+            # without an index the GOP cache decodes the source in windows from the start
+            self.keyframe_index = KeyframeIndex([])
+            return
+
+        finally:
+            self.index_ready.set()
+
+        try:
+            self.thumbnails = ThumbnailStrip(self.source, self.keyframe_index, (int(self.video_size.x), int(self.video_size.y)))
+            self.thumbnails.generate()
+
+        except Exception as error:
+            traceback.print_exception(error)
+
+    def render_label(self, name: str, label: str, width: int) -> pygame.Surface:
+        # a label is only rendered again when its text or width changes
+        cached = self.timestamp_cache.get(name)
+        if cached and cached[0] == (label, width):
+            return cached[1]
+
+        text, _ = self.font.render_max_width(label, width)
+        self.timestamp_cache[name] = ((label, width), text)
+        return text
+
+    def render_timestamp(self, name: str, seconds: int, width: int) -> pygame.Surface:
+        # the text only changes once a second so it is only rendered again when the second changes
+        return self.render_label(name, self.generate_timestamp(seconds), width)
+
+    def update_info_surface(self, area: pygame.Rect, progress: float, height: int):
+        """
+        Redraws self.info_surface if what it shows has changed and returns the key of what it shows.
+        """
 
-        height = 28
         remainder_rect = self.calculate_remainder_rect(area, height)
         seekbar_rect = self.calculate_seekbar_rect(area, height)
         elapsed_rect = self.calculate_elapsed_rect(area, height)
 
-        info_surface = self.info_surface
-        if not info_surface:
-            info_surface = pygame.Surface((area.w, height)).convert_alpha()
-            self.info_surface = info_surface
-            info_surface.set_alpha(127)
+        # the rects are relative to the info surface which spans the width of area
+        for rect in (elapsed_rect, seekbar_rect, remainder_rect):
+            rect.top = 0
+            rect.left -= area.left
 
-        elif not info_surface.get_size() == (int(area.w), height):
+        # a live source shows how long it has been playing and that it is live, it has no end to count down to
+        if self.live:
+            filled_width = seekbar_rect.w
+            key = (area.w, int(progress), "live")
+        else:
+            filled_width = int((progress / self.duration) * seekbar_rect.w) if self.duration > 0 else 0
+            key = (area.w, filled_width, int(progress), int(self.duration - progress))
+
+        if key == self.info_surface_key and self.info_surface:
+            return key
+
+        info_surface = self.info_surface
+        if not info_surface or not info_surface.get_size() == (int(area.w), height):
             info_surface = pygame.Surface((area.w, height)).convert_alpha()
             self.info_surface = info_surface
             info_surface.set_alpha(127)
 
         info_surface.fill((0, 0, 0, 0))
 
-        elapsed_rect.top = 0
-        seekbar_rect.top = 0
-        remainder_rect.top = 0
-
         pygame.draw.rect(info_surface, (55, 55, 55, 255), elapsed_rect)
         pygame.draw.rect(info_surface, (55, 55, 55, 255), seekbar_rect)
         pygame.draw.rect(info_surface, (55, 55, 55, 255), remainder_rect)
 
-        seekbar_rect.w = (self.progress / self.duration) * seekbar_rect.w
+        seekbar_rect.w = filled_width
         pygame.draw.rect(info_surface, (88, 88, 88, 255), seekbar_rect)
 
-        elapsed_text, _ = self.font.render_max_width(self.generate_timestamp(int(self.progress)), elapsed_rect.w)
+        elapsed_text = self.render_timestamp("elapsed", int(progress), elapsed_rect.w)
         info_surface.blit(elapsed_text, elapsed_text.get_rect(center = elapsed_rect.center))
 
-        elapsed_text, _ = self.font.render_max_width(self.generate_timestamp(int(self.duration - self.progress)), remainder_rect.w)
-        info_surface.blit(elapsed_text, elapsed_text.get_rect(center = remainder_rect.center))
+        if self.live:
+            remainder_text = self.render_label("live", "LIVE", remainder_rect.w)
+        else:
+            remainder_text = self.render_timestamp("remainder", int(self.duration - progress), remainder_rect.w)
+        info_surface.blit(remainder_text, remainder_text.get_rect(center = remainder_rect.center))
+
+        self.info_surface_key = key
+        return key
+
+    def draw(self, display: pygame.Surface, area: pygame.Rect, force: bool = False) -> list[pygame.Rect]:
+        """
+        Draws the video and its seek bar into area of display and returns the rects that were changed,
+        ready to be passed to pygame.display.update.
+
+        Nothing is drawn and an empty list is returned when neither the frame nor the seek bar changed
+        since the last call, pass force as True when something else has been drawn over area.
+        """
+
+        area = pygame.Rect(area)
+        scrubbing = self.pressed == "progress_bar"
+        progress = self.scrub_progress if scrubbing else self.progress
+
+        self.negotiate_output(display, area.size)
 
-        display.blit(info_surface, (0, area.bottom - height - 5))
\ No newline at end of file
+        # while scrubbing the cached thumbnail is shown instead of the current frame
+        thumbnail = self.thumbnails.get(progress) if scrubbing and self.thumbnails else None
+
+        height = 28
+        info_rect = pygame.Rect(area.left, area.bottom - height - 5, area.w, height)
+
+        frame_key = (id(thumbnail) if thumbnail else self.frame_id, tuple(area), id(display))
+        info_key = self.update_info_surface(area, progress, height)
+        overlay_key = self.update_debug_overlay() if self.debug_overlay else None
+
+        # the overlay is drawn over the frame so the frame is drawn again whenever the overlay changes
+        frame_changed = force or frame_key != self.drawn_frame_key or overlay_key != self.drawn_overlay_key
+        if not frame_changed and info_key == self.drawn_info_key:
+            return []
+
+        if thumbnail:
+            frame = pygame.transform.scale(thumbnail, self.fit_resolution(thumbnail.get_size(), area.size))
+        else:
+            frame = self.get_frame(area.size)
+
+        if frame_changed:
+            display.fill((0, 0, 0), area)
+            if frame:
+                display.blit(frame, frame.get_rect(center = area.center))
+            if overlay_key is not None:
+                display.blit(self.overlay_surface, (area.left + 5, area.top + 5))
+            dirty = [area]
+
+        else:
+            # the info surface is translucent so what is under it has to be drawn again first
+            display.fill((0, 0, 0), info_rect)
+            if frame:
+                frame_rect = frame.get_rect(center = area.center)
+                overlap = info_rect.clip(frame_rect)
+                display.blit(frame, overlap, overlap.move(-frame_rect.left, -frame_rect.top))
+            dirty = [info_rect]
+
+        display.blit(self.info_surface, info_rect)
+
+        self.drawn_frame_key = frame_key
+        self.drawn_info_key = info_key
+        self.drawn_overlay_key = overlay_key
+        return dirty
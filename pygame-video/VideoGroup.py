@@ -0,0 +1,271 @@
+from .Vector2 import Vector2
+from .Video import Video
+from .Font import Font
+from typing import Optional
+import concurrent.futures
+import traceback
+import threading
+import time
+import os
+import pygame
+
+class VideoGroup:
+    def __init__(
+        self,
+        workers: int = None,
+        decode_budget: float = None,
+        small_tile_area: int = 320 * 180,
+        small_tile_divisor: int = 2,
+        resync_after: float = 1.0,
+        font: Font = None,
+    ):
+        """
+        Drives many videos from one scheduler thread and a bounded pool of decode workers,
+        instead of every video running its own player and reader threads.
+
+        decode_budget is the most frames per second decoded across the whole group, None for no limit.
+        Tiles smaller than small_tile_area pixels are decoded at 1 / small_tile_divisor of their frame rate.
+        Tiles outside of the display are not decoded at all, if they were hidden for longer than
+        resync_after seconds they continue from their clock when they come back.
+        """
+
+        self.workers = workers or os.cpu_count() or 4
+        self.pool = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix = "VideoGroup")
+
+        self.decode_budget = decode_budget
+        self.tokens = decode_budget or 0
+        self.tokens_time = time.monotonic()
+
+        self.small_tile_area = small_tile_area
+        self.small_tile_divisor = small_tile_divisor
+        self.resync_after = resync_after
+
+        # one font for every video so the glyphs are only rendered once
+        self.font = font or Font("Ariel", 24)
+
+        self.videos: list[Video] = []
+        self.areas: dict[Video, pygame.Rect] = {}
+        self.hidden_since: dict[Video, float] = {}
+        self.lock = threading.Lock()
+
+        # the rect of the display the group was last drawn to, None until the first draw
+        self.display_rect: pygame.Rect = None
+
+        # notified whenever a worker finishes so the scheduler can hand out the next job straight away
+        self.wakeup = threading.Condition()
+        self.running = True
+        self.scheduler_thread = threading.Thread(target = self._internal_scheduler_thread, daemon = True)
+        self.scheduler_thread.start()
+
+    def open(self, source: str, area: pygame.Rect, **kwargs) -> Video:
+        kwargs.setdefault("font", self.font)
+
+        # the group already lowers the frame rate of small tiles and shares out the decode budget itself
+        kwargs.setdefault("adaptive_quality", False)
+        video = Video(source, managed = True, **kwargs)
+        self.add(video, area)
+        self.pool.submit(self._setup, video)
+        return video
+
+    def add(self, video: Video, area: pygame.Rect):
+        with self.lock:
+            if video not in self.areas:
+                self.videos.append(video)
+            self.areas[video] = pygame.Rect(area)
+
+    def remove(self, video: Video):
+        with self.lock:
+            if video in self.areas:
+                self.videos.remove(video)
+                del self.areas[video]
+            self.hidden_since.pop(video, None)
+
+    def set_area(self, video: Video, area: pygame.Rect):
+        with self.lock:
+            self.areas[video] = pygame.Rect(area)
+
+    def tile_at(self, pos: Vector2) -> Optional[tuple[Video, pygame.Rect]]:
+        # the top most video at pos and its area, looked up together so a concurrent set_area can not split them
+        with self.lock:
+            for video in reversed(self.videos):
+                if self.areas[video].collidepoint(pos.x, pos.y):
+                    return video, self.areas[video]
+        return None
+
+    def video_at(self, pos: Vector2) -> Optional[Video]:
+        tile = self.tile_at(pos)
+        return tile[0] if tile else None
+
+    def notify(self):
+        with self.wakeup:
+            self.wakeup.notify()
+
+    def _setup(self, video: Video):
+        try:
+            video.setup_thread()
+
+        except Exception as error:
+            traceback.print_exception(error)
+
+        self.notify()
+
+    def _decode(self, video: Video, generation: int, min_interval: float):
+        try:
+            video.decode_next_frame(generation, block = False, min_interval = min_interval)
+
+        except Exception as error:
+            traceback.print_exception(error)
+
+        self.notify()
+
+    def _resync(self, video: Video):
+        try:
+            video.start_ffmpeg_at_offset(video.presentation_clock.time())
+
+        except Exception as error:
+            traceback.print_exception(error)
+
+        self.notify()
+
+    def tile_interval(self, video: Video, area: pygame.Rect) -> Optional[float]:
+        # the least time between decoded frames of a tile, None if the tile should not be decoded
+        if self.display_rect and not area.colliderect(self.display_rect):
+            return None
+
+        if area.w * area.h < self.small_tile_area:
+            return self.small_tile_divisor / video.framerate
+
+        return 0
+
+    def take_token(self) -> bool:
+        if self.decode_budget is None:
+            return True
+
+        # the bucket holds at most a tenth of a second of frames so the budget can not be saved up
+        now = time.monotonic()
+        self.tokens = min(max(1, self.decode_budget / 10), self.tokens + (now - self.tokens_time) * self.decode_budget)
+        self.tokens_time = now
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+    def schedule_decode(self, video: Video, area: pygame.Rect):
+        if video.decode_job and not video.decode_job.done():
+            return
+
+        # a full buffer (which is how a paused video stays) or a video that has decoded its last frame has nothing to do
+        if video.seeking_lock.locked() or video.frame_buffer.is_full() or video.decode_ended:
+            return
+
+        now = time.monotonic()
+        interval = self.tile_interval(video, area)
+        if interval is None:
+            self.hidden_since.setdefault(video, now)
+            return
+
+        hidden = self.hidden_since.pop(video, None)
+        if hidden is not None and now - hidden > self.resync_after:
+            # the decoder stopped while the tile was hidden so it would be far behind the clock
+            self.pool.submit(self._resync, video)
+            return
+
+        if not self.take_token():
+            return
+
+        video.decode_job = self.pool.submit(self._decode, video, video.reader_generation, interval)
+
+    def _internal_scheduler_thread(self):
+        while self.running:
+            delay = 0.1
+
+            with self.lock:
+                tiles = [(video, self.areas[video]) for video in self.videos]
+
+            # the videos with the fewest frames decoded ahead are the closest to running out so they go first
+            tiles.sort(key = lambda tile: len(tile[0].frame_buffer) if tile[0].frame_buffer else 0)
+
+            for video, area in tiles:
+                # the video is still being set up
+                if not video.decoder:
+                    continue
+
+                wait = video.present()
+                if wait is not None:
+                    delay = min(delay, wait)
+
+                if video.has_video:
+                    try:
+                        self.schedule_decode(video, area)
+
+                    except RuntimeError:
+                        return # the pool was shut down by close or because the interpreter is exiting
+
+            if self.decode_budget:
+                delay = min(delay, 1 / self.decode_budget)
+
+            with self.wakeup:
+                self.wakeup.wait(delay)
+
+    def draw(self, display: pygame.Surface, force: bool = False) -> list[pygame.Rect]:
+        """
+        Draws every visible video onto display in one pass and returns the rects that were changed,
+        ready to be passed to pygame.display.update.
+        """
+
+        self.display_rect = display.get_rect()
+
+        with self.lock:
+            tiles = [(video, self.areas[video]) for video in self.videos]
+
+        dirty = []
+        for video, area in tiles:
+            if video.decoder and area.colliderect(self.display_rect):
+                dirty += video.draw(display, area, force)
+
+        return dirty
+
+    def mouse_down(self, mouse_pos: Vector2):
+        tile = self.tile_at(mouse_pos)
+        if tile:
+            video, area = tile
+            video.mouse_down(area, mouse_pos)
+
+    def mouse_move(self, mouse_pos: Vector2):
+        with self.lock:
+            tiles = [(video, self.areas[video]) for video in self.videos]
+
+        for video, area in tiles:
+            video.mouse_move(area, mouse_pos)
+
+    def mouse_up(self, mouse_pos: Vector2):
+        with self.lock:
+            tiles = [(video, self.areas[video]) for video in self.videos]
+
+        for video, area in tiles:
+            video.mouse_up(area, mouse_pos)
+
+    def close(self):
+        # the videos are closed once no worker is decoding them any more
+        self.running = False
+        self.notify()
+
+        # the scheduler could be handing out a job right now, the pool is only shut down once it has stopped
+        if self.scheduler_thread is not threading.current_thread():
+            self.scheduler_thread.join()
+        self.pool.shutdown(wait = True, cancel_futures = True)
+
+        with self.lock:
+            videos, self.videos, self.areas = self.videos, [], {}
+            self.hidden_since.clear()
+
+        for video in videos:
+            video.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1 +1,8 @@
-from .Video import Video
\ No newline at end of file
+from .VideoGroup import VideoGroup
+from .FrameExtractor import FrameExtractor
+from .Recorder import Recorder
+from .ProxyCache import ProxyCache
+from .FilterChain import FilterChain, FrameFilter, BrightnessContrast, Letterbox, Overlay, MotionMask
+from .Metadata import Metadata
+from .Playlist import Playlist
+from .Video import Video